@@ -0,0 +1,197 @@
+"""
+asyncio transports for SSL-Vision input and grSim command output
+Vision frames and robot commands share one event loop, so a controller can
+run perception -> decision -> command without threads
+"""
+import asyncio
+import math
+import socket
+
+from generated import SSL_WrapperPacket
+from receive_vision import create_multicast_socket, MULTICAST_GROUP, PORT, DEFAULT_RCVBUF_SIZE
+from send_robot_command import build_packet, create_robot_command
+
+GRSIM_ADDRESS = ("127.0.0.1", 20011)
+
+
+class VisionProtocol(asyncio.DatagramProtocol):
+    """Queue SSL-Vision datagrams, dropping the oldest when the consumer falls behind"""
+
+    def __init__(self, max_queue: int = 64):
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.received = 0
+        self.dropped = 0
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr):
+        self.received += 1
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(data)
+
+    def error_received(self, exc):
+        print(f"Vision error: {exc}")
+
+    def connection_lost(self, exc):
+        # Wake up the consumer so iteration ends
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class VisionStream:
+    """Async iterator of SSL_WrapperPackets (or raw datagrams with raw=True)"""
+
+    def __init__(self, transport, protocol: VisionProtocol, raw: bool = False):
+        self.transport = transport
+        self.protocol = protocol
+        self.raw = raw
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        data = await self.protocol.queue.get()
+        if data is None:
+            raise StopAsyncIteration
+        if self.raw:
+            return data
+        packet = SSL_WrapperPacket()
+        packet.ParseFromString(data)
+        return packet
+
+    def close(self):
+        self.transport.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+
+async def open_vision_stream(
+    multicast_group: str = MULTICAST_GROUP,
+    port: int = PORT,
+    raw: bool = False,
+    max_queue: int = 64,
+    rcvbuf_size: int = DEFAULT_RCVBUF_SIZE,
+) -> VisionStream:
+    """Join the SSL-Vision multicast group and return a stream of its packets"""
+    sock = create_multicast_socket(multicast_group, port, rcvbuf_size)
+    sock.setblocking(False)
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(
+        lambda: VisionProtocol(max_queue), sock=sock
+    )
+    return VisionStream(transport, protocol, raw)
+
+
+class CommandProtocol(asyncio.DatagramProtocol):
+    """Datagram protocol with write flow control for the grSim command port"""
+
+    def __init__(self):
+        self.transport = None
+        self._can_write = asyncio.Event()
+        self._can_write.set()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def pause_writing(self):
+        self._can_write.clear()
+
+    def resume_writing(self):
+        self._can_write.set()
+
+    def error_received(self, exc):
+        # grSim not running yet (ICMP port unreachable); commands are fire-and-forget
+        pass
+
+    async def wait_writable(self):
+        await self._can_write.wait()
+
+
+class CommandClient:
+    """Send batched robot commands to grSim from a coroutine"""
+
+    def __init__(self, transport, protocol: CommandProtocol):
+        self.transport = transport
+        self.protocol = protocol
+
+    async def send_commands(self, robot_commands: list, is_yellow: bool = False):
+        """Send every grSim_Robot_Command of one team in a single packet"""
+        await self.send_raw(build_packet(robot_commands, is_yellow).SerializeToString())
+
+    async def send_encoder(self, encoder):
+        """Send the current commands of a command_encoder.CommandEncoder"""
+        await self.send_raw(encoder.encode())
+
+    async def send_raw(self, data):
+        await self.protocol.wait_writable()
+        self.transport.sendto(data)
+
+    def close(self):
+        self.transport.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+
+async def open_command_client(address: tuple = GRSIM_ADDRESS) -> CommandClient:
+    """Open a UDP transport to the grSim command port"""
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(
+        CommandProtocol, remote_addr=address, family=socket.AF_INET
+    )
+    return CommandClient(transport, protocol)
+
+
+async def face_ball(robot_id: int = 0, is_yellow: bool = False):
+    """Demo controller: turn one robot towards the ball on every fused frame"""
+    from tracker import BatchTracker
+    from vision_fusion import FrameFuser, BLUE, YELLOW
+
+    fuser = FrameFuser()
+    tracker = BatchTracker()
+    team = YELLOW if is_yellow else BLUE
+
+    async with await open_vision_stream() as frames, await open_command_client() as commands:
+        async for packet in frames:
+            if not packet.HasField("detection"):
+                continue
+            snapshot = fuser.add_frame(packet.detection)
+            if snapshot is None:
+                continue
+            tracker.update_snapshot(snapshot)
+
+            robot, ball = tracker.robot(team, robot_id), tracker.ball
+            velangular = 0.0
+            if robot is not None and ball is not None:
+                (x, y, orientation), _ = robot
+                (ball_x, ball_y), _ = ball
+                error = math.atan2(ball_y - y, ball_x - x) - orientation
+                error = math.atan2(math.sin(error), math.cos(error))
+                velangular = max(-4.0, min(4.0, 3.0 * error))
+            await commands.send_commands([create_robot_command(robot_id, velangular=velangular)], is_yellow)
+
+
+def main():
+    print("Turning blue robot 0 towards the ball...")
+    print(f"Vision: {MULTICAST_GROUP}:{PORT}, grSim: {GRSIM_ADDRESS}")
+    print("Press Ctrl+C to exit")
+    try:
+        asyncio.run(face_ball())
+    except KeyboardInterrupt:
+        print("\nExiting...")
+
+
+if __name__ == "__main__":
+    main()
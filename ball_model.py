@@ -0,0 +1,308 @@
+"""
+Script to predict ball trajectories with the models from SSL_GeometryModels
+Straight kicks follow the two-phase model (sliding, then rolling) and chip kicks
+the fixed-loss hop model; positions, arrival times and interceptions are
+computed in closed form and broadcast over many kick velocities and times
+
+Units follow vision: positions in mm, velocities in mm/s, times in s. The model
+accelerations are given in m/s^2 as in the proto
+"""
+import math
+import time
+
+import numpy as np
+
+GRAVITY = 9810.0  # [mm/s^2]
+
+
+def _split(velocity: np.ndarray):
+    """Speed and unit direction of (..., 2) velocities"""
+    velocity = np.asarray(velocity, dtype=float)
+    speed = np.hypot(velocity[..., 0], velocity[..., 1])
+    direction = velocity / np.where(speed > 0, speed, 1.0)[..., None]
+    return speed, direction
+
+
+class StraightTwoPhase:
+    """Ball that slides until it has k_switch of its kick speed left, then rolls to a stop"""
+
+    def __init__(self, acc_slide: float = -3.0, acc_roll: float = -0.26, k_switch: float = 0.69):
+        self.acc_slide = 1000.0 * acc_slide  # [mm/s^2]
+        self.acc_roll = 1000.0 * acc_roll
+        self.k_switch = k_switch
+
+    @classmethod
+    def from_field(cls, field_geometry) -> "StraightTwoPhase":
+        """Use the model of a field_geometry.FieldGeometry, or the defaults if it has none"""
+        if field_geometry is None or field_geometry.straight_two_phase is None:
+            return cls()
+        return cls(*field_geometry.straight_two_phase)
+
+    def phases(self, speed, rolling=False):
+        """(t_switch, t_stop, s_switch, s_stop) for initial speeds [mm/s]
+
+        rolling marks balls that already roll (e.g. a tracked ball late in its path),
+        for which the sliding phase is skipped.
+        """
+        speed = np.asarray(speed, dtype=float)
+        v_switch = np.where(rolling, speed, self.k_switch * speed)
+        t_switch = (v_switch - speed) / self.acc_slide
+        s_switch = (speed + v_switch) / 2 * t_switch
+        t_roll = -v_switch / self.acc_roll
+        return t_switch, t_switch + t_roll, s_switch, s_switch + v_switch / 2 * t_roll
+
+    def distance(self, speed, t, rolling=False):
+        """Distance [mm] travelled after t seconds (broadcast over speed and t)"""
+        speed = np.asarray(speed, dtype=float)
+        t = np.asarray(t, dtype=float)
+        t_switch, t_stop, s_switch, s_stop = self.phases(speed, rolling)
+        v_switch = speed + self.acc_slide * t_switch
+        sliding = speed * t + 0.5 * self.acc_slide * t * t
+        tr = t - t_switch
+        rolling_distance = s_switch + v_switch * tr + 0.5 * self.acc_roll * tr * tr
+        return np.where(t < t_switch, sliding, np.where(t < t_stop, rolling_distance, s_stop))
+
+    def speed(self, speed, t, rolling=False):
+        """Ball speed [mm/s] after t seconds"""
+        speed = np.asarray(speed, dtype=float)
+        t = np.asarray(t, dtype=float)
+        t_switch, t_stop, _, _ = self.phases(speed, rolling)
+        v_switch = speed + self.acc_slide * t_switch
+        return np.where(t < t_switch, speed + self.acc_slide * t,
+                        np.maximum(v_switch + self.acc_roll * (t - t_switch), 0.0))
+
+    def time_to_distance(self, speed, distance, rolling=False):
+        """Time [s] to travel distance [mm]; inf where the ball stops before"""
+        speed = np.asarray(speed, dtype=float)
+        distance = np.asarray(distance, dtype=float)
+        t_switch, _, s_switch, s_stop = self.phases(speed, rolling)
+        v_switch = speed + self.acc_slide * t_switch
+        # Roots of s = v t + a t^2 / 2 in each phase (numerically stable form)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            t_slide = 2 * distance / (speed + np.sqrt(np.maximum(speed ** 2 + 2 * self.acc_slide * distance, 0.0)))
+            rest = distance - s_switch
+            t_roll = t_switch + 2 * rest / (
+                v_switch + np.sqrt(np.maximum(v_switch ** 2 + 2 * self.acc_roll * rest, 0.0))
+            )
+        result = np.where(distance <= s_switch, t_slide, t_roll)
+        return np.where(distance <= s_stop, np.nan_to_num(result, nan=0.0), np.inf)
+
+    def kick_speed(self, distance, end_speed=0.0):
+        """Kick speed [mm/s] that arrives at distance [mm] with end_speed [mm/s]
+
+        Solved per phase: arrival during rolling when end_speed <= k_switch * kick speed.
+        """
+        distance = np.asarray(distance, dtype=float)
+        end_speed = np.asarray(end_speed, dtype=float)
+        k = self.k_switch
+        # Arrival while rolling: v_sw^2 - v_end^2 = -2 a_r (d - s_switch), s_switch = v0^2 (k^2 - 1) / (2 a_s)
+        rolling_v0 = np.sqrt(np.maximum(
+            (end_speed ** 2 - 2 * self.acc_roll * distance)
+            / (k * k - self.acc_roll * (k * k - 1) / self.acc_slide), 0.0
+        ))
+        sliding_v0 = np.sqrt(np.maximum(end_speed ** 2 - 2 * self.acc_slide * distance, 0.0))
+        return np.where(end_speed <= k * rolling_v0, rolling_v0, sliding_v0)
+
+    def predict(self, position, velocity, t, rolling=False):
+        """(..., m, 2) positions at times t (m,) of balls at position with velocity (..., 2)"""
+        speed, direction = _split(velocity)
+        t = np.asarray(t, dtype=float)
+        s = self.distance(speed[..., None], t, np.asarray(rolling)[..., None] if np.ndim(rolling) else rolling)
+        return np.asarray(position, dtype=float)[..., None, :] + s[..., None] * direction[..., None, :]
+
+    def stop_position(self, position, velocity, rolling=False):
+        speed, direction = _split(velocity)
+        return np.asarray(position, dtype=float) + self.phases(speed, rolling)[3][..., None] * direction
+
+
+class ChipFixedLoss:
+    """Chipped ball whose xy and z speeds lose a fixed fraction on every bounce
+
+    Once a hop would be lower than min_hop_height the ball rolls with acc_roll.
+    """
+
+    def __init__(
+        self,
+        damping_xy_first_hop: float = 0.75,
+        damping_xy_other_hops: float = 0.95,
+        damping_z: float = 0.5,
+        acc_roll: float = -0.26,
+        min_hop_height: float = 10.0,  # [mm]
+        max_hops: int = 12,
+    ):
+        self.damping_xy_first_hop = damping_xy_first_hop
+        self.damping_xy_other_hops = damping_xy_other_hops
+        self.damping_z = damping_z
+        self.acc_roll = 1000.0 * acc_roll
+        self.min_hop_speed = math.sqrt(2 * GRAVITY * min_hop_height)
+        self.max_hops = max_hops
+
+    @classmethod
+    def from_field(cls, field_geometry) -> "ChipFixedLoss":
+        """Use the models of a field_geometry.FieldGeometry, or the defaults if it has none"""
+        args = {}
+        if field_geometry is not None:
+            if field_geometry.chip_fixed_loss is not None:
+                first, other, z = field_geometry.chip_fixed_loss
+                args.update(damping_xy_first_hop=first, damping_xy_other_hops=other, damping_z=z)
+            if field_geometry.straight_two_phase is not None:
+                args["acc_roll"] = field_geometry.straight_two_phase[1]
+        return cls(**args)
+
+    def hops(self, speed_xy, speed_z):
+        """Per-hop tables (..., max_hops + 1): start time, start distance, xy speed, z speed, flying
+
+        Hop k starts with z speed speed_z * damping_z^k and the xy speed left after k
+        landings (the kick speed for k = 0). Hops below the minimum height do not fly;
+        the first of them is the rolling phase, so the last entry never flies.
+        """
+        speed_xy = np.asarray(speed_xy, dtype=float)[..., None]
+        speed_z = np.asarray(speed_z, dtype=float)[..., None]
+        k = np.arange(self.max_hops + 1)
+        hop_z = speed_z * self.damping_z ** k
+        hop_xy = speed_xy * np.where(
+            k == 0, 1.0, self.damping_xy_first_hop * self.damping_xy_other_hops ** np.maximum(k - 1, 0)
+        )
+        flying = (hop_z >= self.min_hop_speed) & (k < self.max_hops)
+        flying &= np.cumprod(flying, axis=-1).astype(bool)  # Only the leading hops fly
+        duration = np.where(flying, 2 * hop_z / GRAVITY, 0.0)
+        length = hop_xy * duration
+        start_time = np.cumsum(duration, axis=-1) - duration
+        start_distance = np.cumsum(length, axis=-1) - length
+        return start_time, start_distance, hop_xy, hop_z, flying
+
+    def flight(self, velocity):
+        """(flight time [s], carry distance [mm]) until the last hop lands, for (..., 3) velocities"""
+        velocity = np.asarray(velocity, dtype=float)
+        start_time, start_distance, _, _, flying = self.hops(np.hypot(velocity[..., 0], velocity[..., 1]),
+                                                             velocity[..., 2])
+        last = flying.sum(axis=-1, keepdims=True)
+        return (np.take_along_axis(start_time, last, axis=-1)[..., 0],
+                np.take_along_axis(start_distance, last, axis=-1)[..., 0])
+
+    def predict(self, position, velocity, t):
+        """(..., m, 3) positions at times t (m,) of balls chipped from position with (..., 3) velocity"""
+        position = np.asarray(position, dtype=float)
+        velocity = np.asarray(velocity, dtype=float)
+        speed_xy, direction = _split(velocity[..., :2])
+        start_time, start_distance, hop_xy, hop_z, flying = self.hops(speed_xy, velocity[..., 2])
+        t = np.asarray(t, dtype=float)
+
+        # Phase of every time: a flying hop, or the roll that follows the last one
+        reachable = np.concatenate([np.ones_like(flying[..., :1]), flying[..., :-1]], axis=-1)
+        started = reachable[..., None, :] & (t[:, None] >= start_time[..., None, :])   # (..., m, hops)
+        hop = started.sum(axis=-1) - 1
+
+        def pick(table):
+            return np.take_along_axis(table, hop, axis=-1)
+
+        tau = t - pick(start_time)
+        speed = pick(hop_xy)
+        airborne = pick(flying)
+        z = np.where(airborne, np.maximum(pick(hop_z) * tau - 0.5 * GRAVITY * tau * tau, 0.0), 0.0)
+        tau_roll = np.minimum(tau, -speed / self.acc_roll)
+        s = pick(start_distance) + np.where(
+            airborne, speed * tau, speed * tau_roll + 0.5 * self.acc_roll * tau_roll * tau_roll
+        )
+
+        result = np.empty(s.shape + (3,))
+        result[..., :2] = position[..., None, :2] + s[..., None] * direction[..., None, :]
+        result[..., 2] = z
+        return result
+
+
+def robot_travel_time(distance, max_speed: float = 3000.0, max_acc: float = 3000.0):
+    """Time [s] for a robot at rest to cover distance [mm] with a trapezoidal velocity profile"""
+    distance = np.asarray(distance, dtype=float)
+    ramp = max_speed * max_speed / max_acc  # Distance to reach full speed and brake again
+    return np.where(
+        distance <= ramp, 2 * np.sqrt(distance / max_acc), distance / max_speed + max_speed / max_acc
+    )
+
+
+def intercept(model, position, velocity, robots, horizon: float = 4.0, resolution: float = 0.01,
+              max_speed: float = 3000.0, max_acc: float = 3000.0, **model_args):
+    """Earliest time each robot can reach the ball path, and where
+
+    position and velocity are (..., 2) ball states (or (..., 3) velocities for a
+    ChipFixedLoss model, where only points below robot height count); robots is
+    (k, 2). Returns times (..., k), inf where no robot gets there within horizon,
+    and the (..., k, 2) interception points.
+    """
+    times = np.arange(0.0, horizon + resolution / 2, resolution)
+    path = model.predict(position, velocity, times, **model_args)                       # (..., m, 2|3)
+    reachable = np.ones(path.shape[:-1], dtype=bool)
+    if path.shape[-1] == 3:
+        reachable = path[..., 2] < 150.0  # Chipped balls fly over robots
+    robots = np.asarray(robots, dtype=float)
+    offset = path[..., None, :, :2] - robots[:, None, :]                               # (..., k, m, 2)
+    arrival = robot_travel_time(np.hypot(offset[..., 0], offset[..., 1]), max_speed, max_acc)
+    in_time = (arrival <= times) & reachable[..., None, :]
+    first = np.argmax(in_time, axis=-1)                                                # (..., k)
+    found = np.take_along_axis(in_time, first[..., None], axis=-1)[..., 0]
+    point = np.take_along_axis(path[..., None, :, :2], first[..., None, None], axis=-2)[..., 0, :]
+    return np.where(found, times[first], np.inf), point
+
+
+def _simulate_straight(model: StraightTwoPhase, speed: float, t_end: float, dt: float = 1e-5) -> float:
+    """Reference distance from stepping the two-phase model"""
+    v, s, v_switch = speed, 0.0, model.k_switch * speed
+    for _ in range(int(round(t_end / dt))):
+        a = model.acc_slide if v > v_switch else model.acc_roll
+        v_next = max(v + a * dt, 0.0)
+        s += (v + v_next) / 2 * dt
+        v = v_next
+    return s
+
+
+def main():
+    rng = np.random.default_rng(0)
+    straight = StraightTwoPhase()
+    chip = ChipFixedLoss()
+
+    # Closed form against stepping the model
+    for speed in (500.0, 2000.0, 6500.0):
+        for t in (0.1, 0.5, 2.0, 5.0):
+            expected = _simulate_straight(straight, speed, t)
+            assert abs(float(straight.distance(speed, t)) - expected) < 1.0, (speed, t)
+    # Inverse functions
+    distance = rng.uniform(100, 5000, 1000)
+    end_speed = rng.uniform(0, 1500, 1000)
+    kick = straight.kick_speed(distance, end_speed)
+    arrival = straight.time_to_distance(kick, distance)
+    assert np.allclose(straight.distance(kick, arrival), distance, atol=1e-6)
+    assert np.allclose(straight.speed(kick, arrival), end_speed, atol=1e-6)
+    print("Straight model: closed form matches stepping, kick_speed/time_to_distance invert distance")
+
+    time_of_flight, carry = chip.flight(np.array([2000.0, 0.0, 3000.0]))
+    landing = chip.predict(np.zeros(2), np.array([2000.0, 0.0, 3000.0]), np.array([2 * 3000.0 / GRAVITY]))
+    assert abs(landing[0, 0] - 2000.0 * 2 * 3000.0 / GRAVITY) < 1e-6 and abs(landing[0, 2]) < 1e-6
+    print(f"Chip at 2 m/s forward, 3 m/s up: lands first at {landing[0, 0]:.0f}mm, "
+          f"stops hopping after {time_of_flight:.2f}s at {carry:.0f}mm")
+
+    # Many candidate kicks at once
+    angles = rng.uniform(-math.pi, math.pi, 10000)
+    speeds = rng.uniform(1000, 6500, 10000)
+    velocities = np.column_stack([speeds * np.cos(angles), speeds * np.sin(angles)])
+    times = np.linspace(0, 3, 100)
+    start = time.perf_counter()
+    paths = straight.predict(np.zeros(2), velocities, times)
+    elapsed = time.perf_counter() - start
+    print(f"Straight: {paths.shape[0]} kicks x {paths.shape[1]} times in {elapsed * 1e3:.1f}ms")
+
+    chip_velocities = np.column_stack([velocities * 0.7, speeds * 0.7])
+    start = time.perf_counter()
+    chip_paths = chip.predict(np.zeros(2), chip_velocities, times)
+    elapsed = time.perf_counter() - start
+    print(f"Chip:     {chip_paths.shape[0]} kicks x {chip_paths.shape[1]} times in {elapsed * 1e3:.1f}ms")
+
+    opponents = rng.uniform(-3000, 3000, size=(6, 2))
+    start = time.perf_counter()
+    arrival, _ = intercept(straight, np.zeros(2), velocities[:1000], opponents)
+    elapsed = time.perf_counter() - start
+    safe = np.isinf(arrival).all(axis=1).sum()
+    print(f"Intercepts: 1000 passes x {len(opponents)} opponents in {elapsed * 1e3:.1f}ms, {safe} never intercepted")
+
+
+if __name__ == "__main__":
+    main()
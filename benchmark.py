@@ -0,0 +1,337 @@
+"""
+Script to benchmark the vision decode and command encode hot paths
+Synthetic SSL_WrapperPacket streams (1-8 cameras, up to 16 robots per team) and
+grSim_Packet batches are generated from a fixed seed; the harness measures
+throughput, transient memory per operation and loopback UDP rates through
+create_multicast_socket and send_command, and writes the results as JSON.
+A previous result can be passed to flag regressions
+
+Usage:
+    python benchmark.py [--out results.json] [--compare baseline.json] [--quick]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import google.protobuf
+from generated import SSL_WrapperPacket
+from command_encoder import CommandEncoder
+from fast_decoder import FastDecoder, ROBOT_DTYPE, BALL_DTYPE
+from receive_vision import VisionReceiver, MULTICAST_GROUP
+from send_robot_command import build_packet, create_robot_command, send_command
+from vision_fusion import FrameFuser
+
+FIELD_LENGTH = 12000.0  # [mm]
+FIELD_WIDTH = 9000.0
+CAMERA_OVERLAP = 300.0  # Robots this close to a camera border are seen by both cameras [mm]
+
+BENCH_VISION_PORT = 10086
+BENCH_COMMAND_PORT = 20086
+
+
+def vision_stream(cameras: int, robots_per_team: int, ticks: int, seed: int = 0) -> list:
+    """Serialized detection packets, one per camera per tick, cameras tiled along x
+
+    Robots and the ball move randomly; objects near a camera border appear in both cameras.
+    """
+    rng = random.Random(seed)
+    borders = np.linspace(-FIELD_LENGTH / 2, FIELD_LENGTH / 2, cameras + 1)
+    positions = {
+        team: [(rng.uniform(-5500, 5500), rng.uniform(-4000, 4000)) for _ in range(robots_per_team)]
+        for team in ("blue", "yellow")
+    }
+    ball = [0.0, 0.0]
+    packets = []
+    packet = SSL_WrapperPacket()
+    for tick in range(ticks):
+        t_capture = 1.7e9 + tick / 60
+        for team in positions:
+            positions[team] = [
+                (min(max(x + rng.uniform(-30, 30), -5900), 5900), min(max(y + rng.uniform(-30, 30), -4400), 4400))
+                for x, y in positions[team]
+            ]
+        ball = [
+            min(max(ball[0] + rng.uniform(-50, 50), -5900), 5900),
+            min(max(ball[1] + rng.uniform(-50, 50), -4400), 4400),
+        ]
+
+        for camera_id in range(cameras):
+            low, high = borders[camera_id] - CAMERA_OVERLAP, borders[camera_id + 1] + CAMERA_OVERLAP
+            packet.Clear()
+            detection = packet.detection
+            detection.frame_number = tick
+            detection.t_capture = t_capture
+            detection.t_sent = t_capture + 0.004
+            detection.camera_id = camera_id
+            if low <= ball[0] <= high:
+                detection.balls.add(confidence=0.9, x=ball[0], y=ball[1], pixel_x=0, pixel_y=0, area=80)
+            for team, robots in (("blue", detection.robots_blue), ("yellow", detection.robots_yellow)):
+                for robot_id, (x, y) in enumerate(positions[team]):
+                    if low <= x <= high:
+                        robots.add(confidence=0.95, robot_id=robot_id, x=x, y=y, orientation=rng.uniform(-3.14, 3.14),
+                                   pixel_x=0, pixel_y=0, height=150.0)
+            packets.append(packet.SerializeToString())
+    return packets
+
+
+def command_batches(robots: int, ticks: int, seed: int = 0) -> np.ndarray:
+    """(ticks, robots, 5) veltangent, velnormal, velangular, kickspeedx, kickspeedz as float32 values"""
+    rng = np.random.default_rng(seed)
+    values = rng.uniform(-3, 3, size=(ticks, robots, 5))
+    values[..., 3:] = np.where(rng.random((ticks, robots, 2)) < 0.05, values[..., 3:] + 3, 0.0)
+    return values.astype(np.float32).astype(float)
+
+
+def measure(function, items: list, repeats: int = 5) -> dict:
+    """Best-of-repeats time per item, plus transient and retained memory per item"""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for item in items:
+            function(item)
+        best = min(best, time.perf_counter() - start)
+
+    # Memory pass: peak above the running level per call, and what is left after all calls
+    sample = items[:min(len(items), 200)]
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    transient = 0
+    for item in sample:
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        function(item)
+        transient += tracemalloc.get_traced_memory()[1] - current
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+
+    return {
+        "ops_per_s": len(items) / best,
+        "us_per_op": best / len(items) * 1e6,
+        "peak_bytes_per_op": transient / len(sample),
+        "retained_bytes_per_op": retained / len(sample),
+    }
+
+
+def bench_decode(cameras: int, robots_per_team: int, ticks: int) -> list:
+    packets = vision_stream(cameras, robots_per_team, ticks)
+    params = {"cameras": cameras, "robots_per_team": robots_per_team,
+              "bytes_per_packet": sum(map(len, packets)) / len(packets)}
+    results = []
+
+    message = SSL_WrapperPacket()
+    results.append(("decode_protobuf", params, measure(message.ParseFromString, packets)))
+
+    # Parsing alone stays lazy on the upb backend; converting to arrays is the comparable work
+    def protobuf_to_arrays(data):
+        message.ParseFromString(data)
+        detection = message.detection
+        for robots in (detection.robots_blue, detection.robots_yellow):
+            np.array([(r.x, r.y, r.orientation, r.confidence, r.robot_id) for r in robots], dtype=ROBOT_DTYPE)
+        np.array([(b.x, b.y, b.z, b.confidence) for b in detection.balls], dtype=BALL_DTYPE)
+
+    results.append(("decode_protobuf_arrays", params, measure(protobuf_to_arrays, packets)))
+
+    decoder = FastDecoder()
+    results.append(("decode_fast", params, measure(decoder.decode, packets)))
+
+    fuser = FrameFuser()
+
+    def decode_and_fuse(data):
+        fuser.add_decoded(decoder.decode(data))
+
+    results.append(("decode_fuse", params, measure(decode_and_fuse, packets)))
+    return results
+
+
+def bench_encode(robots: int, ticks: int) -> list:
+    batches = command_batches(robots, ticks)
+    robot_ids = list(range(robots))
+    params = {"robots": robots}
+    results = []
+
+    def protobuf(values):
+        commands = [create_robot_command(i, *row) for i, row in zip(robot_ids, values.tolist())]
+        return build_packet(commands, timestamp=0.0).SerializeToString()
+
+    results.append(("encode_protobuf", params, measure(protobuf, list(batches))))
+
+    encoder = CommandEncoder(robot_ids)
+
+    def per_robot(values):
+        for i, row in zip(robot_ids, values.tolist()):
+            encoder.set_command(i, *row)
+        return encoder.encode(0.0)
+
+    results.append(("encode_encoder", params, measure(per_robot, list(batches))))
+
+    view = encoder.commands
+    names = ("veltangent", "velnormal", "velangular", "kickspeedx", "kickspeedz")
+
+    def vectorized(values):
+        for column, name in enumerate(names):
+            view[name] = values[:, column]
+        return encoder.encode(0.0)
+
+    results.append(("encode_encoder_arrays", params, measure(vectorized, list(batches))))
+    return results
+
+
+def bench_udp_vision(packets: list, burst: int = 32) -> dict:
+    """Multicast loopback: send bursts and drain them through VisionReceiver (create_multicast_socket)"""
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    sender.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+    sender.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+    address = (MULTICAST_GROUP, BENCH_VISION_PORT)
+    received = 0
+    with VisionReceiver(MULTICAST_GROUP, BENCH_VISION_PORT) as receiver:
+        start = time.perf_counter()
+        for i in range(0, len(packets), burst):
+            for data in packets[i:i + burst]:
+                sender.sendto(data, address)
+            received += len(receiver.poll(timeout=0.05))
+        received += len(receiver.poll(timeout=0.05))
+        elapsed = time.perf_counter() - start
+        kernel_drops = receiver.stats.kernel_drops
+    sender.close()
+    return {"packets_per_s": received / elapsed, "sent": len(packets), "received": received,
+            "kernel_drops": kernel_drops}
+
+
+def bench_udp_commands(batches: np.ndarray) -> dict:
+    """send_command to a bound loopback socket, counting what arrives"""
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.bind(("127.0.0.1", BENCH_COMMAND_PORT))
+    sink.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+    sink.setblocking(False)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    address = sink.getsockname()
+    commands = [[create_robot_command(i, *row) for i, row in enumerate(values.tolist())] for values in batches]
+
+    received = 0
+    start = time.perf_counter()
+    for batch in commands:
+        send_command(sock, address, batch)
+        try:
+            while True:
+                sink.recv(65535)
+                received += 1
+        except BlockingIOError:
+            pass
+    elapsed = time.perf_counter() - start
+    sock.close()
+    sink.close()
+    return {"packets_per_s": len(commands) / elapsed, "sent": len(commands), "received": received}
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "numpy": np.__version__,
+        "protobuf": google.protobuf.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "commit": commit,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def run(quick: bool = False) -> dict:
+    ticks = 200 if quick else 1000
+    results = []
+    for cameras in (1, 4, 8):
+        for robots_per_team in ((16,) if quick else (6, 11, 16)):
+            for name, params, metrics in bench_decode(cameras, robots_per_team, ticks):
+                results.append({"name": name, "params": params, **metrics})
+            print(f"  decode: {cameras} cameras, {robots_per_team} robots per team", file=sys.stderr)
+    for robots in ((16,) if quick else (6, 11, 16)):
+        for name, params, metrics in bench_encode(robots, ticks):
+            results.append({"name": name, "params": params, **metrics})
+        print(f"  encode: {robots} robots", file=sys.stderr)
+
+    packets = vision_stream(4, 16, ticks // 4)
+    results.append({"name": "udp_vision_loopback", "params": {"cameras": 4, "robots_per_team": 16},
+                    **bench_udp_vision(packets)})
+    results.append({"name": "udp_command_loopback", "params": {"robots": 16},
+                    **bench_udp_commands(command_batches(16, ticks))})
+    print("  udp loopback", file=sys.stderr)
+    return {"environment": environment(), "results": results}
+
+
+def _key(result: dict) -> str:
+    params = {k: v for k, v in result["params"].items() if k != "bytes_per_packet"}
+    return result["name"] + json.dumps(params, sort_keys=True)
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """Results whose throughput dropped by more than threshold (a fraction) against baseline"""
+    previous = {_key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        old = previous.get(_key(result))
+        metric = "ops_per_s" if "ops_per_s" in result else "packets_per_s"
+        if old is None or metric not in old:
+            continue
+        change = result[metric] / old[metric] - 1
+        if change < -threshold:
+            regressions.append((_key(result), old[metric], result[metric], change))
+    return regressions
+
+
+def print_table(report: dict):
+    print(f"{'benchmark':<24} {'params':<44} {'rate/s':>12} {'us/op':>9} {'peak B/op':>10}")
+    for result in report["results"]:
+        params = ", ".join(f"{k}={v:.0f}" if isinstance(v, float) else f"{k}={v}" for k, v in result["params"].items())
+        rate = result.get("ops_per_s", result.get("packets_per_s"))
+        us = result.get("us_per_op")
+        peak = result.get("peak_bytes_per_op")
+        print(f"{result['name']:<24} {params:<44} {rate:12.0f} "
+              f"{'' if us is None else f'{us:9.2f}'} {'' if peak is None else f'{peak:10.0f}'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--out", help="Write the results as JSON (default: stdout)")
+    parser.add_argument("--compare", help="Baseline JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed throughput drop (fraction)")
+    parser.add_argument("--quick", action="store_true", help="Fewer configurations and ticks")
+    args = parser.parse_args()
+
+    print("Running benchmarks...", file=sys.stderr)
+    report = run(args.quick)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print_table(report)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for key, old, new, change in regressions:
+            print(f"REGRESSION {key}: {old:.0f}/s -> {new:.0f}/s ({change:+.0%})", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
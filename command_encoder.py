@@ -0,0 +1,205 @@
+"""
+Script to encode grSim command packets without rebuilding protobuf messages
+The packet layout for a fixed set of robots is encoded once; every tick only
+the float fields and the timestamp are patched into the reused buffer
+
+Run directly to check the output against send_robot_command and compare speed
+"""
+import socket
+import struct
+import time
+
+import numpy as np
+
+from send_robot_command import create_robot_command, build_packet
+from wire import VARINT, FIXED64, LENGTH_DELIMITED, FIXED32, encode_varint
+
+# Body of one grSim_Robot_Command after the id:
+# kickspeedx, kickspeedz, veltangent, velnormal, velangular, spinner, wheelsspeed
+_ROBOT_BODY = struct.Struct("<BfBfBfBfBfBBBB")
+# wheel1..wheel4, appended to the body when wheelsspeed is set
+_ROBOT_WHEELS = struct.Struct("<BfBfBfBf")
+# Patch from kickspeedx through spinner, rewriting the tag bytes in between
+_ROBOT_PATCH = struct.Struct("<fBfBfBfBfBB")
+# Offset of the wheel1 value from the kickspeedx value
+_WHEELS_OFFSET = 29
+_TIMESTAMP = struct.Struct("<d")
+
+
+def _tag(field_number: int, wire_type: int) -> int:
+    return field_number << 3 | wire_type
+
+
+class CommandEncoder:
+    """Pre-encoded grSim_Packet carrying commands for a fixed set of robots of one team
+
+    Produces the same bytes as send_robot_command.send_command for the same commands.
+    With wheels=True the packet sets wheelsspeed and carries wheel1..wheel4, which grSim
+    then uses instead of the velocities.
+    """
+
+    def __init__(self, robot_ids, is_yellow: bool = False, wheels: bool = False):
+        self.robot_ids = list(robot_ids)
+        self.is_yellow = is_yellow
+        self.wheels = wheels
+        self._index = {robot_id: i for i, robot_id in enumerate(self.robot_ids)}
+
+        robots = []
+        value_offsets = []  # Offset of the kickspeedx value within each robot field
+        for robot_id in self.robot_ids:
+            body = bytes([_tag(1, VARINT)]) + encode_varint(robot_id) + _ROBOT_BODY.pack(
+                _tag(2, FIXED32), 0.0, _tag(3, FIXED32), 0.0, _tag(4, FIXED32), 0.0,
+                _tag(5, FIXED32), 0.0, _tag(6, FIXED32), 0.0,
+                _tag(7, VARINT), 0, _tag(8, VARINT), int(wheels),
+            )
+            if wheels:
+                body += _ROBOT_WHEELS.pack(
+                    _tag(9, FIXED32), 0.0, _tag(10, FIXED32), 0.0, _tag(11, FIXED32), 0.0, _tag(12, FIXED32), 0.0
+                )
+            prefix = bytes([_tag(3, LENGTH_DELIMITED)]) + encode_varint(len(body))
+            robots.append(prefix + body)
+            value_offsets.append(len(prefix) + 1 + len(encode_varint(robot_id)) + 1)
+
+        commands = bytes([_tag(1, FIXED64)]) + bytes(8) + bytes([_tag(2, VARINT), int(is_yellow)])
+        robots_start = len(commands)
+        commands += b"".join(robots)
+        header = bytes([_tag(1, LENGTH_DELIMITED)]) + encode_varint(len(commands))
+        self.buffer = bytearray(header + commands)
+
+        self._timestamp_offset = len(header) + 1
+        self._offsets = []
+        offset = len(header) + robots_start
+        for robot, value_offset in zip(robots, value_offsets):
+            self._offsets.append(offset + value_offset)
+            offset += len(robot)
+
+        # When every robot has the same size, expose the fields as a strided array
+        self.commands = None
+        if len(set(len(r) for r in robots)) == 1 and robots:
+            start = self._offsets[0]
+            stride = len(robots[0])
+            names = ["kickspeedx", "kickspeedz", "veltangent", "velnormal", "velangular", "spinner"]
+            formats = ["<f4", "<f4", "<f4", "<f4", "<f4", "u1"]
+            offsets = [0, 5, 10, 15, 20, 25]
+            if wheels:
+                names += ["wheel1", "wheel2", "wheel3", "wheel4"]
+                formats += ["<f4"] * 4
+                offsets += [_WHEELS_OFFSET + 5 * i for i in range(4)]
+            dtype = np.dtype({
+                "names": names,
+                "formats": formats,
+                "offsets": offsets,
+                "itemsize": offsets[-1] + (1 if not wheels else 4),
+            })
+            view = np.frombuffer(self.buffer, dtype=np.uint8)
+            self.commands = np.ndarray(
+                len(robots), dtype=dtype, buffer=view, offset=start, strides=(stride,)
+            )
+
+    def set_command(
+        self,
+        robot_id: int,
+        veltangent: float = 0.0,
+        velnormal: float = 0.0,
+        velangular: float = 0.0,
+        kickspeedx: float = 0.0,
+        kickspeedz: float = 0.0,
+        spinner: bool = False,
+    ):
+        """Patch the command of one robot"""
+        _ROBOT_PATCH.pack_into(
+            self.buffer, self._offsets[self._index[robot_id]],
+            kickspeedx, _tag(3, FIXED32), kickspeedz, _tag(4, FIXED32), veltangent,
+            _tag(5, FIXED32), velnormal, _tag(6, FIXED32), velangular,
+            _tag(7, VARINT), 1 if spinner else 0,
+        )
+
+    def set_wheels(self, speeds):
+        """Write (n, 4) wheel1..wheel4 speeds, one row per robot in robot_ids order"""
+        if not self.wheels:
+            raise ValueError("CommandEncoder was created without wheels")
+        if self.commands is not None:
+            speeds = np.asarray(speeds)
+            for i, name in enumerate(("wheel1", "wheel2", "wheel3", "wheel4")):
+                self.commands[name] = speeds[:, i]
+            return
+        for offset, row in zip(self._offsets, speeds):
+            _ROBOT_WHEELS.pack_into(
+                self.buffer, offset + _WHEELS_OFFSET - 1,
+                _tag(9, FIXED32), row[0], _tag(10, FIXED32), row[1],
+                _tag(11, FIXED32), row[2], _tag(12, FIXED32), row[3],
+            )
+
+    def stop_all(self):
+        """Zero every robot's velocities, kicks and dribbler (and wheel speeds)"""
+        for robot_id in self.robot_ids:
+            self.set_command(robot_id)
+        if self.wheels:
+            self.set_wheels(np.zeros((len(self.robot_ids), 4)))
+
+    def encode(self, timestamp: float = None) -> bytearray:
+        """Patch the timestamp and return the reused packet buffer"""
+        _TIMESTAMP.pack_into(
+            self.buffer, self._timestamp_offset, time.time() if timestamp is None else timestamp
+        )
+        return self.buffer
+
+    def send(self, sock: socket.socket, address: tuple, timestamp: float = None):
+        """Send the current commands to grSim; timestamp as in send_robot_command.send_command"""
+        sock.sendto(self.encode(timestamp), address)
+
+
+def main():
+    print("Checking CommandEncoder against send_robot_command...")
+    rng = np.random.default_rng(0)
+    robot_ids = list(range(16))
+    values = rng.uniform(-3, 3, size=(1000, len(robot_ids), 5)).astype(np.float32).astype(float)
+    spinners = rng.random((1000, len(robot_ids))) < 0.5
+
+    for is_yellow in (False, True):
+        encoder = CommandEncoder(robot_ids, is_yellow)
+        for tick in range(len(values)):
+            commands = []
+            for i, robot_id in enumerate(robot_ids):
+                vt, vn, va, kx, kz = values[tick, i]
+                spinner = bool(spinners[tick, i])
+                encoder.set_command(robot_id, vt, vn, va, kx, kz, spinner)
+                commands.append(create_robot_command(robot_id, vt, vn, va, kx, kz, spinner))
+            expected = build_packet(commands, is_yellow, timestamp=tick * 0.016).SerializeToString()
+            assert encoder.encode(timestamp=tick * 0.016) == expected
+    print(f"  {2 * len(values)} packets match")
+
+    # Benchmark one 16-robot team over a loopback socket
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    address = ("127.0.0.1", 9)  # Discard port: nothing needs to listen
+    ticks = 2000
+
+    start = time.perf_counter()
+    for tick in range(ticks):
+        commands = [create_robot_command(robot_id, veltangent=1.0, velangular=0.5) for robot_id in robot_ids]
+        sock.sendto(build_packet(commands, False).SerializeToString(), address)
+    slow = time.perf_counter() - start
+
+    encoder = CommandEncoder(robot_ids)
+    start = time.perf_counter()
+    for tick in range(ticks):
+        for robot_id in robot_ids:
+            encoder.set_command(robot_id, veltangent=1.0, velangular=0.5)
+        encoder.send(sock, address)
+    fast = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for tick in range(ticks):
+        encoder.commands["veltangent"] = 1.0
+        encoder.commands["velangular"] = 0.5
+        encoder.send(sock, address)
+    vectorized = time.perf_counter() - start
+    sock.close()
+
+    print(f"  Protobuf:              {slow / ticks * 1e6:.1f}us/tick")
+    print(f"  CommandEncoder:        {fast / ticks * 1e6:.1f}us/tick ({slow / fast:.1f}x)")
+    print(f"  CommandEncoder arrays: {vectorized / ticks * 1e6:.1f}us/tick ({slow / vectorized:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,46 +1,150 @@
 """
 Script to compile proto files for Python
+All of proto/ is compiled in one protoc run into the generated package, with
+the imports between modules made package-relative. A hash of every .proto is
+kept next to the output, so the build is skipped while nothing has changed.
+generated/__init__.py indexes every message and enum, and loads its module on
+first access:
+
+    from generated import SSL_WrapperPacket
+
+Usage:
+    python compile_proto.py [--force]
 """
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import re
 import subprocess
 import sys
-import os
 
-def main():
-    proto_dir = "proto"
-    output_dir = "generated"
-    
-    # Create output directory
-    os.makedirs(output_dir, exist_ok=True)
-    
-    # Compile grSim-related proto files
-    proto_files = [
-        "grSim_Commands.proto",
-        "grSim_Replacement.proto",
-        "grSim_Packet.proto",
-        "ssl_vision_detection.proto",
-        "ssl_vision_geometry.proto",
-        "ssl_vision_wrapper.proto",
-    ]
-    
+PROTO_DIR = "proto"
+OUTPUT_DIR = "generated"
+HASH_FILE = os.path.join(OUTPUT_DIR, "proto_hashes.json")
+
+# protoc writes absolute imports (import x_pb2 as y), which need the output folder on sys.path
+ABSOLUTE_IMPORT = re.compile(r"^import (\w+_pb2) as (\w+)$", re.MULTILINE)
+
+INIT_TEMPLATE = '''"""
+Generated protobuf modules; written by compile_proto.py, do not edit
+Messages and enums are imported from their module on first access and cached:
+
+    from generated import SSL_WrapperPacket
+"""
+import importlib
+
+_MODULES = {{
+{entries}
+}}
+
+__all__ = sorted(_MODULES)
+
+
+def __getattr__(name):
+    module = _MODULES.get(name)
+    if module is None:
+        raise AttributeError(f"module {{__name__!r}} has no attribute {{name!r}}")
+    value = getattr(importlib.import_module(f".{{module}}", __name__), name)
+    globals()[name] = value  # Later lookups no longer reach __getattr__
+    return value
+
+
+def __dir__():
+    return __all__
+'''
+
+
+def proto_hashes(proto_dir: str = PROTO_DIR) -> dict:
+    hashes = {}
+    for name in sorted(os.listdir(proto_dir)):
+        if name.endswith(".proto"):
+            with open(os.path.join(proto_dir, name), "rb") as f:
+                hashes[name] = hashlib.sha256(f.read()).hexdigest()
+    return hashes
+
+
+def up_to_date(hashes: dict) -> bool:
+    try:
+        with open(HASH_FILE) as f:
+            previous = json.load(f)
+    except (OSError, ValueError):
+        return False
+    outputs = (os.path.join(OUTPUT_DIR, module_name(name) + ".py") for name in hashes)
+    return previous == hashes and all(os.path.exists(path) for path in outputs)
+
+
+def module_name(proto_file: str) -> str:
+    return proto_file[:-len(".proto")] + "_pb2"
+
+
+def compile_all(proto_files: list):
+    cmd = [
+        sys.executable, "-m", "grpc_tools.protoc",
+        f"--proto_path={PROTO_DIR}",
+        f"--python_out={OUTPUT_DIR}",
+    ] + [f"{PROTO_DIR}/{proto_file}" for proto_file in proto_files]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"Error: {result.stderr}")
+        sys.exit(1)
+
     for proto_file in proto_files:
-        cmd = [
-            sys.executable, "-m", "grpc_tools.protoc",
-            f"--proto_path={proto_dir}",
-            f"--python_out={output_dir}",
-            f"{proto_dir}/{proto_file}"
-        ]
-        print(f"Compiling {proto_file}...")
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode != 0:
-            print(f"Error: {result.stderr}")
-            sys.exit(1)
-    
-    # Create __init__.py
-    init_file = os.path.join(output_dir, "__init__.py")
+        path = os.path.join(OUTPUT_DIR, module_name(proto_file) + ".py")
+        with open(path) as f:
+            source = f.read()
+        with open(path, "w") as f:
+            f.write(ABSOLUTE_IMPORT.sub(r"from . import \1 as \2", source))
+
+
+def write_index(proto_files: list):
+    """Write generated/__init__.py mapping each top-level message and enum to its module"""
+    # Start from an empty package so the modules import without the previous index
+    init_file = os.path.join(OUTPUT_DIR, "__init__.py")
     with open(init_file, "w") as f:
         f.write("")
-    
-    print("Proto files compiled successfully!")
+    importlib.invalidate_caches()
+
+    index = {}
+    for proto_file in proto_files:
+        module = module_name(proto_file)
+        descriptor = importlib.import_module(f"{OUTPUT_DIR}.{module}").DESCRIPTOR
+        for name in list(descriptor.message_types_by_name) + list(descriptor.enum_types_by_name):
+            if name in index:
+                print(f"Error: {name} is defined in both {index[name]} and {module}")
+                sys.exit(1)
+            index[name] = module
+
+    entries = "\n".join(f"    {name!r}: {module!r}," for name, module in sorted(index.items()))
+    with open(init_file, "w") as f:
+        f.write(INIT_TEMPLATE.format(entries=entries))
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile proto/ into the generated package")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if no .proto changed")
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    hashes = proto_hashes()
+    if not args.force and up_to_date(hashes):
+        print("Proto files unchanged, nothing to compile")
+        return
+
+    proto_files = list(hashes)
+    print(f"Compiling {len(proto_files)} proto files...")
+    compile_all(proto_files)
+    index = write_index(proto_files)
+    with open(HASH_FILE, "w") as f:
+        json.dump(hashes, f, indent=2)
+        f.write("\n")
+
+    print(f"Proto files compiled successfully! ({len(index)} messages and enums)")
+
 
 if __name__ == "__main__":
     main()
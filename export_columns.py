@@ -0,0 +1,152 @@
+"""
+Script to export a recorded vision log to columnar NumPy arrays
+Robots and balls of every detection frame are written as one .npy file per
+column, which analysis code can load (or memory-map) in one call. The log is
+split into chunks that are decoded in parallel by a process pool, so memory
+stays bounded by the chunk size
+
+Usage:
+    python export_columns.py match.log match_columns/ [--chunk-size 20000] [--workers 4]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from fast_decoder import FastDecoder
+from vision_fusion import BLUE, YELLOW
+from vision_log import VisionLogReader, load_index
+
+ROBOT_COLUMNS = {
+    "t_capture": "<f8",
+    "camera_id": "<u4",
+    "team": "u1",
+    "robot_id": "<i4",
+    "x": "<f4",
+    "y": "<f4",
+    "orientation": "<f4",
+    "confidence": "<f4",
+}
+BALL_COLUMNS = {
+    "t_capture": "<f8",
+    "camera_id": "<u4",
+    "x": "<f4",
+    "y": "<f4",
+    "z": "<f4",
+    "confidence": "<f4",
+}
+TABLES = {"robots": ROBOT_COLUMNS, "balls": BALL_COLUMNS}
+
+
+def export_chunk(log_path: str, start: int, stop: int, chunk_path: str) -> dict:
+    """Decode records [start, stop) of a log into a .npz of columns; returns row counts per table"""
+    decoder = FastDecoder()
+    robots = {name: [] for name in ROBOT_COLUMNS}
+    balls = {name: [] for name in BALL_COLUMNS}
+
+    with VisionLogReader(log_path) as reader:
+        for i in range(start, stop):
+            payload = reader.packet(i)
+            frame = decoder.decode(payload)
+            payload.release()
+            if not frame.has_detection:
+                continue
+
+            for team, rows in ((BLUE, frame.robots_blue), (YELLOW, frame.robots_yellow)):
+                if not len(rows):
+                    continue
+                robots["t_capture"].append(np.full(len(rows), frame.t_capture))
+                robots["camera_id"].append(np.full(len(rows), frame.camera_id))
+                robots["team"].append(np.full(len(rows), team))
+                for name in ("robot_id", "x", "y", "orientation", "confidence"):
+                    robots[name].append(rows[name].copy())
+
+            if len(frame.balls):
+                balls["t_capture"].append(np.full(len(frame.balls), frame.t_capture))
+                balls["camera_id"].append(np.full(len(frame.balls), frame.camera_id))
+                for name in ("x", "y", "z", "confidence"):
+                    balls[name].append(frame.balls[name].copy())
+
+    arrays = {}
+    counts = {}
+    for table, columns, values in (("robots", ROBOT_COLUMNS, robots), ("balls", BALL_COLUMNS, balls)):
+        for name, dtype in columns.items():
+            parts = values[name]
+            arrays[f"{table}.{name}"] = (np.concatenate(parts) if parts else np.zeros(0)).astype(dtype)
+        counts[table] = len(arrays[f"{table}.t_capture"])
+    np.savez(chunk_path, **arrays)
+    return counts
+
+
+def export_log(log_path: str, out_dir: str, chunk_size: int = 20000, workers: int = None) -> dict:
+    """Export a log to out_dir/<table>/<column>.npy; returns row counts per table"""
+    records = len(load_index(log_path))
+    ranges = [(start, min(start + chunk_size, records)) for start in range(0, records, chunk_size)]
+
+    tmp_dir = tempfile.mkdtemp(prefix="export_columns_")
+    try:
+        chunk_paths = [os.path.join(tmp_dir, f"chunk{i:06d}.npz") for i in range(len(ranges))]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            counts = list(pool.map(
+                export_chunk,
+                [log_path] * len(ranges),
+                [start for start, _ in ranges],
+                [stop for _, stop in ranges],
+                chunk_paths,
+            ))
+
+        # Concatenate the chunks in order into memory-mapped output columns
+        totals = {table: sum(c[table] for c in counts) for table in TABLES}
+        outputs = {}
+        for table, columns in TABLES.items():
+            os.makedirs(os.path.join(out_dir, table), exist_ok=True)
+            for name, dtype in columns.items():
+                outputs[f"{table}.{name}"] = np.lib.format.open_memmap(
+                    os.path.join(out_dir, table, f"{name}.npy"), mode="w+", dtype=dtype, shape=(totals[table],)
+                )
+
+        offsets = {table: 0 for table in TABLES}
+        for chunk_path, chunk_counts in zip(chunk_paths, counts):
+            with np.load(chunk_path) as chunk:
+                for key, output in outputs.items():
+                    table = key.split(".")[0]
+                    output[offsets[table]:offsets[table] + chunk_counts[table]] = chunk[key]
+            for table in TABLES:
+                offsets[table] += chunk_counts[table]
+
+        for output in outputs.values():
+            output.flush()
+        return totals
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def load_columns(out_dir: str, table: str = "robots", mmap: bool = True) -> dict:
+    """Load the columns of an exported table as a dict of arrays"""
+    return {
+        name: np.load(os.path.join(out_dir, table, f"{name}.npy"), mmap_mode="r" if mmap else None)
+        for name in TABLES[table]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("log")
+    parser.add_argument("out_dir")
+    parser.add_argument("--chunk-size", type=int, default=20000, help="Log records per worker task")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    totals = export_log(args.log, args.out_dir, args.chunk_size, args.workers)
+    elapsed = time.perf_counter() - start
+    print(f"Exported {totals['robots']} robot rows and {totals['balls']} ball rows "
+          f"to {args.out_dir} in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,480 @@
+"""
+Script to decode SSL_WrapperPacket datagrams into structured NumPy arrays
+Detection frames are read from the protobuf wire format into reused arrays,
+without building the protobuf message; geometry is rebuilt only when it
+changes. read_detection_header reads just the frame header
+
+Run directly to check the decoder against the generated ssl_vision_wrapper_pb2
+"""
+import math
+import random
+import struct
+import time
+
+import numpy as np
+
+from field_geometry import FieldGeometryCache
+from generated import SSL_GeometryData, SSL_WrapperPacket
+from wire import VARINT, FIXED64, LENGTH_DELIMITED, FIXED32, read_varint, skip_field
+
+# Missing optional fields are reported as robot_id -1 and NaN floats
+ROBOT_DTYPE = np.dtype([
+    ("x", "<f4"),
+    ("y", "<f4"),
+    ("orientation", "<f4"),
+    ("confidence", "<f4"),
+    ("robot_id", "<i4"),
+])
+BALL_DTYPE = np.dtype([
+    ("x", "<f4"),
+    ("y", "<f4"),
+    ("z", "<f4"),
+    ("confidence", "<f4"),
+])
+
+_unpack_double = struct.Struct("<d").unpack_from
+
+
+def read_detection_header(data):
+    """Return (frame_number, t_capture, t_sent, camera_id) of a wrapper packet, or None without detection
+
+    Only the scalar fields at the start of the detection frame are read.
+    """
+    data = bytes(data)
+    pos = 0
+    end = len(data)
+    while pos < end:
+        tag, pos = read_varint(data, pos)
+        if tag != 1 << 3 | LENGTH_DELIMITED:
+            pos = skip_field(data, pos, tag & 7)
+            continue
+        length, pos = read_varint(data, pos)
+        end = pos + length
+        frame_number = camera_id = 0
+        t_capture = t_sent = 0.0
+        while pos < end:
+            tag, pos = read_varint(data, pos)
+            if tag == 1 << 3 | VARINT:
+                frame_number, pos = read_varint(data, pos)
+            elif tag == 2 << 3 | FIXED64:
+                t_capture = _unpack_double(data, pos)[0]
+                pos += 8
+            elif tag == 3 << 3 | FIXED64:
+                t_sent = _unpack_double(data, pos)[0]
+                pos += 8
+            elif tag == 4 << 3 | VARINT:
+                camera_id, pos = read_varint(data, pos)
+            elif tag & 7 == LENGTH_DELIMITED:
+                break  # Balls and robots follow the scalar fields
+            else:
+                pos = skip_field(data, pos, tag & 7)
+        return frame_number, t_capture, t_sent, camera_id
+    return None
+
+
+class DecodedFrame:
+    """Detection fields of one SSL_WrapperPacket
+
+    The frame and its arrays are reused by the next decode; copy what must outlive it.
+    Without a detection frame the arrays are empty and the scalars are zero.
+    """
+    __slots__ = ("has_detection", "frame_number", "t_capture", "t_sent", "camera_id",
+                 "balls", "robots_blue", "robots_yellow", "geometry")
+
+    def __init__(self):
+        self.has_detection = False
+        self.frame_number = 0
+        self.t_capture = 0.0
+        self.t_sent = 0.0
+        self.camera_id = 0
+        self.balls = np.zeros(0, BALL_DTYPE)
+        self.robots_blue = np.zeros(0, ROBOT_DTYPE)
+        self.robots_yellow = np.zeros(0, ROBOT_DTYPE)
+        self.geometry = None  # SSL_GeometryData, or None if the packet has none
+
+
+# Field tags: field number << 3 | wire type
+_DETECTION = 1 << 3 | LENGTH_DELIMITED
+_GEOMETRY = 2 << 3 | LENGTH_DELIMITED
+_FRAME_NUMBER = 1 << 3 | VARINT
+_T_CAPTURE = 2 << 3 | FIXED64
+_T_SENT = 3 << 3 | FIXED64
+_CAMERA_ID = 4 << 3 | VARINT
+_BALLS = 5 << 3 | LENGTH_DELIMITED
+_ROBOTS_YELLOW = 6 << 3 | LENGTH_DELIMITED
+_ROBOTS_BLUE = 7 << 3 | LENGTH_DELIMITED
+# SSL_DetectionBall and SSL_DetectionRobot share the numbers of these fields
+_CONFIDENCE = 1 << 3 | FIXED32
+_ROBOT_ID = _AREA = 2 << 3 | VARINT
+_X = 3 << 3 | FIXED32
+_Y = 4 << 3 | FIXED32
+_ORIENTATION = _Z = 5 << 3 | FIXED32
+_PIXEL_X = 6 << 3 | FIXED32
+_PIXEL_Y = 7 << 3 | FIXED32
+_HEIGHT = 8 << 3 | FIXED32
+
+# Robots as sent by SSL-Vision and grSim: all fields in order and a one-byte robot_id.
+# Other layouts take the generic path
+_ROBOT_HEAD = (_CONFIDENCE, _ROBOT_ID, _X, _Y, _ORIENTATION)
+# Offsets from the robots_* tag byte of each field tag, and of the one-byte robot_id
+_ROBOT_TAG_OFFSETS = ((2, _CONFIDENCE), (7, _ROBOT_ID), (9, _X), (14, _Y), (19, _ORIENTATION),
+                      (24, _PIXEL_X), (29, _PIXEL_Y), (34, _HEIGHT))
+_ROBOT_ID_OFFSET = 8
+
+
+def _robot_layout(tail: tuple):
+    """(unpack, tail tags, wire dtype, tag offsets) of a fixed robot layout ending in the given tags"""
+    length = 22 + 5 * len(tail)
+    unpack = struct.Struct("<BfBBBfBfBf" + "B4x" * len(tail)).unpack_from
+    # Consecutive robots in this layout, read in place as the fields of ROBOT_DTYPE
+    wire_dtype = np.dtype({"names": list(ROBOT_DTYPE.names), "formats": ["<f4", "<f4", "<f4", "<f4", "u1"],
+                           "offsets": [10, 15, 20, 3, _ROBOT_ID_OFFSET], "itemsize": length + 2})
+    tag_offsets = tuple((offset, bytes((tag,))) for offset, tag in _ROBOT_TAG_OFFSETS[:5 + len(tail)])
+    return length, (unpack, tail, wire_dtype, tag_offsets)
+
+
+_ROBOT_LAYOUTS = dict((_robot_layout((_PIXEL_X, _PIXEL_Y)), _robot_layout((_PIXEL_X, _PIXEL_Y, _HEIGHT))))
+# Shorter runs of robots are cheaper to unpack one by one than to copy with NumPy
+_MIN_ROBOT_RUN = 4
+
+_unpack_float = struct.Struct("<f").unpack_from
+_pack_robot = struct.Struct("<ffffi").pack_into
+_pack_ball = struct.Struct("<ffff").pack_into
+_unpack_ball = struct.Struct("<BfBf").unpack_from  # x and y with their tags
+
+
+class FastDecoder:
+    """Decode SSL_WrapperPacket datagrams into structured NumPy arrays
+
+    Detection frames are read from the wire format straight into reused
+    arrays, without building the protobuf message. Robots in the fixed layout
+    sent by SSL-Vision and grSim are read with one struct unpack each.
+    Geometry is parsed by protobuf and kept in a FieldGeometryCache.
+    """
+
+    def __init__(self, capacity: int = 16):
+        self.geometry_cache = FieldGeometryCache()
+        self._geometry = SSL_GeometryData()
+        self._frame = DecodedFrame()
+        self._robots = [np.zeros(capacity, ROBOT_DTYPE), np.zeros(capacity, ROBOT_DTYPE)]
+        self._balls = np.zeros(capacity, BALL_DTYPE)
+
+    def decode(self, data) -> DecodedFrame:
+        """Decode one datagram (bytes or memoryview); the returned frame is reused by the next call"""
+        frame = self._frame
+        frame.has_detection = False
+        frame.frame_number = frame.camera_id = 0
+        frame.t_capture = frame.t_sent = 0.0
+        frame.geometry = None
+        self._counts = [0, 0, 0]  # blue, yellow, balls
+        try:
+            pos = 0
+            end = len(data)
+            while pos < end:
+                tag, pos = read_varint(data, pos)
+                if tag == _DETECTION or tag == _GEOMETRY:
+                    length, pos = read_varint(data, pos)
+                    if pos + length > end:
+                        raise ValueError("Field exceeds the datagram")
+                    if tag == _DETECTION:
+                        frame.has_detection = True
+                        self._decode_detection(data, pos, pos + length)
+                    else:
+                        self._geometry.ParseFromString(data[pos:pos + length])
+                        self.geometry_cache.update(self._geometry)
+                        frame.geometry = self.geometry_cache.geometry
+                    pos += length
+                else:
+                    pos = skip_field(data, pos, tag & 7)
+            if pos != end:
+                raise ValueError("Truncated field")
+        except (IndexError, struct.error) as e:
+            raise ValueError(f"Malformed SSL_WrapperPacket: {e}") from e
+        blue, yellow, balls = self._counts
+        frame.robots_blue = self._robots[0][:blue]
+        frame.robots_yellow = self._robots[1][:yellow]
+        frame.balls = self._balls[:balls]
+        return frame
+
+    def _decode_detection(self, data, pos: int, end: int):
+        frame = self._frame
+        counts = self._counts
+        robots = self._robots
+        row_size = ROBOT_DTYPE.itemsize
+        plain_until = 0  # Robots before this position are unpacked one by one
+        while pos < end:
+            tag = data[pos]
+            if tag == _ROBOTS_BLUE or tag == _ROBOTS_YELLOW:
+                length = data[pos + 1]
+                layout = _ROBOT_LAYOUTS.get(length)
+                stride = length + 2
+                if layout is not None and pos + stride <= end:
+                    team = 0 if tag == _ROBOTS_BLUE else 1
+                    if pos >= plain_until:
+                        stop = pos + stride
+                        while stop + stride <= end and data[stop] == tag and data[stop + 1] == length:
+                            stop += stride
+                        if stop - pos >= _MIN_ROBOT_RUN * stride and self._copy_robots(team, data, pos, stop, layout):
+                            pos = stop
+                            continue
+                        plain_until = stop
+
+                    v = layout[0](data, pos + 2)
+                    # v[3] is the robot_id varint, which must fit in one byte
+                    if v[10:] == layout[1] and v[:10:2] == _ROBOT_HEAD and v[3] < 0x80:
+                        n = counts[team]
+                        if n == len(robots[team]):
+                            self._grow_robots(team)
+                        _pack_robot(robots[team], n * row_size, v[5], v[7], v[9], v[1], v[3])
+                        counts[team] = n + 1
+                        pos += stride
+                        continue
+
+            if tag < 0x80:  # One-byte tag, as for every field of the detection frame
+                pos += 1
+            else:
+                tag, pos = read_varint(data, pos)
+            if tag == _FRAME_NUMBER:
+                frame.frame_number, pos = read_varint(data, pos)
+            elif tag == _T_CAPTURE:
+                frame.t_capture = _unpack_double(data, pos)[0]
+                pos += 8
+            elif tag == _T_SENT:
+                frame.t_sent = _unpack_double(data, pos)[0]
+                pos += 8
+            elif tag == _CAMERA_ID:
+                frame.camera_id, pos = read_varint(data, pos)
+            elif tag == _ROBOTS_BLUE or tag == _ROBOTS_YELLOW or tag == _BALLS:
+                length, pos = read_varint(data, pos)
+                if pos + length > end:
+                    raise ValueError("Field exceeds the detection frame")
+                if tag == _BALLS:
+                    self._add_ball(data, pos, pos + length)
+                else:
+                    self._add_robot(0 if tag == _ROBOTS_BLUE else 1, data, pos, pos + length)
+                pos += length
+            else:
+                pos = skip_field(data, pos, tag & 7)
+        if pos != end:
+            raise ValueError("Field exceeds the detection frame")
+
+    def _copy_robots(self, team: int, data, pos: int, stop: int, layout) -> bool:
+        """Copy consecutive robots of one layout with one cast; False if any of them deviates from it"""
+        _, _, wire_dtype, tag_offsets = layout
+        stride = wire_dtype.itemsize
+        count = (stop - pos) // stride
+        for offset, tag in tag_offsets:
+            if data[pos + offset:stop:stride] != tag * count:
+                return False
+        if max(data[pos + _ROBOT_ID_OFFSET:stop:stride]) >= 0x80:
+            return False
+        n = self._counts[team]
+        while n + count > len(self._robots[team]):
+            self._grow_robots(team)
+        self._robots[team][n:n + count] = np.frombuffer(data, wire_dtype, count, pos)
+        self._counts[team] = n + count
+        return True
+
+    def _add_robot(self, team: int, data, pos: int, end: int):
+        """Generic path for a robot in any field order, with missing optional or unknown fields"""
+        x = y = confidence = 0.0
+        orientation = math.nan
+        robot_id = -1
+        while pos < end:
+            tag = data[pos]
+            if tag < 0x80:
+                pos += 1
+            else:
+                tag, pos = read_varint(data, pos)
+            if tag == _X:
+                x = _unpack_float(data, pos)[0]
+                pos += 4
+            elif tag == _Y:
+                y = _unpack_float(data, pos)[0]
+                pos += 4
+            elif tag == _ORIENTATION:
+                orientation = _unpack_float(data, pos)[0]
+                pos += 4
+            elif tag == _CONFIDENCE:
+                confidence = _unpack_float(data, pos)[0]
+                pos += 4
+            elif tag == _ROBOT_ID:
+                robot_id, pos = read_varint(data, pos)
+            else:
+                pos = skip_field(data, pos, tag & 7)
+        if pos != end:
+            raise ValueError("Field exceeds the robot")
+        n = self._counts[team]
+        if n == len(self._robots[team]):
+            self._grow_robots(team)
+        _pack_robot(self._robots[team], n * ROBOT_DTYPE.itemsize,
+                    x, y, orientation, confidence, min(robot_id, 0x7FFFFFFF))
+        self._counts[team] = n + 1
+
+    def _add_ball(self, data, pos: int, end: int):
+        # Balls as sent by SSL-Vision and grSim: confidence, area, x, y, optional z, pixel_x, pixel_y
+        if data[pos] == _CONFIDENCE and data[pos + 5] == _AREA:
+            p = pos + 6
+            while data[p] >= 0x80:
+                p += 1
+            v = _unpack_ball(data, p + 1)
+            if v[0] == _X and v[2] == _Y:
+                if data[p + 11] == _Z:
+                    z = _unpack_float(data, p + 12)[0]
+                    p += 5
+                else:
+                    z = math.nan
+                if end - p == 21 and data[p + 11] == _PIXEL_X and data[p + 16] == _PIXEL_Y:
+                    self._pack_ball(v[1], v[3], z, _unpack_float(data, pos + 1)[0])
+                    return
+
+        x = y = confidence = 0.0
+        z = math.nan
+        while pos < end:
+            tag = data[pos]
+            if tag < 0x80:
+                pos += 1
+            else:
+                tag, pos = read_varint(data, pos)
+            if tag == _X:
+                x = _unpack_float(data, pos)[0]
+                pos += 4
+            elif tag == _Y:
+                y = _unpack_float(data, pos)[0]
+                pos += 4
+            elif tag == _Z:
+                z = _unpack_float(data, pos)[0]
+                pos += 4
+            elif tag == _CONFIDENCE:
+                confidence = _unpack_float(data, pos)[0]
+                pos += 4
+            else:
+                pos = skip_field(data, pos, tag & 7)
+        if pos != end:
+            raise ValueError("Field exceeds the ball")
+        self._pack_ball(x, y, z, confidence)
+
+    def _pack_ball(self, x: float, y: float, z: float, confidence: float):
+        n = self._counts[2]
+        if n == len(self._balls):
+            self._balls = np.concatenate([self._balls, np.zeros(n, BALL_DTYPE)])
+        _pack_ball(self._balls, n * BALL_DTYPE.itemsize, x, y, z, confidence)
+        self._counts[2] = n + 1
+
+    def _grow_robots(self, team: int):
+        robots = self._robots[team]
+        self._robots[team] = np.concatenate([robots, np.zeros(len(robots), ROBOT_DTYPE)])
+
+
+def _random_packet(rng: random.Random, robots_per_team: int, missing_rate: float = 0.05) -> SSL_WrapperPacket:
+    """Build a random wrapper packet exercising the optional fields"""
+    packet = SSL_WrapperPacket()
+    detection = packet.detection
+    detection.frame_number = rng.randrange(1 << 32)
+    detection.t_capture = rng.uniform(0, 1e9)
+    detection.t_sent = detection.t_capture + rng.uniform(0, 0.01)
+    detection.camera_id = rng.randrange(8)
+
+    for _ in range(rng.randrange(3)):
+        ball = detection.balls.add(
+            confidence=rng.random(), x=rng.uniform(-6000, 6000), y=rng.uniform(-4500, 4500),
+            pixel_x=rng.uniform(0, 1280), pixel_y=rng.uniform(0, 1024),
+        )
+        if rng.random() < 0.5:
+            ball.area = rng.randrange(1000)
+        if rng.random() < 0.5:
+            ball.z = rng.uniform(0, 500)
+
+    for robots in (detection.robots_blue, detection.robots_yellow):
+        with_height = rng.random() < 0.3
+        for robot_id in rng.sample(range(16), robots_per_team):
+            robot = robots.add(
+                confidence=rng.random(), x=rng.uniform(-6000, 6000), y=rng.uniform(-4500, 4500),
+                pixel_x=rng.uniform(0, 1280), pixel_y=rng.uniform(0, 1024),
+            )
+            if rng.random() >= missing_rate:
+                robot.robot_id = robot_id
+            if rng.random() >= missing_rate:
+                robot.orientation = rng.uniform(-3.14, 3.14)
+            if with_height:
+                robot.height = 150.0
+
+    if rng.random() < 0.1:
+        packet.geometry.field.field_length = 12000
+        packet.geometry.field.field_width = 9000
+        packet.geometry.field.goal_width = 1800
+        packet.geometry.field.goal_depth = 180
+        packet.geometry.field.boundary_width = 300
+    return packet
+
+
+def _check_against_protobuf(decoded: DecodedFrame, packet: SSL_WrapperPacket):
+    """Raise AssertionError if the decoded frame differs from the protobuf parse"""
+    f32 = np.float32
+    assert decoded.has_detection == packet.HasField("detection")
+    detection = packet.detection
+    assert decoded.frame_number == detection.frame_number
+    assert decoded.t_capture == detection.t_capture
+    assert decoded.t_sent == detection.t_sent
+    assert decoded.camera_id == detection.camera_id
+
+    assert len(decoded.balls) == len(detection.balls)
+    for row, ball in zip(decoded.balls, detection.balls):
+        assert row["x"] == f32(ball.x) and row["y"] == f32(ball.y)
+        assert row["confidence"] == f32(ball.confidence)
+        assert row["z"] == f32(ball.z) if ball.HasField("z") else np.isnan(row["z"])
+
+    for rows, robots in ((decoded.robots_blue, detection.robots_blue),
+                         (decoded.robots_yellow, detection.robots_yellow)):
+        assert len(rows) == len(robots)
+        for row, robot in zip(rows, robots):
+            assert row["robot_id"] == (robot.robot_id if robot.HasField("robot_id") else -1)
+            assert row["x"] == f32(robot.x) and row["y"] == f32(robot.y)
+            assert row["confidence"] == f32(robot.confidence)
+            if robot.HasField("orientation"):
+                assert row["orientation"] == f32(robot.orientation)
+            else:
+                assert np.isnan(row["orientation"])
+
+    if packet.HasField("geometry"):
+        assert decoded.geometry == packet.geometry
+    else:
+        assert decoded.geometry is None
+
+
+def main():
+    print("Checking FastDecoder against ssl_vision_wrapper_pb2...")
+    rng = random.Random(0)
+    decoder = FastDecoder()
+    packets = [_random_packet(rng, rng.randrange(17)) for _ in range(2000)]
+    datagrams = [p.SerializeToString() for p in packets]
+
+    for packet, data in zip(packets, datagrams):
+        _check_against_protobuf(decoder.decode(data), packet)
+    print(f"  {len(packets)} packets match")
+    print(f"  Geometry rebuilt {decoder.geometry_cache.build_count} times")
+
+    # Benchmark on complete frames, as sent by SSL-Vision and grSim
+    datagrams = [_random_packet(rng, 16, missing_rate=0.0).SerializeToString() for _ in range(2000)]
+    start = time.perf_counter()
+    for data in datagrams:
+        decoder.decode(data)
+    fast = time.perf_counter() - start
+
+    # Reference: the same conversion without the checks for missing optional fields
+    packet = SSL_WrapperPacket()
+    start = time.perf_counter()
+    for data in datagrams:
+        packet.ParseFromString(data)
+        detection = packet.detection
+        for robots in (detection.robots_blue, detection.robots_yellow):
+            np.array([(r.x, r.y, r.orientation, r.confidence, r.robot_id) for r in robots],
+                     dtype=ROBOT_DTYPE)
+    slow = time.perf_counter() - start
+
+    print(f"  FastDecoder:         {fast / len(datagrams) * 1e6:.1f}us/packet")
+    print(f"  Protobuf + to array: {slow / len(datagrams) * 1e6:.1f}us/packet")
+
+
+if __name__ == "__main__":
+    main()
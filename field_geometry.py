@@ -0,0 +1,319 @@
+"""
+Script to answer spatial queries about the field and the robots on it
+SSL_GeometryData is converted once into arrays (field size, penalty areas, line
+segments, arcs, cameras and ball models); the robots of each frame are packed
+into one array, so nearest-robot, defense-area, shot and pass-lane queries run
+as single broadcasts over many candidate points at once
+"""
+import math
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from vision_fusion import BLUE, YELLOW, MAX_ROBOTS_PER_TEAM, X, Y
+
+ROBOT_RADIUS = 90.0  # [mm]
+BALL_RADIUS = 21.5   # [mm]
+
+# Goal / defense area sides along the x-axis
+LEFT = -1
+RIGHT = 1
+
+
+@dataclass
+class FieldGeometry:
+    """Static field description in mm (division A defaults)"""
+    field_length: float = 12000.0
+    field_width: float = 9000.0
+    goal_width: float = 1800.0
+    goal_depth: float = 180.0
+    boundary_width: float = 300.0
+    penalty_area_depth: float = 1800.0
+    penalty_area_width: float = 3600.0
+    line_names: list = field(default_factory=list)
+    lines: np.ndarray = field(default_factory=lambda: np.zeros((0, 2, 2)))    # (n, p1/p2, x/y)
+    line_thickness: np.ndarray = field(default_factory=lambda: np.zeros(0))
+    arc_names: list = field(default_factory=list)
+    arcs: np.ndarray = field(default_factory=lambda: np.zeros((0, 5)))        # (n, cx/cy/radius/a1/a2)
+    cameras: dict = field(default_factory=dict)    # camera_id -> derived world position (3,), or None
+    straight_two_phase: tuple = None               # (acc_slide, acc_roll, k_switch)
+    chip_fixed_loss: tuple = None                  # (damping_xy_first_hop, damping_xy_other_hops, damping_z)
+
+    @classmethod
+    def from_geometry(cls, geometry) -> "FieldGeometry":
+        """Build from an SSL_GeometryData message"""
+        size = geometry.field
+        result = cls(
+            field_length=size.field_length,
+            field_width=size.field_width,
+            goal_width=size.goal_width,
+            goal_depth=size.goal_depth,
+            boundary_width=size.boundary_width,
+        )
+        if size.HasField("penalty_area_depth"):
+            result.penalty_area_depth = size.penalty_area_depth
+        if size.HasField("penalty_area_width"):
+            result.penalty_area_width = size.penalty_area_width
+
+        result.line_names = [line.name for line in size.field_lines]
+        result.lines = np.array(
+            [((line.p1.x, line.p1.y), (line.p2.x, line.p2.y)) for line in size.field_lines], dtype=float
+        ).reshape(-1, 2, 2)
+        result.line_thickness = np.array([line.thickness for line in size.field_lines], dtype=float)
+        result.arc_names = [arc.name for arc in size.field_arcs]
+        result.arcs = np.array(
+            [(arc.center.x, arc.center.y, arc.radius, arc.a1, arc.a2) for arc in size.field_arcs], dtype=float
+        ).reshape(-1, 5)
+
+        for calib in geometry.calib:
+            position = None
+            if calib.HasField("derived_camera_world_tx"):
+                position = np.array(
+                    (calib.derived_camera_world_tx, calib.derived_camera_world_ty, calib.derived_camera_world_tz)
+                )
+            result.cameras[calib.camera_id] = position
+
+        if geometry.HasField("models"):
+            models = geometry.models
+            if models.HasField("straight_two_phase"):
+                m = models.straight_two_phase
+                result.straight_two_phase = (m.acc_slide, m.acc_roll, m.k_switch)
+            if models.HasField("chip_fixed_loss"):
+                m = models.chip_fixed_loss
+                result.chip_fixed_loss = (m.damping_xy_first_hop, m.damping_xy_other_hops, m.damping_z)
+        return result
+
+    def goal_center(self, side: int) -> np.ndarray:
+        return np.array((side * self.field_length / 2, 0.0))
+
+    def goal_posts(self, side: int) -> np.ndarray:
+        """(2, 2) inner goal posts of one side"""
+        x = side * self.field_length / 2
+        return np.array(((x, -self.goal_width / 2), (x, self.goal_width / 2)))
+
+    def in_field(self, points: np.ndarray, margin: float = 0.0) -> np.ndarray:
+        """(m,) bool: points within the field lines grown by margin"""
+        points = np.asarray(points, dtype=float)
+        return ((np.abs(points[:, 0]) <= self.field_length / 2 + margin)
+                & (np.abs(points[:, 1]) <= self.field_width / 2 + margin))
+
+    def in_defense_area(self, points: np.ndarray, side: int = None, margin: float = 0.0) -> np.ndarray:
+        """(m,) bool: points inside the defense area of side (LEFT, RIGHT or None for either)"""
+        points = np.asarray(points, dtype=float)
+        depth_from_goal = self.field_length / 2 - (np.abs(points[:, 0]) if side is None else side * points[:, 0])
+        return ((depth_from_goal <= self.penalty_area_depth + margin)
+                & (depth_from_goal >= -margin)
+                & (np.abs(points[:, 1]) <= self.penalty_area_width / 2 + margin))
+
+    def nearest_line(self, points: np.ndarray):
+        """Index of and distance to the closest field line segment for every point"""
+        if not len(self.lines):
+            raise ValueError("Geometry has no field lines")
+        distance = segment_distance(np.asarray(points, dtype=float), self.lines[:, 0], self.lines[:, 1])
+        index = np.argmin(distance, axis=1)
+        return index, distance[np.arange(len(index)), index]
+
+
+def segment_distance(points: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """(m, n) distances from m points to n segments"""
+    direction = ends - starts                                           # (n, 2)
+    length_sq = np.maximum(np.einsum("nd,nd->n", direction, direction), 1e-12)
+    offset = points[:, None, :] - starts[None, :, :]                    # (m, n, 2)
+    t = np.clip(np.einsum("mnd,nd->mn", offset, direction) / length_sq, 0.0, 1.0)
+    closest = offset - t[..., None] * direction
+    return np.hypot(closest[..., 0], closest[..., 1])
+
+
+class FieldGeometryCache:
+    """Rebuild the FieldGeometry only when the received SSL_GeometryData changes"""
+
+    def __init__(self):
+        self.field = FieldGeometry()
+        self.geometry = None  # Copy of the SSL_GeometryData the field was built from
+        self.build_count = 0
+
+    def update(self, geometry) -> bool:
+        """Returns True when the geometry was rebuilt"""
+        if self.geometry is not None and geometry == self.geometry:
+            return False
+        self.geometry = type(geometry)()
+        self.geometry.CopyFrom(geometry)
+        self.field = FieldGeometry.from_geometry(geometry)
+        self.build_count += 1
+        return True
+
+
+class FieldIndex:
+    """Batch spatial queries against the field and the robots of the latest frame
+
+    Points are (m, 2) arrays in mm. Robots are stored packed: positions (k, 2) with
+    their team and robot_id, refreshed every frame by one of the update methods.
+    """
+
+    def __init__(self, field_geometry: FieldGeometry = None, robot_radius: float = ROBOT_RADIUS):
+        self.field = field_geometry or FieldGeometry()
+        self.robot_radius = robot_radius
+        self.positions = np.zeros((0, 2))
+        self.team = np.zeros(0, dtype=np.int8)
+        self.robot_id = np.zeros(0, dtype=np.int8)
+
+    def update_robots(self, positions: np.ndarray, visible: np.ndarray):
+        """Take (2, MAX_ROBOTS_PER_TEAM, >=2) positions and the matching visibility mask"""
+        team, robot_id = np.nonzero(visible)
+        self.positions = np.ascontiguousarray(positions[team, robot_id, :2], dtype=float)
+        self.team = team.astype(np.int8)
+        self.robot_id = robot_id.astype(np.int8)
+
+    def update_snapshot(self, snapshot):
+        """Take the robots of a vision_fusion WorldSnapshot"""
+        self.update_robots(snapshot.robots[..., [X, Y]], snapshot.visible)
+
+    def update_tracker(self, tracker):
+        """Take the robots of a BatchTracker"""
+        from tracker import BALL_TRACK
+
+        count = 2 * MAX_ROBOTS_PER_TEAM
+        self.update_robots(
+            tracker.pos[:BALL_TRACK].reshape(2, MAX_ROBOTS_PER_TEAM, 3),
+            tracker.valid[:count].reshape(2, MAX_ROBOTS_PER_TEAM),
+        )
+
+    def _select(self, team: int = None) -> np.ndarray:
+        return self.positions if team is None else self.positions[self.team == team]
+
+    def nearest_robot(self, points: np.ndarray, team: int = None):
+        """(team, robot_id, distance) of the robot closest to every point; -1 / inf if none"""
+        points = np.asarray(points, dtype=float)
+        mask = np.ones(len(self.positions), dtype=bool) if team is None else self.team == team
+        if not mask.any():
+            missing = np.full(len(points), -1)
+            return missing, missing, np.full(len(points), np.inf)
+        candidates = np.flatnonzero(mask)
+        offset = points[:, None, :] - self.positions[None, candidates, :]
+        distance_sq = np.einsum("mkd,mkd->mk", offset, offset)
+        best = np.argmin(distance_sq, axis=1)
+        index = candidates[best]
+        return self.team[index], self.robot_id[index], np.sqrt(distance_sq[np.arange(len(points)), best])
+
+    def in_defense_area(self, points: np.ndarray, side: int = None, margin: float = 0.0) -> np.ndarray:
+        return self.field.in_defense_area(points, side, margin)
+
+    def goal_open_width(self, points: np.ndarray, side: int = RIGHT, team: int = None,
+                        clearance: float = BALL_RADIUS) -> np.ndarray:
+        """(m,) width of the goal mouth [mm] not shadowed by robots, seen from every point
+
+        Each robot (optionally only those of team) casts a shadow of radius
+        robot_radius + clearance onto the goal line; the shadows are merged per point.
+        """
+        points = np.asarray(points, dtype=float)
+        robots = self._select(team)
+        half = self.field.goal_width / 2
+        goal_x = side * self.field.field_length / 2
+        if not len(robots):
+            return np.full(len(points), 2 * half)
+
+        offset = robots[None, :, :] - points[:, None, :]                    # (m, k, 2)
+        distance = np.hypot(offset[..., 0], offset[..., 1])
+        to_goal = goal_x - points[:, 0:1]                                     # (m, 1)
+        # Only robots between the point and the goal line can block
+        ahead = (offset[..., 0] * np.sign(to_goal) > 0) & (np.abs(offset[..., 0]) < np.abs(to_goal))
+        radius = self.robot_radius + clearance
+        inside = distance <= radius
+        angle = np.arctan2(offset[..., 1], offset[..., 0] * np.sign(to_goal))
+        spread = np.arcsin(np.clip(radius / np.maximum(distance, 1e-9), 0.0, 1.0))
+        lower = np.clip(angle - spread, -math.pi / 2 + 1e-6, math.pi / 2 - 1e-6)
+        upper = np.clip(angle + spread, -math.pi / 2 + 1e-6, math.pi / 2 - 1e-6)
+        reach = np.abs(to_goal)
+        start = np.clip(points[:, 1:2] + reach * np.tan(lower), -half, half)
+        end = np.clip(points[:, 1:2] + reach * np.tan(upper), -half, half)
+        blocking = ahead & (end > start)
+        start = np.where(blocking, start, half)
+        end = np.where(blocking, end, half)
+
+        # Length of the union of the shadow intervals per row
+        order = np.argsort(start, axis=1)
+        start = np.take_along_axis(start, order, axis=1)
+        end = np.take_along_axis(end, order, axis=1)
+        covered_until = np.maximum.accumulate(end, axis=1)
+        previous = np.concatenate([np.full((len(points), 1), -half), covered_until[:, :-1]], axis=1)
+        covered = np.maximum(end - np.maximum(start, previous), 0.0).sum(axis=1)
+
+        open_width = 2 * half - covered
+        # A robot covering the point itself blocks everything
+        open_width[(inside & ahead).any(axis=1)] = 0.0
+        return open_width
+
+    def free_shot(self, points: np.ndarray, side: int = RIGHT, team: int = None,
+                  min_width: float = 2 * BALL_RADIUS) -> np.ndarray:
+        """(m,) bool: at least min_width of the goal mouth is visible from every point"""
+        return self.goal_open_width(points, side, team) >= min_width
+
+    def pass_lane_clearance(self, starts: np.ndarray, ends: np.ndarray, team: int = None,
+                            endpoint_radius: float = ROBOT_RADIUS + BALL_RADIUS + 10.0) -> np.ndarray:
+        """(m,) smallest robot-centre distance to each lane start->end
+
+        Robots within endpoint_radius of a lane's start or end (the passer and the
+        receiver) are ignored for that lane.
+        """
+        starts = np.asarray(starts, dtype=float)
+        ends = np.asarray(ends, dtype=float)
+        robots = self._select(team)
+        if not len(robots):
+            return np.full(len(starts), np.inf)
+        direction = ends - starts                                             # (m, 2)
+        length_sq = np.maximum(np.einsum("md,md->m", direction, direction), 1e-12)
+        offset = robots[None, :, :] - starts[:, None, :]                      # (m, k, 2)
+        t = np.clip(np.einsum("mkd,md->mk", offset, direction) / length_sq[:, None], 0.0, 1.0)
+        closest = offset - t[..., None] * direction[:, None, :]
+        distance = np.hypot(closest[..., 0], closest[..., 1])
+
+        from_start = np.hypot(offset[..., 0], offset[..., 1])
+        from_end = np.hypot(robots[None, :, 0] - ends[:, None, 0], robots[None, :, 1] - ends[:, None, 1])
+        distance[(from_start < endpoint_radius) | (from_end < endpoint_radius)] = np.inf
+        return distance.min(axis=1)
+
+    def pass_lane_obstructed(self, starts: np.ndarray, ends: np.ndarray, team: int = None,
+                             clearance: float = BALL_RADIUS) -> np.ndarray:
+        """(m,) bool: some robot touches the path of a ball passed from start to end"""
+        return self.pass_lane_clearance(starts, ends, team) < self.robot_radius + clearance
+
+
+def main():
+    from sim_stub import StubSimulator
+
+    field_geometry = FieldGeometry()
+    simulator = StubSimulator()
+    index = FieldIndex(field_geometry)
+    index.update_robots(simulator.robot_pos, simulator.present)
+
+    # Candidate points on a 100 mm grid over the right half
+    xs, ys = np.meshgrid(np.arange(0, 6000, 100.0), np.arange(-4500, 4501, 100.0))
+    points = np.column_stack([xs.ravel(), ys.ravel()])
+    passer = np.tile(field_geometry.goal_center(LEFT) / 2, (len(points), 1))
+
+    queries = {
+        "nearest robot": lambda: index.nearest_robot(points),
+        "defense area": lambda: index.in_defense_area(points, RIGHT),
+        "goal open width": lambda: index.goal_open_width(points, RIGHT, YELLOW),
+        "pass lane": lambda: index.pass_lane_obstructed(passer, points, YELLOW),
+    }
+    print(f"{len(points)} points, {len(index.positions)} robots")
+    for name, query in queries.items():
+        count = 20
+        start = time.perf_counter()
+        for _ in range(count):
+            result = query()
+        elapsed = (time.perf_counter() - start) / count
+        print(f"  {name:>16}: {elapsed * 1e3:.2f}ms ({elapsed / len(points) * 1e9:.0f}ns/point)")
+
+    # Spot checks against the lined-up yellow team at x=3000
+    shot = np.array([[2000.0, 0.0], [5000.0, 0.0]])
+    print(f"Goal open from (2000, 0): {index.goal_open_width(shot, RIGHT, YELLOW)[0]:.0f}mm of "
+          f"{field_geometry.goal_width:.0f}mm, from (5000, 0): {index.goal_open_width(shot, RIGHT, YELLOW)[1]:.0f}mm")
+    team, robot_id, distance = index.nearest_robot(np.array([[3100.0, 50.0]]))
+    print(f"Nearest to (3100, 50): {'blue' if team[0] == BLUE else 'yellow'} {robot_id[0]} at {distance[0]:.0f}mm")
+
+
+if __name__ == "__main__":
+    main()
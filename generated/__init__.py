@@ -0,0 +1,71 @@
+"""
+Generated protobuf modules; written by compile_proto.py, do not edit
+Messages and enums are imported from their module on first access and cached:
+
+    from generated import SSL_WrapperPacket
+"""
+import importlib
+
+_MODULES = {
+    'Division': 'ssl_gc_common_pb2',
+    'MoveGlobalVelocity': 'ssl_simulation_robot_control_pb2',
+    'MoveLocalVelocity': 'ssl_simulation_robot_control_pb2',
+    'MoveWheelVelocity': 'ssl_simulation_robot_control_pb2',
+    'RealismConfig': 'ssl_simulation_config_pb2',
+    'RobotCommand': 'ssl_simulation_robot_control_pb2',
+    'RobotControl': 'ssl_simulation_robot_control_pb2',
+    'RobotControlResponse': 'ssl_simulation_robot_feedback_pb2',
+    'RobotFeedback': 'ssl_simulation_robot_feedback_pb2',
+    'RobotId': 'ssl_gc_common_pb2',
+    'RobotLimits': 'ssl_simulation_config_pb2',
+    'RobotMoveCommand': 'ssl_simulation_robot_control_pb2',
+    'RobotSpecs': 'ssl_simulation_config_pb2',
+    'RobotWheelAngles': 'ssl_simulation_config_pb2',
+    'Robot_Status': 'grSim_Robotstatus_pb2',
+    'Robots_Status': 'grSim_Robotstatus_pb2',
+    'SSL_BallModelChipFixedLoss': 'ssl_vision_geometry_pb2',
+    'SSL_BallModelStraightTwoPhase': 'ssl_vision_geometry_pb2',
+    'SSL_DetectionBall': 'ssl_vision_detection_pb2',
+    'SSL_DetectionFrame': 'ssl_vision_detection_pb2',
+    'SSL_DetectionRobot': 'ssl_vision_detection_pb2',
+    'SSL_FieldCircularArc': 'ssl_vision_geometry_pb2',
+    'SSL_FieldLineSegment': 'ssl_vision_geometry_pb2',
+    'SSL_FieldShapeType': 'ssl_vision_geometry_pb2',
+    'SSL_GeometryCameraCalibration': 'ssl_vision_geometry_pb2',
+    'SSL_GeometryData': 'ssl_vision_geometry_pb2',
+    'SSL_GeometryFieldSize': 'ssl_vision_geometry_pb2',
+    'SSL_GeometryModels': 'ssl_vision_geometry_pb2',
+    'SSL_WrapperPacket': 'ssl_vision_wrapper_pb2',
+    'SimulationSyncRequest': 'ssl_simulation_synchronous_pb2',
+    'SimulationSyncResponse': 'ssl_simulation_synchronous_pb2',
+    'SimulatorCommand': 'ssl_simulation_control_pb2',
+    'SimulatorConfig': 'ssl_simulation_config_pb2',
+    'SimulatorControl': 'ssl_simulation_control_pb2',
+    'SimulatorError': 'ssl_simulation_error_pb2',
+    'SimulatorResponse': 'ssl_simulation_control_pb2',
+    'Team': 'ssl_gc_common_pb2',
+    'TeleportBall': 'ssl_simulation_control_pb2',
+    'TeleportRobot': 'ssl_simulation_control_pb2',
+    'Vector2f': 'ssl_vision_geometry_pb2',
+    'grSim_BallReplacement': 'grSim_Replacement_pb2',
+    'grSim_Commands': 'grSim_Commands_pb2',
+    'grSim_Packet': 'grSim_Packet_pb2',
+    'grSim_Replacement': 'grSim_Replacement_pb2',
+    'grSim_RobotReplacement': 'grSim_Replacement_pb2',
+    'grSim_Robot_Command': 'grSim_Commands_pb2',
+}
+
+__all__ = sorted(_MODULES)
+
+
+def __getattr__(name):
+    module = _MODULES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value  # Later lookups no longer reach __getattr__
+    return value
+
+
+def __dir__():
+    return __all__
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# NO CHECKED-IN PROTOBUF GENCODE
+# source: ssl_simulation_synchronous.proto
+# Protobuf Python Version: 6.31.1
+"""Generated protocol buffer code."""
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import runtime_version as _runtime_version
+from google.protobuf import symbol_database as _symbol_database
+from google.protobuf.internal import builder as _builder
+_runtime_version.ValidateProtobufRuntimeVersion(
+    _runtime_version.Domain.PUBLIC,
+    6,
+    31,
+    1,
+    '',
+    'ssl_simulation_synchronous.proto'
+)
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+from . import ssl_vision_detection_pb2 as ssl__vision__detection__pb2
+from . import ssl_simulation_robot_feedback_pb2 as ssl__simulation__robot__feedback__pb2
+from . import ssl_simulation_robot_control_pb2 as ssl__simulation__robot__control__pb2
+from . import ssl_simulation_control_pb2 as ssl__simulation__control__pb2
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n ssl_simulation_synchronous.proto\x1a\x1assl_vision_detection.proto\x1a#ssl_simulation_robot_feedback.proto\x1a\"ssl_simulation_robot_control.proto\x1a\x1cssl_simulation_control.proto\"}\n\x15SimulationSyncRequest\x12\x10\n\x08sim_step\x18\x01 \x01(\x02\x12,\n\x11simulator_command\x18\x02 \x01(\x0b\x32\x11.SimulatorCommand\x12$\n\rrobot_control\x18\x03 \x01(\x0b\x32\r.RobotControl\"w\n\x16SimulationSyncResponse\x12&\n\tdetection\x18\x01 \x03(\x0b\x32\x13.SSL_DetectionFrame\x12\x35\n\x16robot_control_response\x18\x02 \x01(\x0b\x32\x15.RobotControlResponseB8Z6github.com/RoboCup-SSL/ssl-simulation-protocol/pkg/sim')
+
+_globals = globals()
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'ssl_simulation_synchronous_pb2', _globals)
+if not _descriptor._USE_C_DESCRIPTORS:
+  _globals['DESCRIPTOR']._loaded_options = None
+  _globals['DESCRIPTOR']._serialized_options = b'Z6github.com/RoboCup-SSL/ssl-simulation-protocol/pkg/sim'
+  _globals['_SIMULATIONSYNCREQUEST']._serialized_start=167
+  _globals['_SIMULATIONSYNCREQUEST']._serialized_end=292
+  _globals['_SIMULATIONSYNCRESPONSE']._serialized_start=294
+  _globals['_SIMULATIONSYNCRESPONSE']._serialized_end=413
+# @@protoc_insertion_point(module_scope)
@@ -22,8 +22,8 @@ _runtime_version.ValidateProtobufRuntimeVersion(
 _sym_db = _symbol_database.Default()
 
 
-import ssl_vision_detection_pb2 as ssl__vision__detection__pb2
-import ssl_vision_geometry_pb2 as ssl__vision__geometry__pb2
+from . import ssl_vision_detection_pb2 as ssl__vision__detection__pb2
+from . import ssl_vision_geometry_pb2 as ssl__vision__geometry__pb2
 
 
 DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x18ssl_vision_wrapper.proto\x1a\x1assl_vision_detection.proto\x1a\x19ssl_vision_geometry.proto\"`\n\x11SSL_WrapperPacket\x12&\n\tdetection\x18\x01 \x01(\x0b\x32\x13.SSL_DetectionFrame\x12#\n\x08geometry\x18\x02 \x01(\x0b\x32\x11.SSL_GeometryData')
@@ -0,0 +1,209 @@
+"""
+Script to convert robot velocity targets into wheel speeds for a whole team at once
+Each robot has a 4x3 matrix mapping its local velocity (forward, left, angular)
+to wheel surface speeds, built from the RobotSpecs of the simulation protocol;
+targets are limited by the RobotLimits accelerations and converted with one
+batched matrix product
+"""
+import math
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from vision_fusion import MAX_ROBOTS_PER_TEAM
+
+# Wheel order of RobotWheelAngles and MoveWheelVelocity
+FRONT_RIGHT, BACK_RIGHT, BACK_LEFT, FRONT_LEFT = range(4)
+
+# Clockwise from forward, as in RobotWheelAngles; these are grSim's default wheel positions
+DEFAULT_WHEEL_ANGLES = tuple(math.radians(a) for a in (60.0, 135.0, 225.0, 300.0))
+DEFAULT_RADIUS = 0.09         # Distance from robot centre to wheel contact [m]
+DEFAULT_WHEEL_RADIUS = 0.027  # [m]
+
+# grSim wheel1..wheel4 sit counter-clockwise from the front left wheel
+GRSIM_WHEEL_ORDER = [FRONT_LEFT, BACK_LEFT, BACK_RIGHT, FRONT_RIGHT]
+
+
+@dataclass
+class RobotModel:
+    """Wheel geometry and movement limits of one robot (unset limits are unlimited)"""
+    wheel_angles: tuple = DEFAULT_WHEEL_ANGLES  # Clockwise from forward [rad], front right first
+    radius: float = DEFAULT_RADIUS
+    wheel_radius: float = DEFAULT_WHEEL_RADIUS
+    acc_speedup_absolute_max: float = math.inf  # [m/s^2]
+    acc_speedup_angular_max: float = math.inf   # [rad/s^2]
+    acc_brake_absolute_max: float = math.inf    # [m/s^2]
+    acc_brake_angular_max: float = math.inf     # [rad/s^2]
+    vel_absolute_max: float = math.inf          # [m/s]
+    vel_angular_max: float = math.inf           # [rad/s]
+
+    @classmethod
+    def from_specs(cls, specs, wheel_radius: float = DEFAULT_WHEEL_RADIUS) -> "RobotModel":
+        """Build a model from a RobotSpecs message (the specs carry no wheel radius)"""
+        model = cls(radius=specs.radius, wheel_radius=wheel_radius)
+        if specs.HasField("wheel_angles"):
+            angles = specs.wheel_angles
+            model.wheel_angles = (angles.front_right, angles.back_right, angles.back_left, angles.front_left)
+        if specs.HasField("limits"):
+            for name in ("acc_speedup_absolute_max", "acc_speedup_angular_max", "acc_brake_absolute_max",
+                         "acc_brake_angular_max", "vel_absolute_max", "vel_angular_max"):
+                if specs.limits.HasField(name):
+                    setattr(model, name, getattr(specs.limits, name))
+        return model
+
+    def jacobian(self) -> np.ndarray:
+        """(4, 3) matrix from local (forward, left, angular) to wheel surface speeds [m/s]"""
+        # Wheel positions counter-clockwise from forward; each wheel drives tangentially
+        position = -np.asarray(self.wheel_angles, dtype=float)
+        return np.stack([-np.sin(position), np.cos(position), np.full(4, self.radius)], axis=1)
+
+
+class WheelKinematics:
+    """Acceleration-limited velocity to wheel speed conversion for a batch of robots
+
+    Row i of every array belongs to robot i (robot ids 0..count-1 of one team).
+    """
+
+    def __init__(self, models=None, count: int = MAX_ROBOTS_PER_TEAM):
+        if models is None or isinstance(models, RobotModel):
+            models = [models or RobotModel()] * count
+        self.count = len(models)
+        self.jacobian = np.stack([model.jacobian() for model in models])       # (n, 4, 3)
+        self.inverse = np.linalg.pinv(self.jacobian)                          # (n, 3, 4)
+        self.wheel_radius = np.array([model.wheel_radius for model in models])
+
+        def column(name):
+            return np.array([getattr(model, name) for model in models], dtype=float)
+
+        self.acc_speedup = column("acc_speedup_absolute_max")
+        self.acc_brake = column("acc_brake_absolute_max")
+        self.acc_speedup_angular = column("acc_speedup_angular_max")
+        self.acc_brake_angular = column("acc_brake_angular_max")
+        self.vel_max = column("vel_absolute_max")
+        self.vel_angular_max = column("vel_angular_max")
+
+        self.velocity = np.zeros((self.count, 3))  # Last commanded local velocity
+
+    @classmethod
+    def from_specs(cls, specs_list, count: int = MAX_ROBOTS_PER_TEAM, wheel_radius: float = DEFAULT_WHEEL_RADIUS):
+        """One row per robot id; robots without RobotSpecs use the default model"""
+        models = [RobotModel(wheel_radius=wheel_radius)] * count
+        for specs in specs_list:
+            if specs.id.id < count:
+                models[specs.id.id] = RobotModel.from_specs(specs, wheel_radius)
+        return cls(models)
+
+    @staticmethod
+    def to_local(velocity: np.ndarray, orientation: np.ndarray) -> np.ndarray:
+        """Rotate (n, 3) global (vx, vy, angular) into the robot frames"""
+        c, s = np.cos(orientation), np.sin(orientation)
+        local = np.empty_like(velocity, dtype=float)
+        local[:, 0] = c * velocity[:, 0] + s * velocity[:, 1]
+        local[:, 1] = -s * velocity[:, 0] + c * velocity[:, 1]
+        local[:, 2] = velocity[:, 2]
+        return local
+
+    def limit(self, target: np.ndarray, dt: float) -> np.ndarray:
+        """Clamp (n, 3) local targets to the velocity and acceleration limits; updates the state"""
+        target = np.array(target, dtype=float)
+        current = self.velocity
+
+        speed = np.hypot(target[:, 0], target[:, 1])
+        target[:, :2] *= np.minimum(1.0, self.vel_max / np.maximum(speed, 1e-9))[:, None]
+        target[:, 2] = np.clip(target[:, 2], -self.vel_angular_max, self.vel_angular_max)
+
+        # Speeding up and braking have separate limits
+        speeding_up = np.hypot(target[:, 0], target[:, 1]) >= np.hypot(current[:, 0], current[:, 1])
+        max_change = np.where(speeding_up, self.acc_speedup, self.acc_brake) * dt
+        change = target[:, :2] - current[:, :2]
+        norm = np.hypot(change[:, 0], change[:, 1])
+        current[:, :2] += change * np.minimum(1.0, max_change / np.maximum(norm, 1e-9))[:, None]
+
+        speeding_up = np.abs(target[:, 2]) >= np.abs(current[:, 2])
+        max_change = np.where(speeding_up, self.acc_speedup_angular, self.acc_brake_angular) * dt
+        current[:, 2] += np.clip(target[:, 2] - current[:, 2], -max_change, max_change)
+        return current.copy()
+
+    def wheel_speeds(self, local: np.ndarray) -> np.ndarray:
+        """(n, 4) wheel surface speeds [m/s] for (n, 3) local velocities, front right first"""
+        return np.einsum("nwk,nk->nw", self.jacobian, local)
+
+    def body_velocity(self, wheels: np.ndarray) -> np.ndarray:
+        """(n, 3) local velocities reproducing (n, 4) wheel surface speeds as closely as possible"""
+        return np.einsum("nkw,nw->nk", self.inverse, wheels)
+
+    def step(self, target: np.ndarray, dt: float, orientation: np.ndarray = None) -> np.ndarray:
+        """Limit the targets and return wheel surface speeds [m/s]
+
+        target is (n, 3) local (forward, left, angular), or global (vx, vy, angular)
+        when the robots' orientations are given.
+        """
+        if orientation is not None:
+            target = self.to_local(target, orientation)
+        return self.wheel_speeds(self.limit(target, dt))
+
+    def grsim_wheels(self, wheels: np.ndarray) -> np.ndarray:
+        """Reorder surface speeds to grSim wheel1..wheel4 and convert to angular speeds [rad/s]"""
+        return wheels[:, GRSIM_WHEEL_ORDER] / self.wheel_radius[:, None]
+
+    def reset(self):
+        self.velocity[:] = 0.0
+
+
+def main():
+    from command_encoder import CommandEncoder
+    from send_robot_command import build_packet, create_robot_command
+    from generated import RobotSpecs
+
+    rng = np.random.default_rng(0)
+    specs = RobotSpecs(radius=0.09)
+    specs.id.id = 0
+    specs.wheel_angles.front_right = math.radians(57.0)
+    specs.wheel_angles.back_right = math.radians(135.0)
+    specs.wheel_angles.back_left = math.radians(225.0)
+    specs.wheel_angles.front_left = math.radians(303.0)
+    specs.limits.acc_speedup_absolute_max = 3.0
+    specs.limits.acc_brake_absolute_max = 6.0
+    specs.limits.acc_speedup_angular_max = 50.0
+    specs.limits.acc_brake_angular_max = 50.0
+    specs.limits.vel_absolute_max = 3.0
+    specs.limits.vel_angular_max = 10.0
+    kinematics = WheelKinematics.from_specs([specs])
+
+    # Wheel speeds must map back to the commanded velocity
+    local = rng.uniform(-2, 2, size=(kinematics.count, 3))
+    assert np.allclose(kinematics.body_velocity(kinematics.wheel_speeds(local)), local)
+
+    # Forward at 1 m/s: the front wheels turn opposite to each other, like grSim's setSpeed
+    wheels = kinematics.wheel_speeds(np.tile([1.0, 0.0, 0.0], (kinematics.count, 1)))
+    assert wheels[1, FRONT_RIGHT] > 0 > wheels[1, FRONT_LEFT]
+
+    # Acceleration limit: 60 ticks at 60 Hz from standstill reach 3 m/s * 1 s
+    kinematics.reset()
+    for _ in range(60):
+        kinematics.step(np.tile([5.0, 0.0, 0.0], (kinematics.count, 1)), 1 / 60)
+    assert np.isclose(kinematics.velocity[0, 0], 3.0)
+    print(f"Robot 0 after 1s of full throttle: {kinematics.velocity[0, 0]:.2f} m/s (limit 3 m/s^2)")
+
+    # grSim wheel commands through the pre-encoded packet match the protobuf path
+    encoder = CommandEncoder(range(kinematics.count), wheels=True)
+    grsim = kinematics.grsim_wheels(kinematics.step(rng.uniform(-2, 2, size=(kinematics.count, 3)), 1 / 60))
+    encoder.set_wheels(grsim)
+    grsim = grsim.astype(np.float32).astype(float)
+    commands = [create_robot_command(robot_id, wheels=grsim[robot_id]) for robot_id in range(kinematics.count)]
+    assert encoder.encode(timestamp=1.0) == build_packet(commands, timestamp=1.0).SerializeToString()
+    print("Wheel command packets match")
+
+    ticks = 10000
+    orientation = rng.uniform(-math.pi, math.pi, kinematics.count)
+    targets = rng.uniform(-2, 2, size=(kinematics.count, 3))
+    start = time.perf_counter()
+    for _ in range(ticks):
+        encoder.set_wheels(kinematics.grsim_wheels(kinematics.step(targets, 1 / 60, orientation)))
+    elapsed = time.perf_counter() - start
+    print(f"{kinematics.count} robots, global targets to encoded wheel speeds: {elapsed / ticks * 1e6:.1f}us/tick")
+
+
+if __name__ == "__main__":
+    main()
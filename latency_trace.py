@@ -0,0 +1,222 @@
+"""
+Script to trace control latency from t_capture to the grSim command send
+Every received vision frame gets a row in a preallocated ring buffer with its
+arrival time (the kernel timestamp taken by VisionReceiver) and a timestamp at
+the end of each pipeline stage; the report gives p50/p99 per stage
+and the share of frames over budget, and the trace can be exported in Chrome
+trace event format for flame charts (chrome://tracing or ui.perfetto.dev)
+
+Usage:
+    python latency_trace.py [--duration 5] [--out trace.json]
+"""
+import argparse
+import json
+import socket
+import time
+
+import numpy as np
+
+# Pipeline stages; each mark is taken when the stage ends. "receive" is the datagram's
+# arrival, "queue" the time it waited in the socket queue and the drain before processing
+RECEIVE, QUEUE, DECODE, FUSE, TRACK, DECIDE, SEND = range(7)
+STAGES = ("receive", "queue", "decode", "fuse", "track", "decide", "send")
+
+BUDGET = 1 / 60  # One control period [s]
+
+
+class LatencyTracer:
+    """Preallocated ring of per-frame stage timestamps
+
+    Stage marks use perf_counter and are converted to wall time with an offset
+    taken at start, so they line up with the t_capture / t_sent of SSL-Vision
+    (up to the clock offset between the vision machine and this one).
+    """
+
+    def __init__(self, capacity: int = 8192, stages=STAGES, clock=time.perf_counter):
+        self.stages = tuple(stages)
+        self.capacity = capacity
+        self.clock = clock
+        self.wall_offset = time.time() - clock()
+        self.marks = np.full((capacity, len(self.stages)), np.nan)
+        self.frame_number = np.zeros(capacity, dtype=np.int64)
+        self.t_capture = np.full(capacity, np.nan)
+        self.t_sent = np.full(capacity, np.nan)
+        self.command_timestamp = np.full(capacity, np.nan)  # grSim_Commands.timestamp sent for the frame
+        self.count = 0   # Rows begun so far; the ring holds the last `capacity` of them
+        self._row = -1
+
+    def begin(self, t: float = None) -> int:
+        """Start a row for a newly received frame, marking the first stage at t (its arrival) or now"""
+        row = self.count % self.capacity
+        self.marks[row] = np.nan
+        self.marks[row, 0] = self.clock() if t is None else t
+        self.t_capture[row] = np.nan
+        self.t_sent[row] = np.nan
+        self.command_timestamp[row] = np.nan
+        self.count += 1
+        self._row = row
+        return row
+
+    def frame(self, frame_number: int, t_capture: float, t_sent: float):
+        """Attach the SSL-Vision timestamps of the current row"""
+        row = self._row
+        self.frame_number[row] = frame_number
+        self.t_capture[row] = t_capture
+        self.t_sent[row] = t_sent
+
+    def command(self, timestamp: float):
+        """Attach the timestamp of the command sent in answer to the current row"""
+        self.command_timestamp[self._row] = timestamp
+
+    def mark(self, stage: int):
+        """Mark the end of a stage for the current row"""
+        self.marks[self._row, stage] = self.clock()
+
+    def rows(self) -> np.ndarray:
+        """Indices of the filled rows, oldest first"""
+        if self.count <= self.capacity:
+            return np.arange(self.count)
+        return (np.arange(self.capacity) + self.count) % self.capacity
+
+    def durations(self) -> dict:
+        """Seconds spent per stage for every retained row (NaN where a stage did not run)
+
+        "vision" is t_capture to t_sent on the vision machine, "network" t_sent to the
+        receive mark, and each stage runs from the previous stage's mark.
+        """
+        rows = self.rows()
+        marks = self.marks[rows]
+        received = marks[:, 0] + self.wall_offset
+        result = {
+            "vision": self.t_sent[rows] - self.t_capture[rows],
+            "network": received - self.t_sent[rows],
+        }
+        for stage in range(1, len(self.stages)):
+            result[self.stages[stage]] = marks[:, stage] - marks[:, stage - 1]
+        result["total"] = marks[:, -1] + self.wall_offset - self.t_capture[rows]
+        return result
+
+    def report(self, budget: float = BUDGET) -> str:
+        durations = self.durations()
+        lines = [f"{'stage':>8}  {'p50':>8}  {'p99':>8}  {'max':>8}  [ms]"]
+        for name, values in durations.items():
+            values = values[~np.isnan(values)]
+            if not len(values):
+                continue
+            p50, p99 = np.percentile(values, (50, 99)) * 1e3
+            lines.append(f"{name:>8}  {p50:8.3f}  {p99:8.3f}  {values.max() * 1e3:8.3f}")
+
+        total = durations["total"]
+        complete = ~np.isnan(total)
+        if complete.any():
+            over = complete & (total > budget)
+            lines.append(f"{over.sum()} of {complete.sum()} frames over the {budget * 1e3:.1f}ms budget")
+            if over.any():
+                # Stage with the largest share of the over-budget frames
+                names = [name for name in durations if name != "total"]
+                stage_times = np.nan_to_num(np.stack([durations[name][over] for name in names]))
+                lines.append(f"Largest stage in those frames: {names[int(np.argmax(stage_times.sum(axis=1)))]}")
+        return "\n".join(lines)
+
+    def export_chrome_trace(self, path: str):
+        """Write the retained rows as Chrome trace events, one track per stage sequence"""
+        events = []
+        rows = self.rows()
+        for row in rows:
+            marks = self.marks[row]
+            start = self.t_capture[row] - self.wall_offset if not np.isnan(self.t_capture[row]) else marks[0]
+            frame_args = {"frame_number": int(self.frame_number[row])}
+            if not np.isnan(self.command_timestamp[row]):
+                frame_args["command_timestamp"] = float(self.command_timestamp[row])
+            # Vision and network as one span, then each stage as a nested span of the frame
+            if not np.isnan(self.t_capture[row]):
+                events.append(_complete("vision+network", start, marks[0], frame_args))
+            previous = marks[0]
+            for stage in range(1, len(self.stages)):
+                if np.isnan(marks[stage]):
+                    break
+                events.append(_complete(self.stages[stage], previous, marks[stage], frame_args))
+                previous = marks[stage]
+            end = previous
+            events.append(_complete("frame", start, end, frame_args, depth=0))
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+def _complete(name: str, start: float, end: float, args: dict, depth: int = 1) -> dict:
+    return {
+        "name": name, "ph": "X", "pid": 0, "tid": 0, "cat": "frame" if depth == 0 else "stage",
+        "ts": start * 1e6, "dur": max(end - start, 0.0) * 1e6, "args": args,
+    }
+
+
+def main():
+    from command_encoder import CommandEncoder
+    from fast_decoder import FastDecoder
+    from receive_vision import VisionReceiver, MULTICAST_GROUP
+    from sim_stub import StubSimulator, GrSimStubServer
+    from tracker import BatchTracker
+    from vision_fusion import FrameFuser, BLUE
+
+    parser = argparse.ArgumentParser(description="Trace the receive-to-send pipeline against a stub simulator")
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--out", default="trace.json", help="Chrome trace output")
+    parser.add_argument("--vision-port", type=int, default=10096)
+    parser.add_argument("--command-port", type=int, default=20096)
+    args = parser.parse_args()
+
+    server = GrSimStubServer(StubSimulator(), args.command_port, args.vision_port).start()
+    address = ("127.0.0.1", args.command_port)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    tracer = LatencyTracer()
+    decoder = FastDecoder()
+    fuser = FrameFuser()
+    tracker = BatchTracker()
+    encoder = CommandEncoder(range(6))
+
+    print(f"Tracing for {args.duration:.0f}s...")
+    try:
+        with VisionReceiver(MULTICAST_GROUP, args.vision_port) as receiver:
+            end = time.perf_counter() + args.duration
+            while time.perf_counter() < end:
+                datagrams = receiver.poll(timeout=0.1)
+                for data, t_receive in zip(datagrams, receiver.receive_times):
+                    tracer.begin(t_receive)
+                    tracer.mark(QUEUE)
+                    frame = decoder.decode(data)
+                    if not frame.has_detection:
+                        continue
+                    tracer.frame(frame.frame_number, frame.t_capture, frame.t_sent)
+                    tracer.mark(DECODE)
+                    snapshot = fuser.add_decoded(frame)
+                    tracer.mark(FUSE)
+                    if snapshot is None:
+                        continue
+                    tracker.update_snapshot(snapshot)
+                    tracer.mark(TRACK)
+
+                    # Spin every blue robot towards the ball
+                    ball = tracker.ball
+                    for robot_id in range(6):
+                        robot = tracker.robot(BLUE, robot_id)
+                        if robot is not None and ball is not None:
+                            (x, y, orientation), _ = robot
+                            error = np.arctan2(ball[0][1] - y, ball[0][0] - x) - orientation
+                            encoder.set_command(robot_id, velangular=3.0 * np.arctan2(np.sin(error), np.cos(error)))
+                    tracer.mark(DECIDE)
+                    # The command carries its send time; the tracer links it to this frame
+                    t_send = time.time()
+                    encoder.send(sock, address, timestamp=t_send)
+                    tracer.command(t_send)
+                    tracer.mark(SEND)
+    finally:
+        sock.close()
+        server.stop()
+
+    print(tracer.report())
+    tracer.export_chrome_trace(args.out)
+    print(f"Wrote {min(tracer.count, tracer.capacity)} frames to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
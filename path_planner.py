@@ -0,0 +1,319 @@
+"""
+Script to plan collision-free velocities for up to 16 robots of a team every tick
+Each robot drives towards its target pose; the planner picks for all robots at
+once the candidate velocity closest to that wish whose time to collision with
+every other robot stays long (reciprocal velocity obstacles: teammates share
+the avoidance, opponents and other obstacles are avoided fully). All candidates
+are scored in one broadcast over robots x candidates x obstacles. Robots whose
+wish is already collision-free skip the search, and the candidates of the rest
+are seeded with the previous tick's velocities, so a tick costs little when
+little changes. The commands of all robots go out in one grSim packet
+
+Usage:
+    python path_planner.py [--robots 16] [--ticks 900]
+    python path_planner.py --live [--yellow]
+"""
+import argparse
+import math
+import time
+
+import numpy as np
+
+from field_geometry import ROBOT_RADIUS
+from kinematics import WheelKinematics
+from send_robot_command import create_robot_command, send_command
+from tracker import wrap_angle
+from vision_fusion import BLUE, YELLOW, MAX_ROBOTS_PER_TEAM
+
+
+class VelocityObstaclePlanner:
+    """Velocity planner for a fixed set of robots of one team
+
+    Positions are in mm, velocities in mm/s and orientations in rad; planned
+    velocities are global (vx, vy, angular).
+    """
+
+    def __init__(
+        self,
+        robot_ids,
+        max_speed: float = 2500.0,        # [mm/s]
+        max_acc: float = 4000.0,          # [mm/s^2]
+        max_angular: float = 6.0,         # [rad/s]
+        angular_gain: float = 4.0,        # [1/s]
+        robot_radius: float = ROBOT_RADIUS,
+        safety_margin: float = 40.0,      # Extra clearance between robots [mm]
+        horizon: float = 1.0,             # Collisions further ahead than this [s] are ignored
+        collision_weight: float = 1500.0, # Cost of a collision 1s ahead, in mm/s of deviation
+        side_bias: float = 0.5,           # Cost per mm/s of passing on the left, breaks symmetric deadlocks
+        speeds: int = 4,
+        directions: int = 16,
+        local_samples: int = 8,
+    ):
+        self.robot_ids = list(robot_ids)
+        self.max_speed = max_speed
+        self.max_acc = max_acc
+        self.max_angular = max_angular
+        self.angular_gain = angular_gain
+        self.robot_radius = robot_radius
+        self.safety_margin = safety_margin
+        self.horizon = horizon
+        self.collision_weight = collision_weight
+        self.side_bias = side_bias
+
+        count = len(self.robot_ids)
+        self.velocity = np.zeros((count, 2))   # Velocities planned last tick
+        self.searched = 0                      # Robots that needed the full search, over all ticks
+        self.planned = 0                       # Robots planned, over all ticks
+
+        # Candidate velocities shared by every tick: rings of speeds and directions, plus standing still
+        angles = 2 * np.pi * np.arange(directions) / directions
+        unit = np.stack((np.cos(angles), np.sin(angles)), axis=1)
+        fractions = np.arange(1, speeds + 1) / speeds
+        self._grid = np.concatenate(((fractions[:, None, None] * max_speed * unit).reshape(-1, 2), np.zeros((1, 2))))
+        # Directions of small steps around the previous velocity, for refining last tick's solution
+        angles = 2 * np.pi * (np.arange(local_samples) + 0.5) / local_samples
+        self._ring = np.stack((np.cos(angles), np.sin(angles)), axis=1)
+
+    def reset(self):
+        self.velocity[:] = 0.0
+
+    def preferred_velocity(self, positions: np.ndarray, targets: np.ndarray) -> np.ndarray:
+        """(n, 2) straight-line velocities to the targets, slowing down to stop on them"""
+        delta = targets[:, :2] - positions[:, :2]
+        distance = np.hypot(delta[:, 0], delta[:, 1])
+        speed = np.minimum(self.max_speed, np.sqrt(2 * 0.8 * self.max_acc * distance))
+        speed = np.where(distance > 5.0, speed, 0.0)
+        return delta * (speed / np.maximum(distance, 1e-9))[:, None]
+
+    def plan(self, positions, targets, obstacles=None, obstacle_velocities=None, obstacle_radius=ROBOT_RADIUS,
+             dt: float = 1 / 60) -> np.ndarray:
+        """(n, 3) global velocities for the robots at positions (n, 3) to reach targets (n, 3)
+
+        obstacles are (m, 2) positions of everything else to avoid (opponents,
+        robots of ours not planned here, the ball) with their velocities and radii.
+        """
+        positions = np.asarray(positions, dtype=float)
+        targets = np.asarray(targets, dtype=float)
+        count = len(positions)
+        obstacles = np.zeros((0, 2)) if obstacles is None else np.asarray(obstacles, dtype=float).reshape(-1, 2)
+        if obstacle_velocities is None:
+            obstacle_velocities = np.zeros_like(obstacles)
+
+        # Every robot is an obstacle for the others; teammates avoid each other reciprocally
+        agents = np.concatenate((positions[:, :2], obstacles))
+        agent_velocities = np.concatenate((self.velocity, np.asarray(obstacle_velocities, dtype=float)))
+        reciprocal = np.arange(len(agents)) < count
+        radius = self.robot_radius + self.safety_margin + np.concatenate(
+            (np.full(count, self.robot_radius), np.broadcast_to(obstacle_radius, len(obstacles)))
+        )
+        context = (positions[:, :2], agents, agent_velocities, reciprocal, radius)
+
+        # Keep the wish where it is free for the whole horizon
+        preferred = self.preferred_velocity(positions, targets)
+        reachable = self._reachable(preferred[:, None], self.velocity, dt)
+        ttc = self._time_to_collision(np.arange(count), reachable, *context)[:, 0]
+        chosen = reachable[:, 0]
+        blocked = np.flatnonzero(ttc < self.horizon)
+
+        if len(blocked):
+            previous = self.velocity[blocked]
+            candidates = np.concatenate((
+                np.broadcast_to(self._grid, (len(blocked),) + self._grid.shape),
+                preferred[blocked, None],
+                previous[:, None],
+                previous[:, None] + 0.5 * self.max_acc * dt * self._ring,
+            ), axis=1)
+            speed = np.hypot(candidates[..., 0], candidates[..., 1])
+            candidates *= np.minimum(1.0, self.max_speed / np.maximum(speed, 1e-9))[..., None]
+            # Score what the robots can actually reach by the next tick
+            candidates = self._reachable(candidates, previous, dt)
+
+            ttc = self._time_to_collision(blocked, candidates, *context)
+            deviation = candidates - preferred[blocked, None]
+            cost = np.sqrt(np.einsum("rkd,rkd->rk", deviation, deviation))
+            cost += np.where(ttc < self.horizon, self.collision_weight / np.maximum(ttc, 1e-3), 0.0)
+            # Everyone prefers to pass on the right, so robots meeting head-on turn away from each other
+            wish = preferred[blocked] / np.maximum(np.hypot(*preferred[blocked].T), 1e-9)[:, None]
+            left = wish[:, None, 0] * candidates[..., 1] - wish[:, None, 1] * candidates[..., 0]
+            cost += self.side_bias * np.maximum(left, 0.0)
+            chosen[blocked] = candidates[np.arange(len(blocked)), np.argmin(cost, axis=1)]
+        self.searched += len(blocked)
+        self.planned += count
+
+        self.velocity[:] = chosen
+        angular = np.clip(self.angular_gain * wrap_angle(targets[:, 2] - positions[:, 2]),
+                          -self.max_angular, self.max_angular)
+        return np.column_stack((self.velocity, angular))
+
+    def _reachable(self, candidates: np.ndarray, previous: np.ndarray, dt: float) -> np.ndarray:
+        """Candidates (r, k, 2) clamped to the acceleration limit around the previous velocities (r, 2)"""
+        change = candidates - previous[:, None]
+        norm = np.hypot(change[..., 0], change[..., 1])
+        return previous[:, None] + change * np.minimum(1.0, self.max_acc * dt / np.maximum(norm, 1e-9))[..., None]
+
+    def _time_to_collision(self, rows, candidates, positions, agents, agent_velocities, reciprocal, radius):
+        """(r, k) seconds until robots[rows] moving at candidates (r, k, 2) first touch any agent
+
+        Against a reciprocal agent the robot only takes half the avoidance, so its
+        relative velocity is 2 * candidate - own velocity - agent velocity.
+        """
+        offset = agents[None, :, :] - positions[rows, None, :]                         # (r, a, 2)
+        own = self.velocity[rows, None, None, :]
+        relative = (np.where(reciprocal[:, None], 2.0, 1.0) * candidates[:, :, None, :]
+                    - np.where(reciprocal[:, None], own, 0.0) - agent_velocities)          # (r, k, a, 2)
+        a = np.einsum("rkad,rkad->rka", relative, relative)
+        b = np.einsum("rad,rkad->rka", offset, relative)
+        c = (np.einsum("rad,rad->ra", offset, offset) - radius ** 2)[:, None, :]
+        discriminant = b * b - a * c
+        approaching = b > 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = (b - np.sqrt(np.maximum(discriminant, 0.0))) / a
+        ttc = np.where(approaching & (discriminant > 0), t, np.inf)
+        # Already overlapping: moving closer collides now, moving apart is free
+        ttc = np.where(c < 0, np.where(approaching, 0.0, np.inf), ttc)
+        ttc[np.arange(len(rows)), :, rows] = np.inf  # A robot is no obstacle for itself
+        return ttc.min(axis=2)
+
+    def robot_commands(self, velocities: np.ndarray, orientations) -> list:
+        """grSim commands [m/s] for planned global velocities, in robot_ids order"""
+        local = WheelKinematics.to_local(velocities, np.asarray(orientations, dtype=float))
+        return [
+            create_robot_command(robot_id, veltangent=forward / 1000, velnormal=left / 1000, velangular=angular)
+            for robot_id, (forward, left, angular) in zip(self.robot_ids, local)
+        ]
+
+    def send(self, sock, address: tuple, velocities: np.ndarray, orientations, is_yellow: bool = False,
+             timestamp: float = None):
+        """Send the commands of every robot in one packet"""
+        send_command(sock, address, self.robot_commands(velocities, orientations), is_yellow, timestamp)
+
+
+def circle_swap(count: int, radius: float = 2500.0):
+    """Start and target poses on a circle, each robot crossing to the opposite side"""
+    angles = 2 * np.pi * np.arange(count) / count
+    starts = np.column_stack((radius * np.cos(angles), radius * np.sin(angles), angles + np.pi))
+    targets = np.column_stack((-starts[:, 0], -starts[:, 1], wrap_angle(angles)))
+    starts[:, 2] = wrap_angle(starts[:, 2])
+    return starts, targets
+
+
+def run_stub(count: int, ticks: int):
+    """Closed loop against the stub simulator: robots swap sides around opponents"""
+    from generated import grSim_Packet
+    from send_robot_command import build_packet
+    from sim_stub import StubSimulator
+
+    rate = 60.0
+    simulator = StubSimulator(robots_per_team=0)
+    starts, targets = circle_swap(count)
+    simulator.robot_pos[BLUE, :count] = starts
+    simulator.present[BLUE, :count] = True
+    opponents = np.array(((0.0, 0.0), (700.0, 400.0), (-600.0, -500.0), (-300.0, 900.0)))
+    simulator.robot_pos[YELLOW, :len(opponents), :2] = opponents
+    simulator.present[YELLOW, :len(opponents)] = True
+
+    planner = VelocityObstaclePlanner(range(count))
+    packet = grSim_Packet()
+    plan_times = []
+    closest = math.inf
+    arrived_at = None
+    for tick in range(ticks):
+        positions = simulator.robot_pos[BLUE, :count]
+        start = time.perf_counter()
+        velocities = planner.plan(positions, targets, opponents, dt=1 / rate)
+        commands = planner.robot_commands(velocities, positions[:, 2])
+        data = build_packet(commands).SerializeToString()
+        plan_times.append(time.perf_counter() - start)
+
+        packet.ParseFromString(data)
+        simulator.apply_grsim_packet(packet)
+        simulator.step(1 / rate)
+
+        everyone = np.concatenate((simulator.robot_pos[BLUE, :count, :2], opponents))
+        delta = everyone[:count, None] - everyone[None]
+        distance = np.hypot(delta[..., 0], delta[..., 1])
+        distance[np.arange(count), np.arange(count)] = np.inf
+        closest = min(closest, distance.min())
+        error = np.hypot(*(simulator.robot_pos[BLUE, :count, :2] - targets[:, :2]).T)
+        if arrived_at is None and (error < 30.0).all():
+            arrived_at = tick + 1
+
+    plan_times = np.array(plan_times) * 1e3
+    p50, p99 = np.percentile(plan_times, (50, 99))
+    print(f"{count} robots, {len(opponents)} opponents, {ticks} ticks at {rate:.0f}Hz")
+    print(f"Plan + encode: p50 {p50:.2f}ms, p99 {p99:.2f}ms, max {plan_times.max():.2f}ms per tick")
+    print(f"Full search for {planner.searched / planner.planned:.0%} of robot-ticks")
+    print(f"Closest approach between centres: {closest:.0f}mm (contact at {2 * ROBOT_RADIUS:.0f}mm)")
+    if arrived_at is None:
+        print(f"Not all robots reached their targets (worst error {error.max():.0f}mm)")
+    else:
+        print(f"All robots at their targets after {arrived_at / rate:.1f}s")
+    assert closest >= 2 * ROBOT_RADIUS, "Robots collided"
+    assert arrived_at is not None, "Robots did not arrive"
+
+
+def run_live(count: int, is_yellow: bool, address: tuple):
+    """Swap the robots of one team around a circle in grSim, planning on tracked vision"""
+    import socket
+
+    from fast_decoder import FastDecoder
+    from receive_vision import VisionReceiver, MULTICAST_GROUP, PORT
+    from tracker import BatchTracker, track_index
+    from vision_fusion import FrameFuser
+
+    team = YELLOW if is_yellow else BLUE
+    other = BLUE if is_yellow else YELLOW
+    planner = VelocityObstaclePlanner(range(count))
+    starts, targets = circle_swap(count)
+    decoder, fuser, tracker = FastDecoder(), FrameFuser(), BatchTracker()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    ours = [track_index(team, robot_id) for robot_id in range(count)]
+    theirs = np.arange(track_index(other, 0), track_index(other, MAX_ROBOTS_PER_TEAM))
+    goals = starts  # Gather on the circle first, then keep swapping sides
+
+    print(f"Driving {count} {'yellow' if is_yellow else 'blue'} robots via {address[0]}:{address[1]}")
+    print("Press Ctrl+C to exit")
+    try:
+        with VisionReceiver(MULTICAST_GROUP, PORT) as receiver:
+            while True:
+                for data in receiver.poll(timeout=0.1):
+                    frame = decoder.decode(data)
+                    if not frame.has_detection:
+                        continue
+                    snapshot = fuser.add_decoded(frame)
+                    if snapshot is None:
+                        continue
+                    tracker.update_snapshot(snapshot)
+                    if not tracker.valid[ours].all():
+                        continue
+                    positions = tracker.pos[ours]
+                    visible = theirs[tracker.valid[theirs]]
+                    velocities = planner.plan(positions, goals, tracker.pos[visible, :2], tracker.vel[visible, :2])
+                    planner.send(sock, address, velocities, positions[:, 2], is_yellow)
+                    if (np.hypot(*(positions[:, :2] - goals[:, :2]).T) < 50.0).all():
+                        goals = targets if goals is starts else starts
+    except KeyboardInterrupt:
+        print("\nExiting...")
+    finally:
+        planner.send(sock, address, np.zeros((count, 3)), np.zeros(count), is_yellow)
+        sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plan collision-free team motion and send it to grSim")
+    parser.add_argument("--robots", type=int, default=16)
+    parser.add_argument("--ticks", type=int, default=900)
+    parser.add_argument("--live", action="store_true", help="Drive grSim from vision instead of the stub")
+    parser.add_argument("--yellow", action="store_true")
+    parser.add_argument("--grsim", default="127.0.0.1:20011")
+    args = parser.parse_args()
+
+    if args.live:
+        host, port = args.grsim.rsplit(":", 1)
+        run_live(args.robots, args.yellow, (host, int(port)))
+    else:
+        run_stub(args.robots, args.ticks)
+
+
+if __name__ == "__main__":
+    main()
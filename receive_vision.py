@@ -2,22 +2,38 @@
 Script to receive robot coordinate data from SSL-Vision
 Receives data from multicast address 224.5.23.2:10006
 """
+import selectors
 import socket
 import struct
 import sys
-import os
+import time
+from dataclasses import dataclass
 
-# Add generated folder to path
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), "generated"))
+from generated import SSL_WrapperPacket
 
-from ssl_vision_wrapper_pb2 import SSL_WrapperPacket
+# SSL-Vision multicast address
+MULTICAST_GROUP = "224.5.23.2"
+PORT = 10006
 
+MAX_DATAGRAM_SIZE = 65535
+DEFAULT_RCVBUF_SIZE = 4 * 1024 * 1024  # Room for ~1 s of 8 cameras at 75Hz
 
-def create_multicast_socket(multicast_group: str, port: int) -> socket.socket:
+# Linux-only socket option that reports datagrams dropped by the kernel
+SO_RXQ_OVFL = getattr(socket, "SO_RXQ_OVFL", 40 if sys.platform.startswith("linux") else None)
+# Linux-only socket option that attaches the kernel arrival time (struct timespec) to each datagram
+SO_TIMESTAMPNS = getattr(socket, "SO_TIMESTAMPNS", 35 if sys.platform.startswith("linux") else None)
+_TIMESPEC = struct.Struct("@ll")
+
+
+def create_multicast_socket(multicast_group: str, port: int, rcvbuf_size: int = None) -> socket.socket:
     """Create a socket for multicast reception"""
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
     sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
     
+    # Enlarge the kernel queue so bursts from several cameras are not dropped
+    if rcvbuf_size is not None:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf_size)
+    
     # On Windows, bind to empty string
     sock.bind(("", port))
     
@@ -28,6 +44,135 @@ def create_multicast_socket(multicast_group: str, port: int) -> socket.socket:
     return sock
 
 
+@dataclass
+class ReceiverStats:
+    """Counters reported by VisionReceiver"""
+    packets: int = 0          # Datagrams received
+    bytes: int = 0            # Payload bytes received
+    wakeups: int = 0          # Drains that returned at least one datagram
+    max_backlog: int = 0      # Most datagrams drained in a single wakeup
+    pool_exhausted: int = 0   # Drains that filled every buffer (more may be queued)
+    truncated: int = 0        # Datagrams larger than the buffer size
+    kernel_drops: int = 0     # Datagrams dropped by the kernel (Linux only)
+    rcvbuf_size: int = 0      # Effective SO_RCVBUF granted by the kernel
+
+
+class VisionReceiver:
+    """Non-blocking SSL-Vision receiver that drains every pending datagram per wakeup
+
+    Datagrams are received with recv_into into a preallocated pool of buffers,
+    so the receive loop does not allocate a new bytes object per packet.
+    """
+
+    def __init__(
+        self,
+        multicast_group: str = MULTICAST_GROUP,
+        port: int = PORT,
+        pool_size: int = 64,
+        buffer_size: int = MAX_DATAGRAM_SIZE,
+        rcvbuf_size: int = DEFAULT_RCVBUF_SIZE,
+    ):
+        self.sock = create_multicast_socket(multicast_group, port, rcvbuf_size)
+        self.sock.setblocking(False)
+        self.stats = ReceiverStats(
+            rcvbuf_size=self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+        )
+        
+        self._buffers = [bytearray(buffer_size) for _ in range(pool_size)]
+        self._views = [memoryview(buf) for buf in self._buffers]
+        self._buffer_size = buffer_size
+        # perf_counter time at which each datagram of the last poll / drain arrived
+        self.receive_times = []
+        # Add to a perf_counter time to get the time.time() of the same instant
+        self.wall_offset = time.time() - time.perf_counter()
+        
+        # Use recvmsg_into when available so the kernel drop counter and arrival times can be read
+        self._ancbufsize = 0
+        if hasattr(self.sock, "recvmsg_into"):
+            for option, size in ((SO_RXQ_OVFL, 4), (SO_TIMESTAMPNS, _TIMESPEC.size)):
+                if option is None:
+                    continue
+                try:
+                    self.sock.setsockopt(socket.SOL_SOCKET, option, 1)
+                    self._ancbufsize += socket.CMSG_SPACE(size)
+                except OSError:
+                    pass
+        
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self.sock, selectors.EVENT_READ)
+
+    def fileno(self) -> int:
+        return self.sock.fileno()
+
+    def poll(self, timeout: float = None) -> list:
+        """Wait up to timeout seconds, then drain all pending datagrams
+
+        Returns memoryviews into the buffer pool; they are only valid until the next call.
+        """
+        if not self._selector.select(timeout):
+            return []
+        return self.drain()
+
+    def drain(self) -> list:
+        """Receive every datagram currently queued, without blocking
+
+        receive_times then holds the arrival time of each returned datagram: the
+        kernel timestamp where available, else the time it was read.
+        """
+        packets = []
+        times = []
+        for view in self._views:
+            try:
+                nbytes, t_receive = self._receive(view)
+            except (BlockingIOError, InterruptedError):
+                break
+            packets.append(view[:nbytes])
+            times.append(t_receive)
+        else:
+            self.stats.pool_exhausted += 1
+        self.receive_times = times
+        
+        if packets:
+            self.stats.packets += len(packets)
+            self.stats.wakeups += 1
+            if len(packets) > self.stats.max_backlog:
+                self.stats.max_backlog = len(packets)
+        return packets
+
+    def _receive(self, view: memoryview) -> tuple:
+        """Receive one datagram into view; returns (nbytes, perf_counter arrival time)"""
+        if not self._ancbufsize:
+            nbytes = self.sock.recv_into(view)
+            t_receive = time.perf_counter()
+            if nbytes >= self._buffer_size:
+                self.stats.truncated += 1
+        else:
+            nbytes, ancdata, flags, _ = self.sock.recvmsg_into([view], self._ancbufsize)
+            t_receive = time.perf_counter()
+            if flags & socket.MSG_TRUNC:
+                self.stats.truncated += 1
+            for level, kind, value in ancdata:
+                if level != socket.SOL_SOCKET:
+                    continue
+                if kind == SO_RXQ_OVFL and len(value) >= 4:
+                    self.stats.kernel_drops = struct.unpack_from("=I", value)[0]
+                elif kind == SO_TIMESTAMPNS and len(value) >= _TIMESPEC.size:
+                    seconds, nanoseconds = _TIMESPEC.unpack_from(value)
+                    t_receive = seconds + nanoseconds * 1e-9 - self.wall_offset
+        self.stats.bytes += nbytes
+        return nbytes, t_receive
+
+    def close(self):
+        self._selector.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
 def print_detection_frame(detection):
     """Print detection frame information"""
     print(f"\n=== Frame {detection.frame_number} (Camera {detection.camera_id}) ===")
@@ -58,49 +203,66 @@ def print_detection_frame(detection):
             print(f"  ID {robot_id}: x={robot.x:.1f}mm, y={robot.y:.1f}mm, orientation={orientation} (confidence: {robot.confidence:.2f})")
 
 
+def print_field_geometry(field):
+    """Print field geometry information"""
+    print("\n[Field Info]")
+    print(f"  Size: {field.field_length:.0f}mm x {field.field_width:.0f}mm")
+    print(f"  Goal: {field.goal_width:.0f}mm x {field.goal_depth:.0f}mm")
+    print(f"  Defense area: {field.penalty_area_depth:.0f}mm x {field.penalty_area_width:.0f}mm")
+    print(f"  Lines: {len(field.lines)}, arcs: {len(field.arcs)}, cameras: {sorted(field.cameras)}")
+    if field.straight_two_phase is not None:
+        acc_slide, acc_roll, k_switch = field.straight_two_phase
+        print(f"  Ball rolling: acc_slide={acc_slide:.2f}, acc_roll={acc_roll:.2f}, k_switch={k_switch:.2f}")
+    if field.chip_fixed_loss is not None:
+        first, other, z = field.chip_fixed_loss
+        print(f"  Ball chip: damping xy first hop={first:.2f}, other hops={other:.2f}, z={z:.2f}")
+
+
 def main():
-    # SSL-Vision multicast address
-    MULTICAST_GROUP = "224.5.23.2"
-    PORT = 10006
-    
+    # Imported here so that importing VisionReceiver does not load NumPy
+    from field_geometry import FieldGeometryCache
+    from vision_filter import DetectionFilter
+
     print("Receiving SSL-Vision data...")
     print(f"Multicast address: {MULTICAST_GROUP}:{PORT}")
     print("Press Ctrl+C to exit")
     print()
     
+    receiver = None
+    detection_filter = DetectionFilter()
     try:
-        sock = create_multicast_socket(MULTICAST_GROUP, PORT)
-        sock.settimeout(5.0)  # 5 second timeout
+        receiver = VisionReceiver(MULTICAST_GROUP, PORT)
+        packet = SSL_WrapperPacket()
+        geometry_cache = FieldGeometryCache()
         
         while True:
-            try:
-                data, addr = sock.recvfrom(65535)
-                
+            datagrams = receiver.poll(timeout=5.0)  # 5 second timeout
+            if not datagrams:
+                print("Waiting for data... (timeout)")
+                continue
+            
+            for data in datagrams:
                 # Parse packet
-                packet = SSL_WrapperPacket()
                 packet.ParseFromString(data)
                 
-                # Print if detection frame is present
-                if packet.HasField("detection"):
-                    print_detection_frame(packet.detection)
+                # Geometry information (print only when it changes)
+                if packet.HasField("geometry") and geometry_cache.update(packet.geometry):
+                    print_field_geometry(geometry_cache.field)
+                    detection_filter.set_field(geometry_cache.field)
                 
-                # Geometry information (print only once)
-                if packet.HasField("geometry"):
-                    field = packet.geometry.field
-                    print("\n[Field Info]")
-                    print(f"  Size: {field.field_length}mm x {field.field_width}mm")
-                    print(f"  Goal: {field.goal_width}mm x {field.goal_depth}mm")
-                    
-            except socket.timeout:
-                print("Waiting for data... (timeout)")
-                continue
+                # Print if detection frame is present, without implausible detections
+                if packet.HasField("detection") and detection_filter.filter_detection(packet.detection):
+                    print_detection_frame(packet.detection)
                 
     except KeyboardInterrupt:
         print("\nExiting...")
     except Exception as e:
         print(f"Error: {e}")
     finally:
-        sock.close()
+        if receiver is not None:
+            print(f"Receiver stats: {receiver.stats}")
+            print(detection_filter.report())
+            receiver.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,253 @@
+"""
+Script to receive robot feedback (grSim Robots_Status) for both teams
+grSim reports each robot's infrared sensor (ball at the dribbler) and kick
+flags on one port per team. Every packet updates a (2, MAX_ROBOTS_PER_TEAM)
+array of status bits, and the bits that changed become events, so a
+controller learns about ball contact or a fired kick from the next packet
+instead of inferring it from several vision frames
+
+Usage:
+    python robot_status.py [--blue-port 30011] [--yellow-port 30012]
+    python robot_status.py --stub
+"""
+import argparse
+import selectors
+import socket
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from vision_fusion import BLUE, YELLOW, MAX_ROBOTS_PER_TEAM
+from wire import VARINT, LENGTH_DELIMITED, read_varint, skip_field
+
+# grSim default feedback ports
+BLUE_STATUS_PORT = 30011
+YELLOW_STATUS_PORT = 30012
+
+# Status bits
+INFRARED = 1
+FLAT_KICK = 2
+CHIP_KICK = 4
+
+# Event kinds
+CONTACT_GAINED, CONTACT_LOST, FLAT_KICK_FIRED, CHIP_KICK_FIRED = range(4)
+EVENT_NAMES = ("contact gained", "contact lost", "flat kick", "chip kick")
+
+# (event kind, status bit, True for a rising edge)
+_EDGES = (
+    (CONTACT_GAINED, INFRARED, True),
+    (CONTACT_LOST, INFRARED, False),
+    (FLAT_KICK_FIRED, FLAT_KICK, True),
+    (CHIP_KICK_FIRED, CHIP_KICK, True),
+)
+
+# Robots_Status.robots_status and the Robot_Status flags, keyed by field number
+TAG_ROBOTS_STATUS = 1 << 3 | LENGTH_DELIMITED
+_FLAG_BITS = {2: INFRARED, 3: FLAT_KICK, 4: CHIP_KICK}
+
+
+@dataclass(frozen=True)
+class StatusEvent:
+    team: int
+    robot_id: int
+    kind: int
+    t: float  # time.time() when the packet was received
+
+    def __str__(self):
+        team = "blue" if self.team == BLUE else "yellow"
+        return f"{team} {self.robot_id}: {EVENT_NAMES[self.kind]}"
+
+
+def decode_status(data, robot_ids: np.ndarray, bits: np.ndarray) -> int:
+    """Decode a Robots_Status packet into robot_ids / bits; returns the number of robots
+
+    Reads the wire format directly; robots with an id outside 0..MAX_ROBOTS_PER_TEAM-1
+    are dropped.
+    """
+    count = 0
+    pos, end = 0, len(data)
+    while pos < end:
+        tag, pos = read_varint(data, pos)
+        if tag != TAG_ROBOTS_STATUS:
+            pos = skip_field(data, pos, tag & 7)
+            continue
+        length, pos = read_varint(data, pos)
+        robot_end = pos + length
+        robot_id, flags = -1, 0
+        while pos < robot_end:
+            tag, pos = read_varint(data, pos)
+            if tag & 7 != VARINT:
+                pos = skip_field(data, pos, tag & 7)
+                continue
+            value, pos = read_varint(data, pos)
+            if tag >> 3 == 1:
+                robot_id = value
+            elif value:
+                flags |= _FLAG_BITS.get(tag >> 3, 0)
+        if 0 <= robot_id < MAX_ROBOTS_PER_TEAM and count < len(robot_ids):
+            robot_ids[count] = robot_id
+            bits[count] = flags
+            count += 1
+    return count
+
+
+class RobotStatusReceiver:
+    """Non-blocking receiver of both teams' Robots_Status
+
+    status[team, robot_id] holds the latest INFRARED / FLAT_KICK / CHIP_KICK bits;
+    robots missing from a packet keep their previous bits.
+    """
+
+    def __init__(self, blue_port: int = BLUE_STATUS_PORT, yellow_port: int = YELLOW_STATUS_PORT, host: str = ""):
+        self.status = np.zeros((2, MAX_ROBOTS_PER_TEAM), dtype=np.uint8)
+        self.seen = np.zeros((2, MAX_ROBOTS_PER_TEAM), dtype=bool)
+        self.packets = [0, 0]
+        self.decode_errors = 0
+
+        self._selector = selectors.DefaultSelector()
+        self._sockets = []
+        for team, port in ((BLUE, blue_port), (YELLOW, yellow_port)):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind((host, port))
+            sock.setblocking(False)
+            self._selector.register(sock, selectors.EVENT_READ, team)
+            self._sockets.append(sock)
+
+        self._buffer = bytearray(4096)
+        self._view = memoryview(self._buffer)
+        self._robot_ids = np.empty(MAX_ROBOTS_PER_TEAM, dtype=np.intp)
+        self._bits = np.empty(MAX_ROBOTS_PER_TEAM, dtype=np.uint8)
+
+    def contact(self, team: int) -> np.ndarray:
+        """Bool per robot: ball at the dribbler according to the last packet"""
+        return (self.status[team] & INFRARED) != 0
+
+    def poll(self, timeout: float = None) -> list:
+        """Wait up to timeout seconds, then apply every pending packet; returns the new events"""
+        events = []
+        for key, _ in self._selector.select(timeout):
+            sock, team = key.fileobj, key.data
+            while True:
+                try:
+                    nbytes = sock.recv_into(self._view)
+                except (BlockingIOError, InterruptedError):
+                    break
+                events += self.update(team, self._view[:nbytes])
+        return events
+
+    def update(self, team: int, data, t: float = None) -> list:
+        """Apply one Robots_Status packet of a team and return the edges it caused"""
+        try:
+            count = decode_status(data, self._robot_ids, self._bits)
+        except (IndexError, ValueError):
+            self.decode_errors += 1
+            return []
+        self.packets[team] += 1
+        robot_ids = self._robot_ids[:count]
+
+        previous = self.status[team].copy()
+        self.status[team, robot_ids] = self._bits[:count]
+        self.seen[team, robot_ids] = True
+        rising = self.status[team] & ~previous
+        falling = previous & ~self.status[team]
+        if not (rising.any() or falling.any()):
+            return []
+
+        t = time.time() if t is None else t
+        events = []
+        for kind, bit, edge in _EDGES:
+            for robot_id in np.flatnonzero((rising if edge else falling) & bit):
+                events.append(StatusEvent(team, int(robot_id), kind, t))
+        return events
+
+    def close(self):
+        self._selector.close()
+        for sock in self._sockets:
+            sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def run_stub_check():
+    """Drive a stub grSim into ball contact and a kick and report the events"""
+    from generated import Robots_Status, grSim_Packet
+    from send_robot_command import create_robot_command, send_command
+    from sim_stub import StubSimulator, GrSimStubServer, CENTER_TO_DRIBBLER
+
+    blue_port, yellow_port, command_port = 30096, 30097, 20097
+    address = ("127.0.0.1", command_port)
+
+    # The wire decoder must agree with protobuf
+    status = Robots_Status()
+    for robot_id in range(MAX_ROBOTS_PER_TEAM):
+        status.robots_status.add(robot_id=robot_id, infrared=robot_id % 2 == 0,
+                                 flat_kick=robot_id % 3 == 0, chip_kick=robot_id % 5 == 0)
+    robot_ids = np.empty(MAX_ROBOTS_PER_TEAM, dtype=np.intp)
+    bits = np.empty(MAX_ROBOTS_PER_TEAM, dtype=np.uint8)
+    count = decode_status(status.SerializeToString(), robot_ids, bits)
+    expected = [(r.robot_id, r.infrared * INFRARED | r.flat_kick * FLAT_KICK | r.chip_kick * CHIP_KICK)
+                for r in status.robots_status]
+    assert list(zip(robot_ids[:count].tolist(), bits[:count].tolist())) == expected
+    print("Wire decoder matches protobuf")
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server = GrSimStubServer(StubSimulator(), command_port, 10097, status_ports=(blue_port, yellow_port))
+    with RobotStatusReceiver(blue_port, yellow_port, host="127.0.0.1") as receiver:
+        server.start()
+        try:
+            # Put the ball on blue 0's dribbler, then kick it
+            packet = grSim_Packet()
+            packet.replacement.ball.x = CENTER_TO_DRIBBLER / 1000
+            packet.replacement.ball.y = 0.0
+            robot = packet.replacement.robots.add()
+            robot.x, robot.y, robot.dir, robot.id, robot.yellowteam = 0.0, 0.0, 0.0, 0, False
+            t_sent = time.time()
+            sock.sendto(packet.SerializeToString(), address)
+            seen = []
+            while len(seen) < 3 and time.time() - t_sent < 2.0:
+                for event in receiver.poll(timeout=0.1):
+                    if event.team == BLUE and event.robot_id == 0:
+                        print(f"  {event} after {(event.t - t_sent) * 1e3:.1f}ms")
+                        seen.append(event.kind)
+                        if event.kind == CONTACT_GAINED:
+                            t_sent = time.time()
+                            send_command(sock, address, [create_robot_command(0, kickspeedx=3.0)])
+        finally:
+            server.stop()
+            sock.close()
+        print(f"Packets: blue {receiver.packets[BLUE]}, yellow {receiver.packets[YELLOW]}")
+    assert seen == [CONTACT_GAINED, CONTACT_LOST, FLAT_KICK_FIRED] or \
+        seen == [CONTACT_GAINED, FLAT_KICK_FIRED, CONTACT_LOST], seen
+    print("Contact and kick events OK")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print robot feedback events from grSim")
+    parser.add_argument("--blue-port", type=int, default=BLUE_STATUS_PORT)
+    parser.add_argument("--yellow-port", type=int, default=YELLOW_STATUS_PORT)
+    parser.add_argument("--stub", action="store_true", help="Check against a stub simulator instead")
+    args = parser.parse_args()
+
+    if args.stub:
+        run_stub_check()
+        return
+
+    print(f"Receiving robot status on ports {args.blue_port} (blue) and {args.yellow_port} (yellow)")
+    print("Press Ctrl+C to exit")
+    with RobotStatusReceiver(args.blue_port, args.yellow_port) as receiver:
+        try:
+            while True:
+                for event in receiver.poll(timeout=1.0):
+                    print(event)
+        except KeyboardInterrupt:
+            print("\nExiting...")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Script to run many short grSim scenarios in parallel
+Every worker process gets its own command/vision port pair (and by default
+its own stub simulator), places a set-piece with grSim_Replacement, runs a
+controller through send_command, and reports metrics; the results of all
+scenarios are collected into one table
+
+Usage:
+    python scenario_runner.py [--workers 8] [--out results.csv]
+"""
+import argparse
+import csv
+import math
+import multiprocessing
+import socket
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+from generated import grSim_Packet, SSL_WrapperPacket
+from receive_vision import VisionReceiver, MULTICAST_GROUP
+from scheduler import RateScheduler
+from send_robot_command import create_robot_command, send_command
+from tracker import BatchTracker
+from vision_fusion import FrameFuser, BLUE
+
+# Worker i uses command port BASE_COMMAND_PORT + i and vision port BASE_VISION_PORT + i
+BASE_COMMAND_PORT = 21000
+BASE_VISION_PORT = 11000
+
+FIELD_LENGTH = 12000.0  # [mm]
+GOAL_WIDTH = 1800.0     # [mm]
+
+
+@dataclass
+class Scenario:
+    """A set-piece and the controller that plays it"""
+    name: str
+    controller: callable                      # controller(tracker, t) -> [(commands, is_yellow), ...]
+    ball: tuple = (0.0, 0.0, 0.0, 0.0)        # x, y [m], vx, vy [m/s]
+    robots: list = field(default_factory=list)  # (is_yellow, robot_id, x [m], y [m], dir [deg])
+    duration: float = 3.0                     # [s]
+    rate: float = 60.0                        # Control rate [Hz]
+
+
+def build_replacement(scenario: Scenario) -> bytes:
+    """Encode the set-piece of a scenario as a grSim replacement packet"""
+    packet = grSim_Packet()
+    ball = packet.replacement.ball
+    ball.x, ball.y, ball.vx, ball.vy = scenario.ball
+    for is_yellow, robot_id, x, y, direction in scenario.robots:
+        packet.replacement.robots.add(x=x, y=y, dir=direction, id=robot_id, yellowteam=is_yellow, turnon=True)
+    return packet.SerializeToString()
+
+
+def kick_to_goal(tracker: BatchTracker, t: float, robot_id: int = 0) -> list:
+    """Example controller: blue robot drives behind the ball and kicks it at the +x goal"""
+    robot, ball = tracker.robot(BLUE, robot_id), tracker.ball
+    if robot is None or ball is None:
+        return [([create_robot_command(robot_id)], False)]
+    (x, y, orientation), _ = robot
+    (ball_x, ball_y), _ = ball
+
+    to_goal = math.atan2(-ball_y, FIELD_LENGTH / 2 - ball_x)
+    # Approach point 150 mm behind the ball on the line to the goal
+    target_x = ball_x - 150.0 * math.cos(to_goal)
+    target_y = ball_y - 150.0 * math.sin(to_goal)
+    aligned = math.hypot(target_x - x, target_y - y) < 80.0
+    if aligned:
+        target_x, target_y = ball_x, ball_y
+
+    dx, dy = (target_x - x) / 1000.0, (target_y - y) / 1000.0
+    c, s = math.cos(orientation), math.sin(orientation)
+    speed = 2.0 * min(1.0, math.hypot(dx, dy) / 0.5)
+    norm = math.hypot(dx, dy) or 1.0
+    forward = speed * (c * dx + s * dy) / norm
+    left = speed * (-s * dx + c * dy) / norm
+    error = math.atan2(math.sin(to_goal - orientation), math.cos(to_goal - orientation))
+    command = create_robot_command(
+        robot_id, veltangent=forward, velnormal=left, velangular=4.0 * error,
+        kickspeedx=5.0 if aligned and abs(error) < 0.1 else 0.0,
+    )
+    return [([command], False)]
+
+
+_ports = None
+
+
+def _init_worker(port_queue):
+    global _ports
+    _ports = port_queue.get()
+
+
+def run_scenario(scenario: Scenario, ports: tuple = None, use_stub: bool = True) -> dict:
+    """Run one scenario and return its metrics
+
+    ports is (command_port, vision_port); the worker's pair inside run_scenarios,
+    else BASE_COMMAND_PORT and BASE_VISION_PORT.
+    """
+    command_port, vision_port = ports or _ports or (BASE_COMMAND_PORT, BASE_VISION_PORT)
+    server = None
+    if use_stub:
+        from sim_stub import StubSimulator, GrSimStubServer
+        server = GrSimStubServer(StubSimulator(), command_port, vision_port).start()
+
+    address = ("127.0.0.1", command_port)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    fuser = FrameFuser()
+    tracker = BatchTracker()
+    packet = SSL_WrapperPacket()
+    metrics = {"scenario": scenario.name, "command_port": command_port, "frames": 0,
+               "goal": False, "time_to_goal": math.nan, "ball_travel": 0.0}
+    last_ball = None
+
+    try:
+        with VisionReceiver(MULTICAST_GROUP, vision_port, pool_size=16) as receiver:
+            sock.sendto(build_replacement(scenario), address)
+            scheduler = RateScheduler()
+            start = time.perf_counter()
+
+            def tick(deadline):
+                nonlocal last_ball
+                t = deadline - start
+                if t >= scenario.duration:
+                    scheduler.stop()
+                    return
+                for data in receiver.drain():
+                    packet.ParseFromString(data)
+                    if packet.HasField("detection"):
+                        metrics["frames"] += 1
+                        snapshot = fuser.add_frame(packet.detection)
+                        if snapshot is not None:
+                            tracker.update_snapshot(snapshot)
+
+                ball = tracker.ball
+                if ball is not None:
+                    (ball_x, ball_y), _ = ball
+                    if last_ball is not None:
+                        metrics["ball_travel"] += math.hypot(ball_x - last_ball[0], ball_y - last_ball[1])
+                    last_ball = (ball_x, ball_y)
+                    if not metrics["goal"] and ball_x > FIELD_LENGTH / 2 and abs(ball_y) < GOAL_WIDTH / 2:
+                        metrics["goal"] = True
+                        metrics["time_to_goal"] = t
+
+                for commands, is_yellow in scenario.controller(tracker, t):
+                    send_command(sock, address, commands, is_yellow)
+
+            scheduler.add("control", scenario.rate, tick)
+            scheduler.run()
+            task = scheduler.tasks[0]
+            metrics["control_overruns"] = task.overruns
+    finally:
+        sock.close()
+        if server is not None:
+            server.stop()
+
+    if last_ball is not None:
+        metrics["final_ball_x"], metrics["final_ball_y"] = last_ball
+    return metrics
+
+
+def run_scenarios(scenarios: list, workers: int = None, use_stub: bool = True) -> list:
+    """Run scenarios across a process pool, one port pair per worker; returns rows in input order"""
+    workers = workers or os.cpu_count() or 1
+    with multiprocessing.Manager() as manager:
+        port_queue = manager.Queue()
+        for i in range(workers):
+            port_queue.put((BASE_COMMAND_PORT + i, BASE_VISION_PORT + i))
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(port_queue,)) as pool:
+            return list(pool.map(run_scenario, scenarios, [None] * len(scenarios), [use_stub] * len(scenarios)))
+
+
+def print_table(rows: list):
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    widths = [max(len(c), *(len(_format(row.get(c))) for row in rows)) for c in columns]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(_format(row.get(c)).ljust(w) for c, w in zip(columns, widths)))
+
+
+def _format(value) -> str:
+    if isinstance(value, float):
+        return "-" if math.isnan(value) else f"{value:.2f}"
+    return "-" if value is None else str(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep kick-to-goal set-pieces across all cores")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out", help="Write the result table to a CSV file")
+    parser.add_argument("--count", type=int, default=16, help="Number of scenarios")
+    args = parser.parse_args()
+
+    # Ball placed on a line across the opponent half, shooter 1 m behind it
+    scenarios = []
+    for i in range(args.count):
+        ball_y = -2.0 + 4.0 * i / max(args.count - 1, 1)
+        scenarios.append(Scenario(
+            name=f"kick_y{ball_y:+.2f}",
+            controller=kick_to_goal,
+            ball=(2.0, ball_y, 0.0, 0.0),
+            robots=[(False, 0, 1.0, ball_y, 0.0)],
+        ))
+
+    start = time.perf_counter()
+    rows = run_scenarios(scenarios, args.workers)
+    print_table(rows)
+    print(f"\n{len(rows)} scenarios in {time.perf_counter() - start:.1f}s")
+
+    if args.out:
+        columns = list(dict.fromkeys(key for row in rows for key in row))
+        with open(args.out, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
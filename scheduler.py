@@ -0,0 +1,248 @@
+"""
+Fixed-rate scheduler for control and telemetry loops
+Callbacks fire on absolute deadlines of a monotonic clock, so the period does
+not drift by the time spent encoding and sending, and every task keeps
+jitter and overrun histograms
+"""
+import bisect
+import heapq
+import time
+
+# What to do when a task falls more than one period behind
+CATCH_UP = "catch_up"  # Run the missed ticks back to back (up to max_catch_up)
+SKIP = "skip"          # Drop the missed ticks and realign to the next deadline
+
+# Histogram bin edges [s]
+DEFAULT_BINS = (50e-6, 100e-6, 250e-6, 500e-6, 1e-3, 2e-3, 5e-3, 10e-3, 20e-3, 50e-3)
+
+
+class Histogram:
+    """Fixed-bin histogram of durations in seconds"""
+
+    def __init__(self, edges=DEFAULT_BINS):
+        self.edges = tuple(edges)
+        self.counts = [0] * (len(self.edges) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float):
+        self.counts[bisect.bisect_right(self.edges, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q: float) -> float:
+        """Upper edge of the bin containing the q-th percentile, at most max"""
+        if not self.count:
+            return 0.0
+        target = q / 100.0 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target and count:
+                return min(self.edges[i], self.max) if i < len(self.edges) else self.max
+        return self.max
+
+    def __str__(self) -> str:
+        labels = [f"<{edge * 1e3:g}ms" for edge in self.edges] + [f">={self.edges[-1] * 1e3:g}ms"]
+        return " ".join(f"{label}:{count}" for label, count in zip(labels, self.counts) if count)
+
+
+class PeriodicTask:
+    """A callback run at a fixed rate by RateScheduler"""
+
+    def __init__(self, name: str, period: float, callback, policy: str, max_catch_up: int):
+        if policy not in (CATCH_UP, SKIP):
+            raise ValueError(f"Unknown policy: {policy}")
+        self.name = name
+        self.period = period
+        self.callback = callback
+        self.policy = policy
+        self.max_catch_up = max_catch_up
+        self.deadline = 0.0
+
+        self.runs = 0
+        self.skipped = 0    # Ticks dropped because the task fell behind
+        self.overruns = 0   # Runs that took longer than one period
+        self.jitter = Histogram()   # Start time - deadline
+        self.overrun = Histogram()  # Run time beyond one period
+
+    def _run(self, now: float, clock) -> float:
+        """Run one tick that was due at self.deadline; returns the next deadline"""
+        if self.policy == SKIP and now - self.deadline >= self.period:
+            # Woken a period or more late (oversleep, another task's callback): drop every
+            # deadline that has passed instead of running this one late
+            missed = int((now - self.deadline) // self.period) + 1
+            self.skipped += missed
+            self.deadline += missed * self.period
+            return self.deadline
+        self.jitter.add(now - self.deadline)
+        self.callback(self.deadline)
+        elapsed = clock() - now
+        self.runs += 1
+        if elapsed > self.period:
+            self.overruns += 1
+            self.overrun.add(elapsed - self.period)
+
+        self.deadline += self.period
+        behind = int((clock() - self.deadline) // self.period)
+        if behind > 0:
+            # behind + 1 deadlines have passed; SKIP drops them all and waits for the next one
+            limit = self.max_catch_up if self.policy == CATCH_UP else 0
+            missed = behind + 1 - limit
+            if missed > 0:
+                self.skipped += missed
+                self.deadline += missed * self.period
+        return self.deadline
+
+    def summary(self) -> str:
+        return (
+            f"{self.name}: {self.runs} runs at {1.0 / self.period:g}Hz, "
+            f"{self.skipped} skipped, {self.overruns} overruns, "
+            f"jitter mean={self.jitter.mean * 1e3:.3f}ms "
+            f"p99<={self.jitter.percentile(99) * 1e3:.3f}ms max={self.jitter.max * 1e3:.3f}ms"
+        )
+
+
+class RateScheduler:
+    """Run several PeriodicTasks on absolute deadlines of one monotonic clock"""
+
+    def __init__(self, clock=time.perf_counter, sleep=time.sleep, spin: float = 0.0005):
+        self.clock = clock
+        self.sleep = sleep
+        self.spin = spin  # Busy-wait the last part of each wait for sub-ms accuracy
+        self.tasks = []
+        self._queue = []
+        self._running = False
+
+    def add(self, name: str, rate_hz: float, callback, policy: str = SKIP, max_catch_up: int = 3) -> PeriodicTask:
+        """Add a task; callback(deadline) runs every 1/rate_hz seconds
+
+        The first deadline is when run() starts, or now for a task added while running.
+        """
+        task = PeriodicTask(name, 1.0 / rate_hz, callback, policy, max_catch_up)
+        self.tasks.append(task)
+        if self._running:
+            task.deadline = self.clock()
+            heapq.heappush(self._queue, (task.deadline, len(self.tasks) - 1))
+        return task
+
+    def stop(self):
+        """Make run() return after the current callback"""
+        self._running = False
+
+    def run(self, duration: float = None):
+        """Run until stop() is called or duration seconds have passed
+
+        Every task's schedule starts now, so time spent before run() is not counted as missed ticks.
+        """
+        self._running = True
+        start = self.clock()
+        end = None if duration is None else start + duration
+        for task in self.tasks:
+            task.deadline = start
+        self._queue = [(start, index) for index in range(len(self.tasks))]
+        heapq.heapify(self._queue)
+        while self._running and self._queue:
+            deadline, index = self._queue[0]
+            if end is not None and deadline >= end:
+                break
+            self._wait_until(deadline)
+            heapq.heapreplace(self._queue, (self.tasks[index]._run(self.clock(), self.clock), index))
+        self._running = False
+
+    def _wait_until(self, deadline: float):
+        remaining = deadline - self.clock()
+        if remaining > self.spin:
+            self.sleep(remaining - self.spin)
+        while self.clock() < deadline:
+            pass
+
+    def report(self) -> str:
+        lines = []
+        for task in self.tasks:
+            lines.append(task.summary())
+            if task.overruns:
+                lines.append(f"  overrun: {task.overrun}")
+        return "\n".join(lines)
+
+
+class _FakeClock:
+    """Clock and sleep for the checks; every reading advances 1us like a real clock"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def clock(self) -> float:
+        self.now += 1e-6
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += max(seconds, 0.0)
+
+
+def run_checks():
+    """Regression checks on a fake clock"""
+    # Setup time between add() and run() is not counted as missed ticks
+    fake = _FakeClock()
+    scheduler = RateScheduler(fake.clock, fake.sleep, spin=0.0)
+    task = scheduler.add("late start", 100, lambda deadline: None, policy=CATCH_UP)
+    fake.sleep(0.5)
+    scheduler.run(duration=0.2)
+    assert task.runs == 20 and task.skipped == 0, task.summary()
+    assert task.jitter.max < 1e-4, task.summary()
+
+    # After a stall, SKIP resumes on the next future period boundary instead of firing late
+    fake = _FakeClock()
+    scheduler = RateScheduler(fake.clock, fake.sleep, spin=0.0)
+    starts = []
+
+    def stall_once(deadline):
+        starts.append(fake.now)
+        if len(starts) == 3:
+            fake.sleep(0.035)  # 3.5 periods
+
+    task = scheduler.add("stall", 100, stall_once, policy=SKIP)
+    scheduler.run(duration=0.1)
+    stall_end = starts[2] + 0.035
+    assert starts[3] > stall_end and starts[3] - stall_end < 0.01, starts[:5]
+    assert task.skipped == 3 and task.jitter.max < 1e-4, task.summary()
+
+    # A wait that overshoots by more than a period is skipped under SKIP, not run late
+    fake = _FakeClock()
+    sleeps = []
+
+    def oversleep(seconds):
+        sleeps.append(seconds)
+        fake.sleep(seconds + (0.025 if len(sleeps) == 3 else 0.0))  # 2.5 periods late once
+
+    scheduler = RateScheduler(fake.clock, oversleep, spin=0.0)
+    task = scheduler.add("oversleep", 100, lambda deadline: None, policy=SKIP)
+    scheduler.run(duration=0.1)
+    assert task.skipped == 3 and task.jitter.max < 1e-4, task.summary()
+
+    # Percentiles never exceed the largest value seen
+    histogram = Histogram()
+    histogram.add(3e-3)
+    assert histogram.percentile(99) == 3e-3, histogram.percentile(99)
+    print("Scheduler checks OK")
+
+
+def main():
+    run_checks()
+    print("Running 120Hz control and 10Hz telemetry tasks for 3 seconds...")
+    scheduler = RateScheduler()
+    scheduler.add("control", 120, lambda deadline: None)
+    scheduler.add("telemetry", 10, lambda deadline: None)
+    scheduler.run(duration=3.0)
+    print(scheduler.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -5,14 +5,8 @@ Sample to move a robot forward, backward, left, and right
 import socket
 import time
 import math
-import sys
-import os
 
-# Add generated folder to path
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), "generated"))
-
-from grSim_Packet_pb2 import grSim_Packet
-from grSim_Commands_pb2 import grSim_Commands, grSim_Robot_Command
+from generated import grSim_Packet, grSim_Commands, grSim_Robot_Command
 
 
 def create_robot_command(
@@ -23,6 +17,7 @@ def create_robot_command(
     kickspeedx: float = 0.0,  # Kick speed X
     kickspeedz: float = 0.0,  # Kick speed Z (for chip kick)
     spinner: bool = False,    # Dribbler ON/OFF
+    wheels=None,              # Speeds of wheel1..wheel4 (rad/s), used instead of the velocities
 ) -> grSim_Robot_Command:
     """Create a robot command"""
     cmd = grSim_Robot_Command()
@@ -33,31 +28,72 @@ def create_robot_command(
     cmd.velnormal = velnormal
     cmd.velangular = velangular
     cmd.spinner = spinner
-    cmd.wheelsspeed = False
+    cmd.wheelsspeed = wheels is not None
+    if wheels is not None:
+        cmd.wheel1, cmd.wheel2, cmd.wheel3, cmd.wheel4 = (float(w) for w in wheels)
     return cmd
 
 
-def send_command(
-    sock: socket.socket,
-    address: tuple,
+def build_packet(
     robot_commands: list,
     is_yellow: bool = False,
-):
-    """Send command to grSim"""
+    timestamp: float = None,
+) -> grSim_Packet:
+    """Build a grSim packet carrying robot commands"""
     packet = grSim_Packet()
-    packet.commands.timestamp = time.time()
+    packet.commands.timestamp = time.time() if timestamp is None else timestamp
     packet.commands.isteamyellow = is_yellow
     
     for cmd in robot_commands:
         packet.commands.robot_commands.append(cmd)
     
-    data = packet.SerializeToString()
+    return packet
+
+
+def send_command(
+    sock: socket.socket,
+    address: tuple,
+    robot_commands: list,
+    is_yellow: bool = False,
+    timestamp: float = None,
+):
+    """Send command to grSim
+
+    timestamp (grSim_Commands.timestamp) is the send time and defaults to the
+    current time. To relate a command to the vision frame it answers, record the
+    pair on the sending side (see latency_trace.LatencyTracer.command) instead of
+    putting the frame's t_capture into this field.
+    """
+    data = build_packet(robot_commands, is_yellow, timestamp).SerializeToString()
     sock.sendto(data, address)
 
 
+def demo_sequence():
+    """Yield the create_robot_command arguments of each tick of the movement demo"""
+    patterns = [
+        ("Moving forward...", 50, dict(veltangent=1.0)),   # Pattern 1: Move forward
+        ("Stopping...", 30, dict()),                        # Pattern 2: Stop
+        ("Moving backward...", 50, dict(veltangent=-1.0)), # Pattern 3: Move backward
+        ("Stopping...", 30, dict()),                        # Pattern 4: Stop
+        ("Moving left...", 50, dict(velnormal=1.0)),        # Pattern 5: Move left
+        ("Stopping...", 30, dict()),                        # Pattern 6: Stop
+        ("Moving right...", 50, dict(velnormal=-1.0)),      # Pattern 7: Move right
+        ("Stopping...", 30, dict()),                        # Pattern 8: Stop
+        ("Rotating...", 100, dict(velangular=3.0)),         # Pattern 9: Rotate
+        ("Stopping...", 30, dict()),                        # Final stop
+    ]
+    for label, ticks, kwargs in patterns:
+        print(label)
+        for _ in range(ticks):
+            yield kwargs
+
+
 def main():
+    from scheduler import RateScheduler
+    
     # grSim destination address
     GRSIM_ADDRESS = ("127.0.0.1", 20011)
+    RATE_HZ = 60
     
     # Create UDP socket
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -67,82 +103,28 @@ def main():
     print("Press Ctrl+C to exit")
     print()
     
+    # Demo: move robot ID 0
+    robot_id = 0
+    is_yellow = False  # Blue team
+    
+    # Send one command per tick on a fixed 60Hz clock
+    scheduler = RateScheduler()
+    sequence = demo_sequence()
+    
+    def tick(deadline):
+        kwargs = next(sequence, None)
+        if kwargs is None:
+            scheduler.stop()
+            return
+        cmd = create_robot_command(robot_id, **kwargs)
+        send_command(sock, GRSIM_ADDRESS, [cmd], is_yellow)
+    
+    scheduler.add("commands", RATE_HZ, tick)
+    
     try:
-        # Demo: move robot ID 0
-        robot_id = 0
-        is_yellow = False  # Blue team
-        
-        # Pattern 1: Move forward
-        print("Moving forward...")
-        for _ in range(50):
-            cmd = create_robot_command(robot_id, veltangent=1.0)
-            send_command(sock, GRSIM_ADDRESS, [cmd], is_yellow)
-            time.sleep(0.016)  # ~60Hz
-        
-        # Pattern 2: Stop
-        print("Stopping...")
-        for _ in range(30):
-            cmd = create_robot_command(robot_id)
-            send_command(sock, GRSIM_ADDRESS, [cmd], is_yellow)
-            time.sleep(0.016)
-        
-        # Pattern 3: Move backward
-        print("Moving backward...")
-        for _ in range(50):
-            cmd = create_robot_command(robot_id, veltangent=-1.0)
-            send_command(sock, GRSIM_ADDRESS, [cmd], is_yellow)
-            time.sleep(0.016)
-        
-        # Pattern 4: Stop
-        print("Stopping...")
-        for _ in range(30):
-            cmd = create_robot_command(robot_id)
-            send_command(sock, GRSIM_ADDRESS, [cmd], is_yellow)
-            time.sleep(0.016)
-        
-        # Pattern 5: Move left
-        print("Moving left...")
-        for _ in range(50):
-            cmd = create_robot_command(robot_id, velnormal=1.0)
-            send_command(sock, GRSIM_ADDRESS, [cmd], is_yellow)
-            time.sleep(0.016)
-        
-        # Pattern 6: Stop
-        print("Stopping...")
-        for _ in range(30):
-            cmd = create_robot_command(robot_id)
-            send_command(sock, GRSIM_ADDRESS, [cmd], is_yellow)
-            time.sleep(0.016)
-        
-        # Pattern 7: Move right
-        print("Moving right...")
-        for _ in range(50):
-            cmd = create_robot_command(robot_id, velnormal=-1.0)
-            send_command(sock, GRSIM_ADDRESS, [cmd], is_yellow)
-            time.sleep(0.016)
-        
-        # Pattern 8: Stop
-        print("Stopping...")
-        for _ in range(30):
-            cmd = create_robot_command(robot_id)
-            send_command(sock, GRSIM_ADDRESS, [cmd], is_yellow)
-            time.sleep(0.016)
-        
-        # Pattern 9: Rotate
-        print("Rotating...")
-        for _ in range(100):
-            cmd = create_robot_command(robot_id, velangular=3.0)
-            send_command(sock, GRSIM_ADDRESS, [cmd], is_yellow)
-            time.sleep(0.016)
-        
-        # Final stop
-        print("Stopping...")
-        for _ in range(30):
-            cmd = create_robot_command(robot_id)
-            send_command(sock, GRSIM_ADDRESS, [cmd], is_yellow)
-            time.sleep(0.016)
-        
+        scheduler.run()
         print("Demo complete!")
+        print(scheduler.report())
         
     except KeyboardInterrupt:
         print("\nExiting...")
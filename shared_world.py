@@ -0,0 +1,329 @@
+"""
+Script to share the latest fused world state between processes
+One publisher receives and decodes SSL-Vision once and writes every fused
+snapshot into a ring of slots in multiprocessing.shared_memory. Each slot is
+guarded by a sequence counter (seqlock), so readers in other processes get
+consistent NumPy views without locks, protobuf parsing or pickling
+
+Usage:
+    python shared_world.py publish [--name ssl_world]
+    python shared_world.py watch [--name ssl_world]
+    python shared_world.py bench
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from vision_fusion import WorldSnapshot, MAX_ROBOTS_PER_TEAM
+
+DEFAULT_NAME = "ssl_world"
+MAGIC = b"SSLWRLD1"
+MAX_CAMERAS = 64  # Bits of camera_mask
+
+HEADER_DTYPE = np.dtype([
+    ("magic", "S8"),
+    ("slots", "<u4"),
+    ("max_balls", "<u4"),
+    ("published", "<u8"),    # Number of snapshots written; the newest is in slot (published - 1) % slots
+], align=True)
+
+
+def slot_dtype(max_balls: int) -> np.dtype:
+    return np.dtype([
+        ("seq", "<u8"),          # Odd while the writer is inside the slot
+        ("frame_number", "<u8"),
+        ("t_capture", "<f8"),
+        ("t_sent", "<f8"),
+        ("t_publish", "<f8"),    # time.time() when the slot was written
+        ("camera_mask", "<u8"),  # Bit i set when camera i < MAX_CAMERAS contributed
+        ("ball_count", "<u4"),
+        ("robots", "<f8", (2, MAX_ROBOTS_PER_TEAM, 4)),
+        ("visible", "?", (2, MAX_ROBOTS_PER_TEAM)),
+        ("balls", "<f8", (max_balls, 4)),
+    ], align=True)
+
+
+# Python < 3.13 registers attached blocks with the resource tracker (POSIX only)
+_TRACKS_ATTACHED = os.name == "posix" and sys.version_info < (3, 13)
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Open an existing block without letting this process's resource tracker unlink it"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13 registers every attached block; undo that for this one
+        shm = shared_memory.SharedMemory(name=name)
+        if _TRACKS_ATTACHED:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class _SlotViews:
+    """Field views over the header and slot ring of a shared block"""
+
+    def __init__(self, shm: shared_memory.SharedMemory, slots: int, max_balls: int):
+        self.header = np.ndarray((), dtype=HEADER_DTYPE, buffer=shm.buf)
+        ring = np.ndarray(slots, dtype=slot_dtype(max_balls), buffer=shm.buf, offset=HEADER_DTYPE.itemsize)
+        self.slots = slots
+        self.max_balls = max_balls
+        self.seq = ring["seq"]
+        self.frame_number = ring["frame_number"]
+        self.t_capture = ring["t_capture"]
+        self.t_sent = ring["t_sent"]
+        self.t_publish = ring["t_publish"]
+        self.camera_mask = ring["camera_mask"]
+        self.ball_count = ring["ball_count"]
+        self.robots = ring["robots"]
+        self.visible = ring["visible"]
+        self.balls = ring["balls"]
+
+    @staticmethod
+    def size(slots: int, max_balls: int) -> int:
+        return HEADER_DTYPE.itemsize + slots * slot_dtype(max_balls).itemsize
+
+
+class SharedWorldWriter:
+    """Single writer of the shared snapshot ring
+
+    With create=False it takes over a ring created elsewhere, which then stays
+    owned (and is unlinked) by its creator.
+    """
+
+    def __init__(self, name: str = DEFAULT_NAME, slots: int = 8, max_balls: int = 16, create: bool = True):
+        self.owner = create
+        if create:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=_SlotViews.size(slots, max_balls))
+        else:
+            self.shm = _attach(name)
+            header = np.ndarray((), dtype=HEADER_DTYPE, buffer=self.shm.buf)
+            slots, max_balls = int(header["slots"]), int(header["max_balls"])
+        self.name = self.shm.name
+        self.unmapped_cameras = 0  # Camera ids >= MAX_CAMERAS left out of camera_mask
+        self._views = _SlotViews(self.shm, slots, max_balls)
+        if create:
+            header = self._views.header
+            header["magic"] = MAGIC
+            header["slots"] = slots
+            header["max_balls"] = max_balls
+            header["published"] = 0
+
+    def publish(self, snapshot: WorldSnapshot, t_publish: float = None):
+        views = self._views
+        published = int(views.header["published"])
+        i = published % views.slots
+        seq = int(views.seq[i])
+
+        views.seq[i] = seq + 1
+        views.frame_number[i] = snapshot.frame_number
+        views.t_capture[i] = snapshot.t_capture
+        views.t_sent[i] = snapshot.t_sent
+        views.t_publish[i] = time.time() if t_publish is None else t_publish
+        mask = 0
+        for camera_id in snapshot.camera_ids:
+            if camera_id < MAX_CAMERAS:
+                mask |= 1 << camera_id
+            else:
+                self.unmapped_cameras += 1
+        views.camera_mask[i] = mask
+        views.robots[i] = snapshot.robots
+        views.visible[i] = snapshot.visible
+        count = min(len(snapshot.balls), views.max_balls)
+        views.balls[i, :count] = snapshot.balls[:count]
+        views.ball_count[i] = count
+        views.seq[i] = seq + 2
+
+        views.header["published"] = published + 1
+
+    def close(self):
+        del self._views  # Release the exported buffer before closing
+        self.shm.close()
+        if self.owner:
+            if _TRACKS_ATTACHED:
+                # A block attached in this process tree was unregistered from the shared
+                # tracker; register it again so unlink() can unregister it
+                resource_tracker.register(self.shm._name, "shared_memory")
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SharedWorldReader:
+    """Lock-free reader of the newest snapshot in a shared ring
+
+    read() returns a WorldSnapshot whose arrays are views into shared memory. The
+    writer only returns to a slot after filling all others, so the views stay
+    intact for slots - 1 publishes; valid() tells whether they still are.
+    """
+
+    def __init__(self, name: str = DEFAULT_NAME):
+        self.shm = _attach(name)
+        header = np.ndarray((), dtype=HEADER_DTYPE, buffer=self.shm.buf)
+        if bytes(header["magic"]) != MAGIC:
+            raise ValueError(f"Shared memory {name} does not hold a world ring")
+        self._views = _SlotViews(self.shm, int(header["slots"]), int(header["max_balls"]))
+        self.retries = 0
+        self._slot = None
+        self._seq = None
+
+    @property
+    def published(self) -> int:
+        return int(self._views.header["published"])
+
+    def read(self, copy: bool = False, max_retries: int = 100) -> WorldSnapshot:
+        """Newest consistent snapshot, or None if nothing was published yet"""
+        views = self._views
+        for _ in range(max_retries):
+            published = int(views.header["published"])
+            if not published:
+                return None
+            i = (published - 1) % views.slots
+            seq = int(views.seq[i])
+            if seq & 1:
+                self.retries += 1
+                continue
+
+            mask = int(views.camera_mask[i])
+            count = int(views.ball_count[i])
+            robots, visible, balls = views.robots[i], views.visible[i], views.balls[i, :count]
+            if copy:
+                robots, visible, balls = robots.copy(), visible.copy(), balls.copy()
+            snapshot = WorldSnapshot(
+                t_capture=float(views.t_capture[i]),
+                t_sent=float(views.t_sent[i]),
+                frame_number=int(views.frame_number[i]),
+                camera_ids=tuple(c for c in range(MAX_CAMERAS) if mask >> c & 1),
+                robots=robots,
+                visible=visible,
+                balls=balls,
+            )
+            if int(views.seq[i]) == seq:
+                self._slot, self._seq = i, seq
+                return snapshot
+            self.retries += 1
+        raise TimeoutError("Writer kept overwriting the newest slot")
+
+    def valid(self) -> bool:
+        """Whether the views of the last read() have not been overwritten since"""
+        return self._slot is not None and int(self._views.seq[self._slot]) == self._seq
+
+    def close(self):
+        del self._views
+        self.shm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def publish(name: str):
+    from fast_decoder import FastDecoder
+    from receive_vision import VisionReceiver, MULTICAST_GROUP, PORT
+    from vision_fusion import FrameFuser
+
+    decoder = FastDecoder()
+    fuser = FrameFuser()
+    with VisionReceiver(MULTICAST_GROUP, PORT) as receiver, SharedWorldWriter(name) as writer:
+        print(f"Publishing {MULTICAST_GROUP}:{PORT} to shared memory '{writer.name}'")
+        print("Press Ctrl+C to exit")
+        try:
+            while True:
+                for data in receiver.poll(timeout=1.0):
+                    frame = decoder.decode(data)
+                    if frame.has_detection:
+                        snapshot = fuser.add_decoded(frame)
+                        if snapshot is not None:
+                            writer.publish(snapshot)
+        except KeyboardInterrupt:
+            print("\nExiting...")
+        if writer.unmapped_cameras:
+            print(f"Camera ids >= {MAX_CAMERAS} left out of the camera mask: {writer.unmapped_cameras}")
+
+
+def watch(name: str):
+    from vision_fusion import print_snapshot
+
+    with SharedWorldReader(name) as reader:
+        last = 0
+        try:
+            while True:
+                if reader.published != last:
+                    last = reader.published
+                    snapshot = reader.read()
+                    print_snapshot(snapshot)
+                time.sleep(0.1)
+        except KeyboardInterrupt:
+            print("\nExiting...")
+
+
+def _bench_writer(name: str, duration: float):
+    """Publish synthetic snapshots as fast as possible; every value equals the frame number"""
+    writer = SharedWorldWriter(name, create=False)
+
+    robots = np.zeros((2, MAX_ROBOTS_PER_TEAM, 4))
+    visible = np.ones((2, MAX_ROBOTS_PER_TEAM), dtype=bool)
+    balls = np.zeros((1, 4))
+    end = time.perf_counter() + duration
+    frame_number = 0
+    while time.perf_counter() < end:
+        frame_number += 1
+        robots.fill(frame_number)
+        balls.fill(frame_number)
+        writer.publish(WorldSnapshot(frame_number, frame_number, frame_number, (0,), robots, visible, balls))
+    writer.close()
+
+
+def bench(duration: float = 2.0):
+    with SharedWorldWriter(f"{DEFAULT_NAME}_bench") as owner:
+        writer = multiprocessing.Process(target=_bench_writer, args=(owner.name, duration))
+        writer.start()
+        reads = torn = 0
+        with SharedWorldReader(owner.name) as reader:
+            while writer.is_alive():
+                for copy in (False, True):
+                    snapshot = reader.read(copy=copy)
+                    if snapshot is None:
+                        continue
+                    reads += 1
+                    expected = snapshot.frame_number
+                    consistent = ((snapshot.robots == expected).all() and (snapshot.balls == expected).all()
+                                  and snapshot.t_capture == expected)
+                    # Views are only guaranteed while the slot has not been reused
+                    if not consistent and (copy or reader.valid()):
+                        torn += 1
+            published, retries = reader.published, reader.retries
+        writer.join()
+    print(f"Writer published {published / duration:.0f} snapshots/s")
+    print(f"Reader: {reads / duration:.0f} reads/s, {retries} retries, {torn} inconsistent snapshots")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    for command, help_text in (("publish", "Receive vision and publish fused snapshots"),
+                               ("watch", "Print snapshots from shared memory")):
+        command_parser = commands.add_parser(command, help=help_text)
+        command_parser.add_argument("--name", default=DEFAULT_NAME)
+    commands.add_parser("bench", help="Measure throughput and check for torn reads")
+    args = parser.parse_args()
+
+    if args.command == "publish":
+        publish(args.name)
+    elif args.command == "watch":
+        watch(args.name)
+    else:
+        bench()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+"""
+Minimal stand-in simulator for testing clients without grSim
+Robots follow their velocity commands exactly and the ball rolls with
+constant deceleration; there are no collisions. The world is exposed over
+the synchronous simulation protocol (SimulationSyncRequest/Response over UDP)
+or like grSim (grSim_Packet commands in, SSL_WrapperPacket vision and
+Robots_Status feedback out)
+"""
+import math
+import socket
+import threading
+import time
+
+import numpy as np
+
+from generated import (
+    grSim_Packet, Robots_Status, Team, SimulationSyncRequest, SimulationSyncResponse, SSL_DetectionFrame,
+    SSL_WrapperPacket,
+)
+from kinematics import WheelKinematics, DEFAULT_WHEEL_RADIUS, GRSIM_WHEEL_ORDER
+from vision_fusion import BLUE, YELLOW, MAX_ROBOTS_PER_TEAM
+
+SYNC_PORT = 10300
+
+ROBOT_RADIUS = 90.0          # [mm]
+CENTER_TO_DRIBBLER = 80.0    # [mm]
+BALL_RADIUS = 21.5           # [mm]
+BALL_DECELERATION = 400.0    # Rolling friction [mm/s^2]
+
+# Every robot uses the default wheel geometry
+_WHEELS = WheelKinematics(count=1)
+
+
+def team_index(team: int) -> int:
+    """Convert an ssl_gc_common Team to the BLUE/YELLOW index used by the arrays"""
+    return YELLOW if team == Team.YELLOW else BLUE
+
+
+class StubSimulator:
+    """Kinematic world model of both teams and the ball (positions in mm, like vision)"""
+
+    def __init__(self, robots_per_team: int = 6, field_length: float = 12000.0, field_width: float = 9000.0):
+        self.field_length = field_length
+        self.field_width = field_width
+        self.time = 0.0
+        self.frame_number = 0
+
+        shape = (2, MAX_ROBOTS_PER_TEAM)
+        self.robot_pos = np.zeros(shape + (3,))     # x, y, orientation
+        self.robot_vel = np.zeros(shape + (3,))     # Global vx, vy [mm/s], angular [rad/s]
+        self.present = np.zeros(shape, dtype=bool)
+        self.kick_speed = np.zeros(shape)           # Requested kick speed [mm/s]
+        self.kicked = np.zeros(shape, dtype=bool)   # Kicked the ball in the last step
+        self.ball_pos = np.zeros(3)
+        self.ball_vel = np.zeros(3)
+
+        # Line both teams up on their own half
+        for team, side in ((BLUE, -1.0), (YELLOW, 1.0)):
+            for robot_id in range(robots_per_team):
+                self.robot_pos[team, robot_id] = (
+                    side * field_length / 4, (robot_id - (robots_per_team - 1) / 2) * 400.0,
+                    0.0 if side < 0 else math.pi,
+                )
+                self.present[team, robot_id] = True
+
+    def set_local_velocity(self, team: int, robot_id: int, forward: float, left: float, angular: float):
+        """Set a robot velocity in its own frame [m/s, rad/s]"""
+        orientation = self.robot_pos[team, robot_id, 2]
+        c, s = math.cos(orientation), math.sin(orientation)
+        self.robot_vel[team, robot_id] = (
+            1000.0 * (c * forward - s * left), 1000.0 * (s * forward + c * left), angular
+        )
+
+    def set_wheel_velocity(self, team: int, robot_id: int, wheels):
+        """Set a robot velocity from wheel surface speeds [m/s], front right first"""
+        forward, left, angular = _WHEELS.body_velocity(np.asarray(wheels, dtype=float)[None])[0]
+        self.set_local_velocity(team, robot_id, forward, left, angular)
+
+    def set_global_velocity(self, team: int, robot_id: int, vx: float, vy: float, angular: float):
+        """Set a robot velocity in field coordinates [m/s, rad/s]"""
+        self.robot_vel[team, robot_id] = (1000.0 * vx, 1000.0 * vy, angular)
+
+    def apply_robot_control(self, team: int, robot_control):
+        """Apply a simulation-protocol RobotControl for one team"""
+        for command in robot_control.robot_commands:
+            if command.id >= MAX_ROBOTS_PER_TEAM:
+                continue
+            move = command.move_command
+            kind = move.WhichOneof("command")
+            if kind == "local_velocity":
+                v = move.local_velocity
+                self.set_local_velocity(team, command.id, v.forward, v.left, v.angular)
+            elif kind == "global_velocity":
+                v = move.global_velocity
+                self.set_global_velocity(team, command.id, v.x, v.y, v.angular)
+            elif kind == "wheel_velocity":
+                v = move.wheel_velocity
+                self.set_wheel_velocity(team, command.id, (v.front_right, v.back_right, v.back_left, v.front_left))
+            self.kick_speed[team, command.id] = 1000.0 * command.kick_speed
+
+    def apply_simulator_command(self, simulator_command):
+        """Apply the teleports of a SimulatorCommand"""
+        control = simulator_command.control
+        if control.HasField("teleport_ball"):
+            ball = control.teleport_ball
+            for axis, name in enumerate(("x", "y", "z")):
+                if ball.HasField(name):
+                    self.ball_pos[axis] = 1000.0 * getattr(ball, name)
+            for axis, name in enumerate(("vx", "vy", "vz")):
+                if ball.HasField(name):
+                    self.ball_vel[axis] = 1000.0 * getattr(ball, name)
+        for robot in control.teleport_robot:
+            team, robot_id = team_index(robot.id.team), robot.id.id
+            if robot_id >= MAX_ROBOTS_PER_TEAM:
+                continue
+            if robot.HasField("x"):
+                self.robot_pos[team, robot_id, 0] = 1000.0 * robot.x
+            if robot.HasField("y"):
+                self.robot_pos[team, robot_id, 1] = 1000.0 * robot.y
+            if robot.HasField("orientation"):
+                self.robot_pos[team, robot_id, 2] = robot.orientation
+            self.robot_vel[team, robot_id] = (1000.0 * robot.v_x, 1000.0 * robot.v_y, robot.v_angular)
+            if robot.HasField("present"):
+                self.present[team, robot_id] = robot.present
+
+    def apply_grsim_packet(self, packet):
+        """Apply the commands and replacements of a grSim_Packet"""
+        if packet.HasField("commands"):
+            team = YELLOW if packet.commands.isteamyellow else BLUE
+            for command in packet.commands.robot_commands:
+                if command.id >= MAX_ROBOTS_PER_TEAM:
+                    continue
+                if command.wheelsspeed:
+                    wheels = np.empty(4)
+                    wheels[GRSIM_WHEEL_ORDER] = DEFAULT_WHEEL_RADIUS * np.array(
+                        (command.wheel1, command.wheel2, command.wheel3, command.wheel4)
+                    )
+                    self.set_wheel_velocity(team, command.id, wheels)
+                else:
+                    self.set_local_velocity(
+                        team, command.id, command.veltangent, command.velnormal, command.velangular
+                    )
+                self.kick_speed[team, command.id] = 1000.0 * command.kickspeedx
+
+        replacement = packet.replacement
+        if packet.HasField("replacement") and replacement.HasField("ball"):
+            ball = replacement.ball
+            self.ball_pos[:2] = (1000.0 * ball.x, 1000.0 * ball.y)
+            self.ball_vel[:2] = (1000.0 * ball.vx, 1000.0 * ball.vy)
+        for robot in replacement.robots:
+            team = YELLOW if robot.yellowteam else BLUE
+            if robot.id >= MAX_ROBOTS_PER_TEAM:
+                continue
+            self.robot_pos[team, robot.id] = (1000.0 * robot.x, 1000.0 * robot.y, math.radians(robot.dir))
+            self.robot_vel[team, robot.id] = 0.0
+            if robot.HasField("turnon"):
+                self.present[team, robot.id] = robot.turnon
+
+    def dribbler_contact(self) -> np.ndarray:
+        """(2, MAX_ROBOTS_PER_TEAM) bool: ball touching each robot's dribbler"""
+        orientation = self.robot_pos[..., 2]
+        dribbler_x = self.robot_pos[..., 0] + CENTER_TO_DRIBBLER * np.cos(orientation)
+        dribbler_y = self.robot_pos[..., 1] + CENTER_TO_DRIBBLER * np.sin(orientation)
+        distance = np.hypot(self.ball_pos[0] - dribbler_x, self.ball_pos[1] - dribbler_y)
+        return self.present & (distance <= BALL_RADIUS + 20.0)
+
+    def step(self, dt: float):
+        """Advance the world by dt seconds"""
+        moving = self.present[..., None]
+        self.robot_pos += np.where(moving, self.robot_vel * dt, 0.0)
+        self.robot_pos[..., 2] = (self.robot_pos[..., 2] + math.pi) % (2 * math.pi) - math.pi
+
+        # Kick the ball away from any robot whose dribbler touches it
+        kickers = np.argwhere(self.dribbler_contact() & (self.kick_speed > 0))
+        self.kicked[:] = False
+        if len(kickers):
+            team, robot_id = kickers[0]
+            self.kicked[team, robot_id] = True
+            orientation = self.robot_pos[team, robot_id, 2]
+            speed = self.kick_speed[team, robot_id]
+            self.ball_vel[:2] = (speed * math.cos(orientation), speed * math.sin(orientation))
+        self.kick_speed[:] = 0.0
+
+        speed = math.hypot(self.ball_vel[0], self.ball_vel[1])
+        if speed > 0:
+            new_speed = max(speed - BALL_DECELERATION * dt, 0.0)
+            self.ball_pos[:2] += self.ball_vel[:2] * dt * (speed + new_speed) / (2 * speed)
+            self.ball_vel[:2] *= new_speed / speed
+        self.ball_vel[2] = 0.0
+        self.ball_pos[2] = 0.0
+
+        self.time += dt
+        self.frame_number += 1
+
+    def detection_frame(self, camera_id: int = 0) -> SSL_DetectionFrame:
+        """Everything on the field as seen by one perfect camera"""
+        frame = SSL_DetectionFrame(
+            frame_number=self.frame_number, t_capture=self.time, t_sent=self.time, camera_id=camera_id
+        )
+        frame.balls.add(confidence=1.0, x=self.ball_pos[0], y=self.ball_pos[1], pixel_x=0, pixel_y=0)
+        for team, robots in ((BLUE, frame.robots_blue), (YELLOW, frame.robots_yellow)):
+            for robot_id in np.flatnonzero(self.present[team]):
+                x, y, orientation = self.robot_pos[team, robot_id]
+                robots.add(
+                    confidence=1.0, robot_id=int(robot_id), x=x, y=y, orientation=orientation,
+                    pixel_x=0, pixel_y=0,
+                )
+        return frame
+
+    def robots_status(self, team: int) -> Robots_Status:
+        """grSim robot feedback of one team: infrared (ball at the dribbler) and kick flags"""
+        status = Robots_Status()
+        contact = self.dribbler_contact()[team]
+        for robot_id in np.flatnonzero(self.present[team]):
+            status.robots_status.add(
+                robot_id=int(robot_id), infrared=bool(contact[robot_id]),
+                flat_kick=bool(self.kicked[team, robot_id]), chip_kick=False,
+            )
+        return status
+
+
+class SyncSimulatorServer:
+    """Serve a StubSimulator over the synchronous protocol, one response per request"""
+
+    def __init__(self, simulator: StubSimulator, port: int = SYNC_PORT, team: int = BLUE, host: str = "127.0.0.1"):
+        self.simulator = simulator
+        self.team = team  # Team controlled by RobotControl in the requests
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.settimeout(0.1)
+        self.address = self.sock.getsockname()
+        self._running = False
+        self._thread = None
+
+    def handle(self, data: bytes) -> bytes:
+        request = SimulationSyncRequest()
+        request.ParseFromString(data)
+        simulator = self.simulator
+        if request.HasField("simulator_command"):
+            simulator.apply_simulator_command(request.simulator_command)
+        if request.HasField("robot_control"):
+            simulator.apply_robot_control(self.team, request.robot_control)
+        if request.sim_step > 0:
+            simulator.step(request.sim_step)
+
+        response = SimulationSyncResponse()
+        response.detection.append(simulator.detection_frame())
+        contact = simulator.dribbler_contact()[self.team]
+        for robot_id in np.flatnonzero(simulator.present[self.team]):
+            response.robot_control_response.feedback.add(
+                id=int(robot_id), dribbler_ball_contact=bool(contact[robot_id])
+            )
+        return response.SerializeToString()
+
+    def serve_forever(self):
+        self._running = True
+        while self._running:
+            try:
+                data, addr = self.sock.recvfrom(65535)
+            except socket.timeout:
+                continue
+            self.sock.sendto(self.handle(data), addr)
+
+    def start(self):
+        """Serve from a background thread"""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+        self.sock.close()
+
+
+class GrSimStubServer:
+    """Serve a StubSimulator like grSim: commands in over UDP, vision out over multicast in real time
+
+    With status_ports=(blue, yellow) it also sends each team's Robots_Status every
+    frame, as grSim does on ports 30011 and 30012.
+    """
+
+    def __init__(
+        self,
+        simulator: StubSimulator,
+        command_port: int = 20011,
+        vision_port: int = 10006,
+        vision_group: str = "224.5.23.2",
+        rate: float = 60.0,
+        status_ports: tuple = None,
+    ):
+        self.simulator = simulator
+        self.rate = rate
+        self.status_addresses = [("127.0.0.1", port) for port in status_ports or ()]
+        self.vision_address = (vision_group, vision_port)
+        self.command_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.command_sock.bind(("127.0.0.1", command_port))
+        self.command_sock.setblocking(False)
+        self.vision_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        self.vision_sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+        self.vision_sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+        self._scheduler = None
+        self._thread = None
+
+    def tick(self, deadline: float = None):
+        """Apply pending commands, advance one frame and publish it"""
+        packet = grSim_Packet()
+        while True:
+            try:
+                data = self.command_sock.recv(65535)
+            except (BlockingIOError, InterruptedError):
+                break
+            packet.ParseFromString(data)
+            self.simulator.apply_grsim_packet(packet)
+
+        self.simulator.step(1.0 / self.rate)
+        wrapper = SSL_WrapperPacket()
+        wrapper.detection.CopyFrom(self.simulator.detection_frame())
+        # Real-time mode stamps frames with wall-clock time, like SSL-Vision
+        wrapper.detection.t_capture = wrapper.detection.t_sent = time.time()
+        self.vision_sock.sendto(wrapper.SerializeToString(), self.vision_address)
+        for team, address in zip((BLUE, YELLOW), self.status_addresses):
+            self.command_sock.sendto(self.simulator.robots_status(team).SerializeToString(), address)
+
+    def start(self):
+        """Run from a background thread"""
+        from scheduler import RateScheduler
+
+        self._scheduler = RateScheduler()
+        self._scheduler.add("simulator", self.rate, self.tick)
+        self._thread = threading.Thread(target=self._scheduler.run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._scheduler is not None:
+            self._scheduler.stop()
+            self._thread.join()
+        self.command_sock.close()
+        self.vision_sock.close()
+
+
+def main():
+    server = SyncSimulatorServer(StubSimulator())
+    print(f"Stub simulator serving the synchronous protocol on {server.address[0]}:{server.address[1]}")
+    print("Press Ctrl+C to exit")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nExiting...")
+    finally:
+        server.sock.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Script to drive a simulator step by step with the synchronous simulation protocol
+Each SimulationSyncRequest advances the simulation by sim_step seconds and is
+answered by a SimulationSyncResponse with the resulting detection frames, so
+strategies can be evaluated deterministically and faster than real time
+"""
+import argparse
+import socket
+import time
+
+from generated import RobotCommand, SimulationSyncRequest, SimulationSyncResponse
+from sim_stub import SYNC_PORT
+from wire import LENGTH_DELIMITED, encode_varint
+
+SYNC_ADDRESS = ("127.0.0.1", SYNC_PORT)
+
+# Key of SimulationSyncRequest.simulator_command (field 2, length-delimited)
+_SIMULATOR_COMMAND_TAG = bytes([2 << 3 | LENGTH_DELIMITED])
+
+
+def local_velocity_command(
+    robot_id: int,
+    forward: float = 0.0,         # Velocity towards the dribbler (m/s)
+    left: float = 0.0,            # Velocity to the left (m/s)
+    angular: float = 0.0,         # Angular velocity (rad/s)
+    kick_speed: float = 0.0,      # Kick speed (m/s)
+    dribbler_speed: float = 0.0,  # Dribbler speed (rpm)
+) -> RobotCommand:
+    """Create a simulation-protocol robot command in the robot frame"""
+    cmd = RobotCommand(id=robot_id, kick_speed=kick_speed, dribbler_speed=dribbler_speed)
+    velocity = cmd.move_command.local_velocity
+    velocity.forward = forward
+    velocity.left = left
+    velocity.angular = angular
+    return cmd
+
+
+def global_velocity_command(
+    robot_id: int,
+    x: float = 0.0,               # Velocity along the field x-axis (m/s)
+    y: float = 0.0,               # Velocity along the field y-axis (m/s)
+    angular: float = 0.0,         # Angular velocity (rad/s)
+    kick_speed: float = 0.0,
+    dribbler_speed: float = 0.0,
+) -> RobotCommand:
+    """Create a simulation-protocol robot command in field coordinates"""
+    cmd = RobotCommand(id=robot_id, kick_speed=kick_speed, dribbler_speed=dribbler_speed)
+    velocity = cmd.move_command.global_velocity
+    velocity.x = x
+    velocity.y = y
+    velocity.angular = angular
+    return cmd
+
+
+def wheel_velocity_command(
+    robot_id: int,
+    wheels,                       # Wheel surface speeds (m/s): front right, back right, back left, front left
+    kick_speed: float = 0.0,
+    dribbler_speed: float = 0.0,
+) -> RobotCommand:
+    """Create a simulation-protocol robot command from wheel speeds (see kinematics.py)"""
+    cmd = RobotCommand(id=robot_id, kick_speed=kick_speed, dribbler_speed=dribbler_speed)
+    velocity = cmd.move_command.wheel_velocity
+    velocity.front_right, velocity.back_right, velocity.back_left, velocity.front_left = (float(w) for w in wheels)
+    return cmd
+
+
+class SyncSimulationClient:
+    """Lockstep client: every step() sends one request and waits for its response"""
+
+    def __init__(self, address: tuple = SYNC_ADDRESS, timeout: float = 2.0):
+        self.address = address
+        self.timeout = timeout
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.settimeout(timeout)
+        self.sim_time = 0.0
+        self.steps = 0
+        self._request = SimulationSyncRequest()
+
+    def step(self, sim_step: float, robot_commands=(), simulator_command=None) -> SimulationSyncResponse:
+        """Advance the simulation by sim_step seconds and return the resulting state
+
+        simulator_command is a SimulatorCommand, or one already serialized (e.g. a cached
+        teleport from teleport.py), which is appended to the request without re-encoding.
+        """
+        request = self._request
+        request.Clear()
+        request.sim_step = sim_step
+        if robot_commands:
+            request.robot_control.robot_commands.extend(robot_commands)
+        encoded_command = b""
+        if isinstance(simulator_command, (bytes, bytearray)):
+            encoded_command = _SIMULATOR_COMMAND_TAG + encode_varint(len(simulator_command)) + simulator_command
+        elif simulator_command is not None:
+            request.simulator_command.CopyFrom(simulator_command)
+
+        self._discard_stale()
+        self.sock.sendto(request.SerializeToString() + encoded_command, self.address)
+        try:
+            data = self.sock.recv(65535)
+        except socket.timeout:
+            raise TimeoutError(f"No response from simulator at {self.address[0]}:{self.address[1]}")
+
+        response = SimulationSyncResponse()
+        response.ParseFromString(data)
+        self.sim_time += sim_step
+        self.steps += 1
+        return response
+
+    def _discard_stale(self):
+        """Drop late responses to earlier requests so replies stay paired with requests"""
+        self.sock.setblocking(False)
+        try:
+            while True:
+                self.sock.recv(65535)
+        except (BlockingIOError, InterruptedError):
+            pass
+        finally:
+            self.sock.settimeout(self.timeout)
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive robot 0 forward in lockstep")
+    parser.add_argument("--host", default=SYNC_ADDRESS[0])
+    parser.add_argument("--port", type=int, default=SYNC_ADDRESS[1])
+    parser.add_argument("--stub", action="store_true", help="Start a local stub simulator")
+    parser.add_argument("--steps", type=int, default=600)
+    args = parser.parse_args()
+
+    server = None
+    if args.stub:
+        from sim_stub import StubSimulator, SyncSimulatorServer
+        server = SyncSimulatorServer(StubSimulator(), port=args.port, host=args.host).start()
+
+    print(f"Stepping simulator at {args.host}:{args.port}...")
+    try:
+        with SyncSimulationClient((args.host, args.port)) as client:
+            start = time.perf_counter()
+            response = None
+            for _ in range(args.steps):
+                response = client.step(1 / 60, [local_velocity_command(0, forward=1.0)])
+            elapsed = time.perf_counter() - start
+
+        for frame in response.detection:
+            for robot in frame.robots_blue:
+                if robot.robot_id == 0:
+                    print(f"Blue robot 0 at x={robot.x:.1f}mm, y={robot.y:.1f}mm")
+        print(f"Simulated {client.sim_time:.1f}s in {elapsed:.2f}s ({client.sim_time / elapsed:.0f}x real time)")
+    except TimeoutError as e:
+        print(f"Error: {e}")
+    finally:
+        if server is not None:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Script to teleport whole formations (both teams and the ball) in one go
+A formation is held as arrays and packed into as few datagrams as possible,
+either grSim_Replacement packets for grSim or SimulatorCommand messages for
+simulators speaking the SSL simulation protocol. Named formations are encoded
+once and cached, so a repeated reset is a single sendto
+"""
+import math
+import socket
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from generated import grSim_Packet, Team, SimulatorCommand
+from vision_fusion import BLUE, YELLOW, MAX_ROBOTS_PER_TEAM
+
+GRSIM = "grsim"
+SIMULATOR = "simulator"
+
+GRSIM_ADDRESS = ("127.0.0.1", 20011)
+SIMULATOR_ADDRESS = ("127.0.0.1", 10300)  # Simulator control port of the simulation protocol
+
+# Largest UDP payload that is not fragmented on Ethernet (1500 - IP and UDP headers)
+MAX_PAYLOAD_SIZE = 1472
+
+FIELD_WIDTH = 9.0  # [m]
+
+
+def parked_positions(field_width: float = FIELD_WIDTH) -> np.ndarray:
+    """(2, MAX_ROBOTS_PER_TEAM, 3) poses in a row behind the -y touch line"""
+    poses = np.zeros((2, MAX_ROBOTS_PER_TEAM, 3))
+    slots = np.arange(MAX_ROBOTS_PER_TEAM) + 1
+    poses[BLUE, :, 0] = -0.3 * slots
+    poses[YELLOW, :, 0] = 0.3 * slots
+    poses[..., 1] = -(field_width / 2 + 0.4)
+    poses[..., 2] = math.pi / 2
+    return poses
+
+
+@dataclass
+class Formation:
+    """Poses of all robot slots and the ball state (m, rad, m/s)
+
+    Robots that are not present are switched off at their pose, which defaults to a
+    parking spot outside the field. ball is (x, y, vx, vy), or None to leave it alone.
+    """
+    robots: np.ndarray = field(default_factory=parked_positions)  # (2, 16, 3) x, y, orientation
+    present: np.ndarray = field(default_factory=lambda: np.zeros((2, MAX_ROBOTS_PER_TEAM), dtype=bool))
+    ball: np.ndarray = field(default_factory=lambda: np.zeros(4))
+
+    def place(self, team: int, robot_id: int, x: float, y: float, orientation: float = 0.0) -> "Formation":
+        self.robots[team, robot_id] = (x, y, orientation)
+        self.present[team, robot_id] = True
+        return self
+
+
+def _robot_rows(formation: Formation) -> list:
+    """(team, robot_id, x, y, orientation, present) for every slot, as Python scalars"""
+    rows = []
+    for team in (BLUE, YELLOW):
+        for robot_id in range(MAX_ROBOTS_PER_TEAM):
+            x, y, orientation = formation.robots[team, robot_id].tolist()
+            rows.append((team, robot_id, x, y, orientation, bool(formation.present[team, robot_id])))
+    return rows
+
+
+def _pack(new_packet, robots_of, add_robot, rows: list, max_size: int) -> list:
+    """Fill packets with robots, starting a new packet whenever one would exceed max_size"""
+    datagrams = []
+    packet = new_packet(True)
+    for row in rows:
+        add_robot(robots_of(packet), *row)
+        if packet.ByteSize() > max_size:
+            del robots_of(packet)[-1]
+            if not len(robots_of(packet)) and datagrams:
+                raise ValueError(f"A single robot does not fit into {max_size} bytes")
+            datagrams.append(packet.SerializeToString())
+            packet = new_packet(False)
+            add_robot(robots_of(packet), *row)
+    datagrams.append(packet.SerializeToString())
+    return datagrams
+
+
+def encode_replacement(formation: Formation, max_size: int = MAX_PAYLOAD_SIZE) -> list:
+    """Encode a formation as the fewest grSim_Packet replacements that fit max_size each"""
+    def new_packet(first: bool) -> grSim_Packet:
+        packet = grSim_Packet()
+        if first and formation.ball is not None:
+            ball = packet.replacement.ball
+            ball.x, ball.y, ball.vx, ball.vy = np.asarray(formation.ball, dtype=float).tolist()
+        return packet
+
+    def add_robot(robots, team, robot_id, x, y, orientation, present):
+        robots.add(x=x, y=y, dir=math.degrees(orientation), id=robot_id, yellowteam=team == YELLOW, turnon=present)
+
+    return _pack(new_packet, lambda packet: packet.replacement.robots, add_robot, _robot_rows(formation), max_size)
+
+
+def encode_simulator_command(formation: Formation, max_size: int = MAX_PAYLOAD_SIZE) -> list:
+    """Encode a formation as the fewest SimulatorCommand teleports that fit max_size each"""
+    def new_packet(first: bool) -> SimulatorCommand:
+        command = SimulatorCommand()
+        if first and formation.ball is not None:
+            ball = command.control.teleport_ball
+            ball.x, ball.y, ball.vx, ball.vy = np.asarray(formation.ball, dtype=float).tolist()
+            ball.z = ball.vz = 0.0
+        return command
+
+    def add_robot(robots, team, robot_id, x, y, orientation, present):
+        robot = robots.add(x=x, y=y, orientation=orientation, v_x=0.0, v_y=0.0, v_angular=0.0, present=present)
+        robot.id.id = robot_id
+        robot.id.team = Team.YELLOW if team == YELLOW else Team.BLUE
+
+    return _pack(new_packet, lambda command: command.control.teleport_robot, add_robot, _robot_rows(formation), max_size)
+
+
+ENCODERS = {GRSIM: encode_replacement, SIMULATOR: encode_simulator_command}
+
+
+class Teleporter:
+    """Send formations to grSim or a simulation-protocol simulator, caching named formations"""
+
+    def __init__(self, address: tuple = GRSIM_ADDRESS, protocol: str = GRSIM, max_size: int = MAX_PAYLOAD_SIZE):
+        self.address = address
+        self.encode = ENCODERS[protocol]
+        self.max_size = max_size
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._cache = {}
+
+    def define(self, name: str, formation: Formation) -> list:
+        """Encode a formation once and keep its datagrams under name"""
+        datagrams = self.encode(formation, self.max_size)
+        self._cache[name] = datagrams
+        return datagrams
+
+    def datagrams(self, name: str) -> list:
+        return self._cache[name]
+
+    def reset(self, name: str):
+        """Send a cached formation"""
+        for data in self._cache[name]:
+            self.sock.sendto(data, self.address)
+
+    def teleport(self, formation: Formation):
+        """Encode and send a formation without caching it"""
+        for data in self.encode(formation, self.max_size):
+            self.sock.sendto(data, self.address)
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def kickoff_formation() -> Formation:
+    """Six robots per team on their own half and the ball on the centre mark"""
+    formation = Formation()
+    for robot_id in range(6):
+        y = (robot_id - 2.5) * 0.8
+        formation.place(BLUE, robot_id, -1.0 - 1.5 * (robot_id % 2), y, 0.0)
+        formation.place(YELLOW, robot_id, 1.0 + 1.5 * (robot_id % 2), y, math.pi)
+    return formation
+
+
+def main():
+    from sim_stub import StubSimulator
+
+    formation = kickoff_formation()
+    formation.ball[:] = (0.0, 0.0, 0.0, 0.0)
+
+    # Check that both encodings reproduce the formation in the stub simulator
+    for protocol, apply in ((GRSIM, "apply_grsim_packet"), (SIMULATOR, "apply_simulator_command")):
+        datagrams = ENCODERS[protocol](formation)
+        simulator = StubSimulator()
+        for data in datagrams:
+            message = grSim_Packet() if protocol == GRSIM else SimulatorCommand()
+            message.ParseFromString(data)
+            getattr(simulator, apply)(message)
+        ok = (np.array_equal(simulator.present, formation.present)
+              and np.allclose(simulator.robot_pos[..., :2], 1000.0 * formation.robots[..., :2], atol=1e-3)
+              and np.allclose(np.cos(simulator.robot_pos[..., 2]), np.cos(formation.robots[..., 2]), atol=1e-6))
+        print(f"{protocol}: {len(datagrams)} datagram(s), {sum(map(len, datagrams))} bytes, "
+              f"{'OK' if ok else 'MISMATCH'}")
+
+    # Uncached encode + send against cached send, into a local socket
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.bind(("127.0.0.1", 0))
+    with Teleporter(sink.getsockname()) as teleporter:
+        teleporter.define("kickoff", formation)
+        for label, reset in (("encode + send", lambda: teleporter.teleport(formation)),
+                             ("cached send", lambda: teleporter.reset("kickoff"))):
+            count = 2000
+            start = time.perf_counter()
+            for _ in range(count):
+                reset()
+            elapsed = time.perf_counter() - start
+            print(f"{label:>14}: {elapsed / count * 1e6:.1f}us per reset")
+    sink.close()
+
+
+if __name__ == "__main__":
+    main()
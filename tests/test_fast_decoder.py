@@ -0,0 +1,231 @@
+"""
+FastDecoder against packets encoded by hand from the .proto field numbers
+"""
+import math
+import struct
+
+import numpy as np
+import pytest
+
+from fast_decoder import FastDecoder, read_detection_header
+from generated import SSL_WrapperPacket
+
+f32 = np.float32
+
+
+def varint(value: int) -> bytes:
+    out = bytearray()
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def field(number: int, value) -> bytes:
+    """Encode one field: int -> varint, float -> fixed32, ("d", float) -> fixed64, bytes -> length-delimited"""
+    if isinstance(value, bytes):
+        return varint(number << 3 | 2) + varint(len(value)) + value
+    if isinstance(value, tuple):
+        return varint(number << 3 | 1) + struct.pack("<d", value[1])
+    if isinstance(value, float):
+        return varint(number << 3 | 5) + struct.pack("<f", value)
+    return varint(number << 3 | 0) + varint(value)
+
+
+def robot(robot_id=None, x=0.0, y=0.0, orientation=None, confidence=1.0, height=None, extra=b"") -> bytes:
+    data = field(1, confidence)
+    if robot_id is not None:
+        data += field(2, robot_id)
+    data += field(3, x) + field(4, y)
+    if orientation is not None:
+        data += field(5, orientation)
+    data += field(6, 10.0) + field(7, 20.0)
+    if height is not None:
+        data += field(8, height)
+    return data + extra
+
+
+def ball(x=0.0, y=0.0, z=None, confidence=1.0, area=None) -> bytes:
+    data = field(1, confidence)
+    if area is not None:
+        data += field(2, area)
+    data += field(3, x) + field(4, y)
+    if z is not None:
+        data += field(5, z)
+    return data + field(6, 1.0) + field(7, 2.0)
+
+
+def detection(camera_id=0, frame_number=1, t_capture=100.0, t_sent=100.01, balls=(), blue=(), yellow=(),
+              extra=b"") -> bytes:
+    data = field(1, frame_number) + field(2, ("d", t_capture)) + field(3, ("d", t_sent)) + field(4, camera_id)
+    data += b"".join(field(5, b) for b in balls)
+    data += b"".join(field(6, r) for r in yellow)
+    data += b"".join(field(7, r) for r in blue)
+    return data + extra
+
+
+def geometry(field_length=12000) -> bytes:
+    size = field(1, field_length) + field(2, 9000) + field(3, 1800) + field(4, 180) + field(5, 300)
+    return field(1, size)
+
+
+def wrapper(detection_frame=None, geometry_data=None) -> bytes:
+    data = b""
+    if detection_frame is not None:
+        data += field(1, detection_frame)
+    if geometry_data is not None:
+        data += field(2, geometry_data)
+    return data
+
+
+def robot_rows(frame_robots):
+    return [(int(r["robot_id"]), float(r["x"]), float(r["y"]), float(r["orientation"]), float(r["confidence"]))
+            for r in frame_robots]
+
+
+def expected_rows(robots):
+    return [(robot_id, float(f32(x)), float(f32(y)), float(f32(o)) if o is not None else math.nan, float(f32(c)))
+            for robot_id, x, y, o, c in robots]
+
+
+def assert_rows(actual, expected):
+    assert len(actual) == len(expected)
+    for a, e in zip(actual, expected):
+        assert a[:3] == e[:3] and a[4] == e[4]
+        assert a[3] == e[3] or (math.isnan(a[3]) and math.isnan(e[3]))
+
+
+def team(count, first_id=0, height=None, orientation=0.5):
+    values = [(first_id + i, 100.0 * i - 1500.0, -50.0 * i, orientation, 0.5 + i / 100) for i in range(count)]
+    return values, [robot(robot_id=i, x=x, y=y, orientation=o, confidence=c, height=height) for i, x, y, o, c in values]
+
+
+def test_encoder_matches_protobuf():
+    blue, blue_data = team(3)
+    packet = SSL_WrapperPacket()
+    packet.ParseFromString(wrapper(detection(camera_id=3, blue=blue_data, balls=[ball(x=5.0, z=1.0)]), geometry()))
+    assert packet.detection.camera_id == 3
+    assert [r.robot_id for r in packet.detection.robots_blue] == [0, 1, 2]
+    assert packet.detection.balls[0].z == 1.0
+    assert packet.geometry.field.field_length == 12000
+
+
+@pytest.mark.parametrize("count", [1, 3, 16, 40])
+@pytest.mark.parametrize("height", [None, 150.0])
+def test_complete_robots(count, height):
+    blue, blue_data = team(count, height=height)
+    yellow, yellow_data = team(count, first_id=1, height=height, orientation=-1.0)
+    frame = FastDecoder().decode(wrapper(detection(blue=blue_data, yellow=yellow_data)))
+    assert frame.has_detection
+    assert_rows(robot_rows(frame.robots_blue), expected_rows(blue))
+    assert_rows(robot_rows(frame.robots_yellow), expected_rows(yellow))
+
+
+def test_header():
+    data = wrapper(detection(camera_id=5, frame_number=123456, t_capture=1.7e9 + 0.25, t_sent=1.7e9 + 0.5))
+    frame = FastDecoder().decode(data)
+    assert (frame.camera_id, frame.frame_number, frame.t_capture, frame.t_sent) == (5, 123456, 1.7e9 + 0.25, 1.7e9 + 0.5)
+    assert read_detection_header(data) == (123456, 1.7e9 + 0.25, 1.7e9 + 0.5, 5)
+    assert read_detection_header(memoryview(data)) == (123456, 1.7e9 + 0.25, 1.7e9 + 0.5, 5)
+
+
+def test_missing_optional_fields():
+    robots = [robot(robot_id=1, x=1.0, y=2.0, orientation=0.3),
+              robot(x=3.0, y=4.0, orientation=0.1),
+              robot(robot_id=0, x=5.0, y=6.0),
+              robot(robot_id=2, x=7.0, y=8.0, orientation=0.0)]
+    balls = [ball(x=1.0, y=2.0, z=3.0, area=80), ball(x=4.0, y=5.0), ball(x=6.0, y=7.0, area=300)]
+    frame = FastDecoder().decode(wrapper(detection(blue=robots * 3, balls=balls)))
+    expected = expected_rows([(1, 1.0, 2.0, 0.3, 1.0), (-1, 3.0, 4.0, 0.1, 1.0),
+                              (0, 5.0, 6.0, None, 1.0), (2, 7.0, 8.0, 0.0, 1.0)])
+    assert_rows(robot_rows(frame.robots_blue), expected * 3)
+    assert frame.balls["x"].tolist() == [1.0, 4.0, 6.0]
+    assert frame.balls["y"].tolist() == [2.0, 5.0, 7.0]
+    assert frame.balls["z"][0] == 3.0 and np.isnan(frame.balls["z"][1:]).all()
+
+
+def test_unknown_and_reordered_fields():
+    unknown = field(15, 7) + field(14, b"future") + field(13, 2.5) + field(12, ("d", 1.0))
+    reordered = field(3, 11.0) + field(2, 4) + field(1, 0.75) + field(4, 12.0) + field(5, 1.5)
+    robots = [robot(robot_id=1, x=1.0, extra=unknown), robot(robot_id=2, x=2.0), reordered]
+    blue, blue_data = team(8)
+    frame = FastDecoder().decode(wrapper(detection(blue=blue_data, yellow=robots, extra=unknown)) + field(9, b"xyz"))
+    assert_rows(robot_rows(frame.robots_yellow),
+                expected_rows([(1, 1.0, 0.0, None, 1.0), (2, 2.0, 0.0, None, 1.0), (4, 11.0, 12.0, 1.5, 0.75)]))
+    assert_rows(robot_rows(frame.robots_blue), expected_rows(blue))
+
+
+def test_multi_byte_robot_id_in_a_run():
+    blue, blue_data = team(10)
+    blue[5] = (300,) + blue[5][1:]
+    blue_data[5] = robot(robot_id=300, x=blue[5][1], y=blue[5][2], orientation=blue[5][3], confidence=blue[5][4])
+    blue[6] = (127,) + blue[6][1:]
+    blue_data[6] = robot(robot_id=127, x=blue[6][1], y=blue[6][2], orientation=blue[6][3], confidence=blue[6][4])
+    frame = FastDecoder().decode(wrapper(detection(blue=blue_data)))
+    assert_rows(robot_rows(frame.robots_blue), expected_rows(blue))
+
+
+def test_geometry_only_packet_resets_detection():
+    decoder = FastDecoder()
+    blue, blue_data = team(5)
+    frame = decoder.decode(wrapper(detection(camera_id=2, blue=blue_data, balls=[ball(x=1.0)])))
+    assert frame.has_detection and len(frame.robots_blue) == 5 and frame.geometry is None
+
+    frame = decoder.decode(wrapper(geometry_data=geometry()))
+    assert not frame.has_detection
+    assert (frame.camera_id, frame.frame_number, frame.t_capture, frame.t_sent) == (0, 0, 0.0, 0.0)
+    assert len(frame.robots_blue) == len(frame.robots_yellow) == len(frame.balls) == 0
+    assert frame.geometry.field.field_length == 12000
+    assert decoder.geometry_cache.field.field_length == 12000
+
+
+def test_geometry_rebuilt_only_on_change():
+    decoder = FastDecoder()
+    for field_length in (12000, 12000, 9000, 9000):
+        frame = decoder.decode(wrapper(detection(), geometry(field_length)))
+        assert frame.geometry.field.field_length == field_length
+    assert decoder.geometry_cache.build_count == 2
+    assert decoder.decode(wrapper(detection())).geometry is None
+
+
+def test_multi_camera_packets():
+    decoder = FastDecoder()
+    cameras = []
+    for camera_id in range(8):
+        blue, blue_data = team(camera_id, first_id=camera_id)
+        yellow, yellow_data = team(8 - camera_id, height=150.0)
+        balls = [ball(x=float(camera_id), z=None if camera_id % 2 else 20.0, area=camera_id)]
+        data = wrapper(detection(camera_id=camera_id, frame_number=10, blue=blue_data, yellow=yellow_data,
+                                 balls=balls * (camera_id % 3)))
+        cameras.append((camera_id, blue, yellow, data))
+    for _ in range(2):
+        for camera_id, blue, yellow, data in cameras:
+            frame = decoder.decode(memoryview(data))
+            assert frame.camera_id == camera_id
+            assert_rows(robot_rows(frame.robots_blue), expected_rows(blue))
+            assert_rows(robot_rows(frame.robots_yellow), expected_rows(yellow))
+            assert frame.balls["x"].tolist() == [float(camera_id)] * (camera_id % 3)
+            assert np.isnan(frame.balls["z"]).all() if camera_id % 2 else (frame.balls["z"] == 20.0).all()
+
+
+def test_empty_and_truncated_packets():
+    decoder = FastDecoder()
+    frame = decoder.decode(b"")
+    assert not frame.has_detection and frame.geometry is None and len(frame.robots_blue) == 0
+
+    blue, blue_data = team(8)
+    data = wrapper(detection(blue=blue_data))
+    for end in (1, 5, len(data) // 2, len(data) - 1):
+        with pytest.raises(ValueError):
+            decoder.decode(data[:end])
+
+
+def test_same_length_different_layout_in_a_run():
+    # Without orientation but with height, a robot has the length of a complete robot without height
+    blue, blue_data = team(10)
+    blue[4] = blue[4][:3] + (None,) + blue[4][4:]
+    blue_data[4] = robot(robot_id=blue[4][0], x=blue[4][1], y=blue[4][2], confidence=blue[4][4], height=150.0)
+    assert len(blue_data[4]) == len(blue_data[3])
+    frame = FastDecoder().decode(wrapper(detection(blue=blue_data)))
+    assert_rows(robot_rows(frame.robots_blue), expected_rows(blue))
@@ -0,0 +1,55 @@
+import numpy as np
+
+from generated import SSL_DetectionFrame
+from vision_fusion import BLUE, X, FrameFuser
+
+PERIOD = 1 / 60
+
+
+def frame(camera_id, tick, robots=(), ball=None) -> SSL_DetectionFrame:
+    detection = SSL_DetectionFrame(frame_number=tick, t_capture=tick * PERIOD, t_sent=tick * PERIOD + 0.001,
+                                   camera_id=camera_id)
+    for robot_id in robots:
+        detection.robots_blue.add(confidence=0.9, robot_id=robot_id, x=100.0 * robot_id, y=0.0, orientation=0.0,
+                                  pixel_x=0, pixel_y=0)
+    if ball is not None:
+        detection.balls.add(confidence=0.8, x=ball, y=0.0, pixel_x=0, pixel_y=0)
+    return detection
+
+
+def run_two_cameras(fuser, ticks):
+    """Both cameras report every tick; returns the snapshots of the last tick"""
+    for tick in range(ticks):
+        first = fuser.add_frame(frame(0, tick, robots=[1]))
+        second = fuser.add_frame(frame(1, tick, robots=[2]))
+    return first, second
+
+
+def test_complete_tick_is_emitted_at_once():
+    first, second = run_two_cameras(FrameFuser(), 3)
+    assert first is None
+    assert second.camera_ids == (0, 1) and second.frame_number == 2
+    assert second.visible[BLUE].nonzero()[0].tolist() == [1, 2]
+
+
+def test_expired_camera_keeps_the_held_tick():
+    fuser = FrameFuser(camera_timeout=0.1)
+    run_two_cameras(fuser, 3)
+
+    # Camera 1 stops after tick 2. Camera 0 alone is held back one tick until camera 1
+    # expires at tick 9 (0.1s later); robot 5 and the ball are only seen on even ticks
+    emitted = []
+    for tick in range(3, 10):
+        even = tick % 2 == 0
+        snapshot = fuser.add_frame(frame(0, tick, robots=[1, 5] if even else [1], ball=500.0 if even else None))
+        emitted.append(snapshot)
+    assert None not in emitted[1:]
+    assert list(fuser.known_cameras) == [0]
+
+    # Tick 9 is emitted together with the held-back tick 8, whose robot 5 and ball survive
+    merged = emitted[-1]
+    assert merged.frame_number == 9 and merged.t_capture == 9 * PERIOD
+    assert merged.visible[BLUE].nonzero()[0].tolist() == [1, 5]
+    assert merged.robots[BLUE, 5, X] == 500.0
+    assert merged.balls[:, 0].tolist() == [500.0]
+    assert [s.frame_number for s in emitted[1:]] == [3, 4, 5, 6, 7, 9]
@@ -0,0 +1,24 @@
+import pytest
+
+from wire import FIXED32, FIXED64, LENGTH_DELIMITED, VARINT, encode_varint, read_varint, skip_field
+
+
+@pytest.mark.parametrize("value", [0, 1, 127, 128, 300, 16383, 16384, 2 ** 32 - 1, 2 ** 64 - 1])
+def test_varint_round_trip(value):
+    data = b"\xff" + encode_varint(value) + b"\x01"
+    assert read_varint(data, 1) == (value, len(data) - 1)
+
+
+def test_known_encodings():
+    assert encode_varint(0) == b"\x00"
+    assert encode_varint(150) == b"\x96\x01"
+
+
+def test_skip_field():
+    data = encode_varint(300) + bytes(8) + encode_varint(3) + b"abc" + bytes(4)
+    pos = skip_field(data, 0, VARINT)
+    pos = skip_field(data, pos, FIXED64)
+    pos = skip_field(data, pos, LENGTH_DELIMITED)
+    assert skip_field(data, pos, FIXED32) == len(data)
+    with pytest.raises(ValueError):
+        skip_field(data, 0, 3)
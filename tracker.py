@@ -0,0 +1,252 @@
+"""
+Script to track robots and the ball with a batched Kalman filter
+Every track uses a constant-velocity model per axis (x, y, orientation), and
+the state and covariance of all 33 tracks are kept in NumPy arrays so that
+predict and update run as a handful of array operations per frame
+"""
+import math
+
+import numpy as np
+
+from generated import SSL_WrapperPacket
+from vision_fusion import BLUE, YELLOW, MAX_ROBOTS_PER_TEAM, X, Y, ORIENTATION, CONFIDENCE
+
+# Track layout: blue robots 0-15, yellow robots 16-31, then the ball
+BALL_TRACK = 2 * MAX_ROBOTS_PER_TEAM
+NUM_TRACKS = BALL_TRACK + 1
+
+# Axes of every track (the ball never updates ORIENTATION)
+AXIS_X, AXIS_Y, AXIS_THETA = range(3)
+NUM_AXES = 3
+
+
+def track_index(team: int, robot_id: int) -> int:
+    """Track index of a robot"""
+    return team * MAX_ROBOTS_PER_TEAM + robot_id
+
+
+def wrap_angle(angle):
+    """Wrap angles to [-pi, pi)"""
+    return (angle + np.pi) % (2 * np.pi) - np.pi
+
+
+class BatchTracker:
+    """Constant-velocity Kalman filter over every robot and the ball at once
+
+    Positions are in mm, orientations in rad, velocities per second.
+    """
+
+    def __init__(
+        self,
+        robot_accel_noise: float = 4000.0,   # Robot acceleration std [mm/s^2]
+        robot_angular_noise: float = 40.0,   # Robot angular acceleration std [rad/s^2]
+        ball_accel_noise: float = 10000.0,   # Ball acceleration std [mm/s^2]
+        position_noise: float = 3.0,         # Measurement std [mm] at confidence 1
+        orientation_noise: float = 0.03,     # Measurement std [rad] at confidence 1
+        initial_velocity_std: float = 2000.0,
+        timeout: float = 0.5,                # Tracks without measurements for this long [s] are dropped
+    ):
+        self.timeout = timeout
+        self.initial_velocity_std = initial_velocity_std
+
+        # Process noise spectral density per track and axis
+        self.q = np.empty((NUM_TRACKS, NUM_AXES))
+        self.q[:, AXIS_X:AXIS_Y + 1] = robot_accel_noise ** 2
+        self.q[:, AXIS_THETA] = robot_angular_noise ** 2
+        self.q[BALL_TRACK, AXIS_X:AXIS_Y + 1] = ball_accel_noise ** 2
+        self.r = np.array([position_noise ** 2, position_noise ** 2, orientation_noise ** 2])
+
+        self.pos = np.zeros((NUM_TRACKS, NUM_AXES))
+        self.vel = np.zeros((NUM_TRACKS, NUM_AXES))
+        # Covariance entries of each 2x2 [position, velocity] block
+        self.p_pp = np.zeros((NUM_TRACKS, NUM_AXES))
+        self.p_pv = np.zeros((NUM_TRACKS, NUM_AXES))
+        self.p_vv = np.zeros((NUM_TRACKS, NUM_AXES))
+
+        self.valid = np.zeros(NUM_TRACKS, dtype=bool)
+        self.t = 0.0
+        self.last_seen = np.full(NUM_TRACKS, -np.inf)
+
+        # Timing of the latest frame, used for latency compensation
+        self.t_capture = 0.0
+        self.t_sent = 0.0
+
+        # Scratch buffers for measurements
+        self._z = np.zeros((NUM_TRACKS, NUM_AXES))
+        self._mask = np.zeros((NUM_TRACKS, NUM_AXES), dtype=bool)
+        self._confidence = np.ones(NUM_TRACKS)
+
+    def predict(self, t: float):
+        """Advance every track to time t"""
+        dt = t - self.t
+        if dt > 0:
+            self.pos, self.vel, self.p_pp, self.p_pv, self.p_vv = self._propagate(dt)
+            self.pos[:, AXIS_THETA] = wrap_angle(self.pos[:, AXIS_THETA])
+            self.t = t
+        self.valid &= (t - self.last_seen) <= self.timeout
+
+    def _propagate(self, dt: float):
+        q = self.q
+        pos = self.pos + dt * self.vel
+        p_pp = self.p_pp + dt * (2 * self.p_pv + dt * self.p_vv) + q * dt ** 3 / 3
+        p_pv = self.p_pv + dt * self.p_vv + q * dt ** 2 / 2
+        p_vv = self.p_vv + q * dt
+        return pos, self.vel.copy(), p_pp, p_pv, p_vv
+
+    def update(self, t: float, z: np.ndarray, mask: np.ndarray, confidence: np.ndarray = None):
+        """Predict to time t, then fuse measurements
+
+        z and mask are (NUM_TRACKS, 3); confidence (NUM_TRACKS,) scales the measurement noise.
+        """
+        self.predict(t)
+
+        r = np.broadcast_to(self.r, z.shape)
+        if confidence is not None:
+            r = r / np.clip(confidence, 0.05, 1.0)[:, None]
+
+        # Start new tracks at the measurement with zero velocity
+        new = mask & ~self.valid[:, None]
+        if new.any():
+            self.pos[new] = z[new]
+            self.vel[new] = 0.0
+            self.p_pp[new] = r[new]
+            self.p_pv[new] = 0.0
+            self.p_vv[new] = self.initial_velocity_std ** 2
+
+        update = mask & ~new
+        innovation = z - self.pos
+        innovation[:, AXIS_THETA] = wrap_angle(innovation[:, AXIS_THETA])
+        innovation[~update] = 0.0
+
+        s = self.p_pp + r
+        k_pos = np.where(update, self.p_pp / s, 0.0)
+        k_vel = np.where(update, self.p_pv / s, 0.0)
+
+        self.pos += k_pos * innovation
+        self.vel += k_vel * innovation
+        self.p_vv -= k_vel * self.p_pv
+        self.p_pv *= 1.0 - k_pos
+        self.p_pp *= 1.0 - k_pos
+        self.pos[:, AXIS_THETA] = wrap_angle(self.pos[:, AXIS_THETA])
+
+        seen = mask[:, AXIS_X]
+        self.valid |= seen
+        self.last_seen[seen] = t
+
+    def update_snapshot(self, snapshot):
+        """Update from a vision_fusion.WorldSnapshot"""
+        z, mask, confidence = self._clear_measurements()
+        robots = snapshot.robots.reshape(-1, 4)
+        visible = snapshot.visible.reshape(-1)
+        z[:BALL_TRACK, AXIS_X] = robots[:, X]
+        z[:BALL_TRACK, AXIS_Y] = robots[:, Y]
+        z[:BALL_TRACK, AXIS_THETA] = robots[:, ORIENTATION]
+        mask[:BALL_TRACK, AXIS_X] = visible
+        mask[:BALL_TRACK, AXIS_Y] = visible
+        mask[:BALL_TRACK, AXIS_THETA] = visible & ~np.isnan(robots[:, ORIENTATION])
+        confidence[:BALL_TRACK] = np.where(visible, robots[:, CONFIDENCE], 1.0)
+
+        if len(snapshot.balls):
+            ball = snapshot.balls[0]  # Highest confidence
+            z[BALL_TRACK, :2] = ball[:2]
+            mask[BALL_TRACK, :2] = True
+            confidence[BALL_TRACK] = ball[3]
+
+        self._set_timing(snapshot.t_capture, snapshot.t_sent)
+        self.update(snapshot.t_capture, np.nan_to_num(z), mask, confidence)
+
+    def update_frame(self, detection):
+        """Update from a single camera SSL_DetectionFrame"""
+        z, mask, confidence = self._clear_measurements()
+        for team, robots in ((BLUE, detection.robots_blue), (YELLOW, detection.robots_yellow)):
+            for robot in robots:
+                if not robot.HasField("robot_id") or robot.robot_id >= MAX_ROBOTS_PER_TEAM:
+                    continue
+                i = track_index(team, robot.robot_id)
+                z[i] = (robot.x, robot.y, robot.orientation)
+                mask[i] = (True, True, robot.HasField("orientation"))
+                confidence[i] = robot.confidence
+
+        if detection.balls:
+            ball = max(detection.balls, key=lambda b: b.confidence)
+            z[BALL_TRACK, :2] = (ball.x, ball.y)
+            mask[BALL_TRACK, :2] = True
+            confidence[BALL_TRACK] = ball.confidence
+
+        self._set_timing(detection.t_capture, detection.t_sent)
+        self.update(detection.t_capture, z, mask, confidence)
+
+    def _clear_measurements(self):
+        self._z.fill(0.0)
+        self._mask.fill(False)
+        self._confidence.fill(1.0)
+        return self._z, self._mask, self._confidence
+
+    def _set_timing(self, t_capture: float, t_sent: float):
+        self.t_capture = t_capture
+        self.t_sent = t_sent
+
+    def state_at(self, t: float):
+        """Return (pos, vel) of every track extrapolated to time t, without changing the filter"""
+        pos = self.pos + max(t - self.t, 0.0) * self.vel
+        pos[:, AXIS_THETA] = wrap_angle(pos[:, AXIS_THETA])
+        return pos, self.vel.copy()
+
+    def compensated_state(self, extra_latency: float = 0.0):
+        """State predicted past the vision pipeline delay (t_sent - t_capture) plus extra_latency
+
+        extra_latency covers network, decoding and actuation time on our side.
+        """
+        latency = max(self.t_sent - self.t_capture, 0.0) + extra_latency
+        return self.state_at(self.t + latency)
+
+    def robot(self, team: int, robot_id: int):
+        """Return (pos, vel) of one robot, or None if not tracked"""
+        i = track_index(team, robot_id)
+        if not self.valid[i]:
+            return None
+        return self.pos[i].copy(), self.vel[i].copy()
+
+    @property
+    def ball(self):
+        """Return (pos, vel) of the ball (x, y only), or None if not tracked"""
+        if not self.valid[BALL_TRACK]:
+            return None
+        return self.pos[BALL_TRACK, :2].copy(), self.vel[BALL_TRACK, :2].copy()
+
+
+def main():
+    from receive_vision import VisionReceiver, MULTICAST_GROUP, PORT
+    from vision_fusion import FrameFuser
+
+    print("Tracking SSL-Vision robots and ball...")
+    print(f"Multicast address: {MULTICAST_GROUP}:{PORT}")
+    print("Press Ctrl+C to exit")
+
+    fuser = FrameFuser()
+    tracker = BatchTracker()
+    packet = SSL_WrapperPacket()
+    try:
+        with VisionReceiver(MULTICAST_GROUP, PORT) as receiver:
+            while True:
+                for data in receiver.poll(timeout=5.0):
+                    packet.ParseFromString(data)
+                    if not packet.HasField("detection"):
+                        continue
+                    snapshot = fuser.add_frame(packet.detection)
+                    if snapshot is None:
+                        continue
+                    tracker.update_snapshot(snapshot)
+
+                    ball = tracker.ball
+                    if ball is not None:
+                        (x, y), (vx, vy) = ball
+                        speed = math.hypot(vx, vy)
+                        print(f"Ball: x={x:.1f}mm, y={y:.1f}mm, speed={speed:.0f}mm/s, "
+                              f"robots tracked: {int(tracker.valid[:BALL_TRACK].sum())}")
+    except KeyboardInterrupt:
+        print("\nExiting...")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+"""
+Script to drop implausible SSL-Vision detections before they reach fusion
+Every frame is gated with array checks over all of its robots and balls:
+confidence below a threshold, positions outside the field plus its boundary,
+jumps farther than the robot or ball could have moved since it was last
+accepted, and several robots of one team sharing an ID. The jump gate grows
+with the time since the last accepted detection, so a robot that really was
+moved (or a ball that left the view) is picked up again after a short gap.
+Rejections are counted per camera
+
+Usage:
+    python vision_filter.py [--check]
+"""
+import argparse
+import random
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from field_geometry import FieldGeometry
+from vision_fusion import BLUE, YELLOW, MAX_ROBOTS_PER_TEAM
+
+
+@dataclass
+class FilterStats:
+    """Counters of one camera kept by DetectionFilter"""
+    frames: int = 0           # Detection frames checked
+    stale_frames: int = 0     # Frames dropped as repeated or out of order
+    robots: int = 0           # Robot detections checked
+    balls: int = 0            # Ball detections checked
+    low_confidence: int = 0   # Rejected for confidence below the threshold
+    out_of_field: int = 0     # Rejected for lying outside the field and boundary
+    jumps: int = 0            # Rejected for moving faster than physically possible
+    duplicates: int = 0       # Robots rejected for an ID already seen with more confidence
+
+    @property
+    def rejected(self) -> int:
+        return self.low_confidence + self.out_of_field + self.jumps + self.duplicates
+
+
+class DetectionFilter:
+    """Per-frame gate for robots and balls, with the state of the last accepted detections
+
+    Robot state is kept per team and ID, ball state as the last accepted ball
+    positions; both are shared by all cameras since t_capture is one clock.
+    """
+
+    def __init__(
+        self,
+        min_robot_confidence: float = 0.3,
+        min_ball_confidence: float = 0.1,
+        max_robot_speed: float = 6000.0,   # [mm/s]
+        max_ball_speed: float = 10000.0,   # [mm/s]
+        jump_margin: float = 150.0,        # Allowed jump on top of the speed limit [mm]
+        bounds_margin: float = 100.0,      # Allowed distance beyond the boundary [mm]
+        track_timeout: float = 0.5,        # Unseen this long [s], any position is accepted again
+        max_tracked_balls: int = 8,
+        field: FieldGeometry = None,
+    ):
+        self.min_robot_confidence = min_robot_confidence
+        self.min_ball_confidence = min_ball_confidence
+        self.max_robot_speed = max_robot_speed
+        self.max_ball_speed = max_ball_speed
+        self.jump_margin = jump_margin
+        self.bounds_margin = bounds_margin
+        self.track_timeout = track_timeout
+        self.max_tracked_balls = max_tracked_balls
+        self.field = field or FieldGeometry()
+        self.stats = {}  # camera_id -> FilterStats
+
+        shape = (2, MAX_ROBOTS_PER_TEAM)
+        self._robot_pos = np.zeros(shape + (2,))
+        self._robot_t = np.full(shape, -np.inf)
+        self._balls = np.zeros((0, 3))  # x, y, t_capture of the last accepted balls
+        self._last_frame = {}           # camera_id -> (frame_number, t_capture)
+
+    def set_field(self, field: FieldGeometry):
+        self.field = field
+
+    def camera_stats(self, camera_id: int) -> FilterStats:
+        stats = self.stats.get(camera_id)
+        if stats is None:
+            stats = self.stats[camera_id] = FilterStats()
+        return stats
+
+    def begin_frame(self, camera_id: int, frame_number: int, t_capture: float) -> bool:
+        """Count the frame; False if it repeats or precedes the last frame of its camera
+
+        A lower frame_number with a newer t_capture is taken as a vision restart.
+        """
+        stats = self.camera_stats(camera_id)
+        stats.frames += 1
+        last = self._last_frame.get(camera_id)
+        if last is not None and frame_number <= last[0] and t_capture <= last[1]:
+            stats.stale_frames += 1
+            return False
+        self._last_frame[camera_id] = (frame_number, t_capture)
+        return True
+
+    def robot_mask(self, camera_id: int, teams, ids, x, y, confidence, t_capture: float) -> np.ndarray:
+        """Bool per robot detection: True to keep it
+
+        teams holds BLUE / YELLOW per detection (or one team for all), so both
+        teams of a frame are checked in one pass.
+        """
+        ids = np.asarray(ids, dtype=np.intp)
+        teams = np.broadcast_to(np.asarray(teams, dtype=np.intp), ids.shape)
+        confidence = np.asarray(confidence)
+        points = _points(x, y)
+        stats = self.camera_stats(camera_id)
+        stats.robots += len(ids)
+
+        keep = confidence >= self.min_robot_confidence
+        remaining = np.count_nonzero(keep)
+        stats.low_confidence += len(ids) - remaining
+        keep &= self._inside(points)
+        remaining, rejected = np.count_nonzero(keep), remaining
+        stats.out_of_field += rejected - remaining
+
+        # Distance from the last accepted position against what the robot could have covered
+        known = (ids >= 0) & (ids < MAX_ROBOTS_PER_TEAM)
+        slots = np.where(known, ids, 0)
+        dt = t_capture - self._robot_t[teams, slots]
+        delta = points - self._robot_pos[teams, slots]
+        limit = self.max_robot_speed * np.maximum(dt, 0.0) + self.jump_margin
+        keep &= ~(known & (dt <= self.track_timeout) & (np.einsum("ij,ij->i", delta, delta) > limit * limit))
+        remaining, rejected = np.count_nonzero(keep), remaining
+        stats.jumps += rejected - remaining
+
+        # Of the remaining robots sharing a team and ID, keep the most confident one
+        candidates = np.flatnonzero(keep & known)
+        if len(candidates) > 1:
+            keys = teams[candidates] * MAX_ROBOTS_PER_TEAM + ids[candidates]
+            order = np.lexsort((-confidence[candidates], keys))
+            repeated = np.zeros(len(order), dtype=bool)
+            repeated[1:] = keys[order[1:]] == keys[order[:-1]]
+            if repeated.any():
+                keep[candidates[order[repeated]]] = False
+                stats.duplicates += np.count_nonzero(repeated)
+
+        accepted = keep & known
+        self._robot_pos[teams[accepted], ids[accepted]] = points[accepted]
+        self._robot_t[teams[accepted], ids[accepted]] = t_capture
+        return keep
+
+    def ball_mask(self, camera_id: int, x, y, confidence, t_capture: float) -> np.ndarray:
+        """Bool per ball detection: True to keep it"""
+        points = _points(x, y)
+        stats = self.camera_stats(camera_id)
+        stats.balls += len(points)
+
+        keep = np.asarray(confidence) >= self.min_ball_confidence
+        remaining = np.count_nonzero(keep)
+        stats.low_confidence += len(points) - remaining
+        keep &= self._inside(points)
+        stats.out_of_field += remaining - np.count_nonzero(keep)
+
+        # While any ball is tracked, new balls must be reachable from one of them
+        tracked = self._balls[t_capture - self._balls[:, 2] <= self.track_timeout]
+        if len(tracked):
+            delta = points[:, None, :] - tracked[None, :, :2]
+            limit = self.max_ball_speed * np.maximum(t_capture - tracked[:, 2], 0.0) + self.jump_margin
+            within = np.einsum("ijk,ijk->ij", delta, delta) <= limit * limit   # (balls, tracked)
+            reachable = within.any(axis=1)
+            stats.jumps += np.count_nonzero(keep & ~reachable)
+            keep &= reachable
+            # Accepted balls replace the tracked balls within reach of them
+            tracked = tracked[~within[keep].any(axis=0)]
+
+        if keep.any():
+            fresh = np.empty((np.count_nonzero(keep), 3))
+            fresh[:, :2] = points[keep]
+            fresh[:, 2] = t_capture
+            self._balls = np.concatenate((fresh, tracked))[:self.max_tracked_balls]
+        else:
+            self._balls = tracked
+        return keep
+
+    def filter_decoded(self, frame):
+        """Drop rejected rows from a fast_decoder.DecodedFrame in place; returns None for a stale frame"""
+        if not frame.has_detection:
+            return frame
+        if not self.begin_frame(frame.camera_id, frame.frame_number, frame.t_capture):
+            return None
+        camera_id, t = frame.camera_id, frame.t_capture
+        blue, yellow = frame.robots_blue, frame.robots_yellow
+        if len(blue) or len(yellow):
+            robots = np.concatenate((blue, yellow))
+            teams = np.repeat((BLUE, YELLOW), (len(blue), len(yellow)))
+            keep = self.robot_mask(camera_id, teams, robots["robot_id"], robots["x"], robots["y"],
+                                   robots["confidence"], t)
+            if not keep.all():
+                frame.robots_blue = blue[keep[:len(blue)]]
+                frame.robots_yellow = yellow[keep[len(blue):]]
+        balls = frame.balls
+        if len(balls):
+            keep = self.ball_mask(camera_id, balls["x"], balls["y"], balls["confidence"], t)
+            if not keep.all():
+                frame.balls = balls[keep]
+        return frame
+
+    def filter_detection(self, detection) -> bool:
+        """Delete rejected robots and balls from an SSL_DetectionFrame in place
+
+        Returns False for a stale frame, which is left untouched.
+        """
+        if not self.begin_frame(detection.camera_id, detection.frame_number, detection.t_capture):
+            return False
+        camera_id, t = detection.camera_id, detection.t_capture
+        blue, yellow = detection.robots_blue, detection.robots_yellow
+        if len(blue) or len(yellow):
+            rows = np.array([(team, r.robot_id if r.HasField("robot_id") else -1, r.x, r.y, r.confidence)
+                             for team, robots in ((BLUE, blue), (YELLOW, yellow)) for r in robots])
+            keep = self.robot_mask(camera_id, rows[:, 0], rows[:, 1], rows[:, 2], rows[:, 3], rows[:, 4], t)
+            count = len(blue)
+            _delete_rejected(blue, keep[:count])
+            _delete_rejected(yellow, keep[count:])
+        if len(detection.balls):
+            rows = np.array([(b.x, b.y, b.confidence) for b in detection.balls])
+            keep = self.ball_mask(camera_id, rows[:, 0], rows[:, 1], rows[:, 2], t)
+            _delete_rejected(detection.balls, keep)
+        return True
+
+    def report(self) -> str:
+        lines = [f"{'camera':>6}  {'frames':>7}  {'stale':>5}  {'robots':>7}  {'balls':>7}  "
+                 f"{'conf':>6}  {'field':>6}  {'jump':>6}  {'dup':>6}"]
+        for camera_id in sorted(self.stats):
+            s = self.stats[camera_id]
+            lines.append(f"{camera_id:>6}  {s.frames:>7}  {s.stale_frames:>5}  {s.robots:>7}  {s.balls:>7}  "
+                         f"{s.low_confidence:>6}  {s.out_of_field:>6}  {s.jumps:>6}  {s.duplicates:>6}")
+        return "\n".join(lines)
+
+    def _inside(self, points: np.ndarray) -> np.ndarray:
+        return self.field.in_field(points, margin=self.field.boundary_width + self.bounds_margin)
+
+
+def _points(x, y) -> np.ndarray:
+    points = np.empty((len(x), 2))
+    points[:, 0] = x
+    points[:, 1] = y
+    return points
+
+
+def _delete_rejected(repeated, keep: np.ndarray):
+    for index in np.flatnonzero(~keep)[::-1]:
+        del repeated[int(index)]
+
+
+def _noisy_stream(frames: int, seed: int = 1):
+    """Stub simulator frames from two cameras with injected ghosts; yields (packet bytes, ghosts)"""
+    from generated import SSL_WrapperPacket
+    from sim_stub import StubSimulator
+
+    rng = random.Random(seed)
+    simulator = StubSimulator()
+    simulator.ball_vel[:2] = (2000.0, 500.0)
+    simulator.robot_vel[BLUE, :6] = (1500.0, 0.0, 1.0)
+    packet = SSL_WrapperPacket()
+    for tick in range(frames):
+        simulator.step(1 / 60)
+        for camera_id in (0, 1):
+            detection = simulator.detection_frame(camera_id)
+            ghosts = 0
+            if tick == 0:  # Nothing is tracked yet to tell ghosts apart
+                packet.detection.CopyFrom(detection)
+                yield packet.SerializeToString(), ghosts
+                continue
+            if rng.random() < 0.3:   # Phantom ball far from the real one
+                detection.balls.add(confidence=0.8, x=rng.uniform(-5000, 5000), y=-4000.0, pixel_x=0, pixel_y=0)
+                ghosts += 1
+            if rng.random() < 0.2:   # Second blue robot 0 across the field
+                detection.robots_blue.add(confidence=0.5, robot_id=0, x=4000.0, y=3000.0, orientation=0.0,
+                                          pixel_x=0, pixel_y=0)
+                ghosts += 1
+            if rng.random() < 0.1:   # Low-confidence robot
+                detection.robots_yellow.add(confidence=0.1, robot_id=9, x=0.0, y=0.0, orientation=0.0,
+                                            pixel_x=0, pixel_y=0)
+                ghosts += 1
+            if rng.random() < 0.1:   # Ball outside the field
+                detection.balls.add(confidence=0.9, x=9000.0, y=0.0, pixel_x=0, pixel_y=0)
+                ghosts += 1
+            packet.detection.CopyFrom(detection)
+            yield packet.SerializeToString(), ghosts
+
+
+def run_check(frames: int = 300):
+    from fast_decoder import FastDecoder
+    from generated import SSL_WrapperPacket
+
+    stream = list(_noisy_stream(frames))
+    injected = sum(ghosts for _, ghosts in stream)
+
+    # Decoded arrays and protobuf frames must be filtered the same way
+    decoder = FastDecoder()
+    decoded_filter, detection_filter = DetectionFilter(), DetectionFilter()
+    packet = SSL_WrapperPacket()
+    for data, _ in stream:
+        frame = decoded_filter.filter_decoded(decoder.decode(data))
+        packet.ParseFromString(data)
+        detection_filter.filter_detection(packet.detection)
+        detection = packet.detection
+        assert len(frame.balls) == len(detection.balls) == 1
+        assert len(frame.robots_blue) == len(detection.robots_blue) == 6
+        assert len(frame.robots_yellow) == len(detection.robots_yellow) == 6
+        assert np.allclose(frame.robots_blue["x"], [r.x for r in detection.robots_blue], atol=0.01)
+    rejected = sum(s.rejected for s in decoded_filter.stats.values())
+    assert rejected == injected, (rejected, injected)
+    print(decoded_filter.report())
+    print(f"All {injected} injected ghosts rejected, no real detections lost")
+
+    # A robot moved by hand is accepted again once the jump gate has grown
+    gate = DetectionFilter()
+    keeps = [gate.robot_mask(0, BLUE, [3], [x], [0.0], [0.9], t)[0]
+             for t, x in ((0.0, 0.0), (0.1, 3000.0), (0.2, 3000.0), (0.5, 3000.0), (0.6, 3000.0))]
+    assert keeps == [True, False, False, True, True], keeps
+    print("Moved robot re-acquired after the gate grew")
+
+    # Two detections of one ID in a frame: the more confident one stays
+    keep = DetectionFilter().robot_mask(0, [BLUE, BLUE, YELLOW], [3, 3, 3], [0.0, 500.0, 0.0],
+                                        [0.0, 0.0, 0.0], [0.6, 0.9, 0.5], 0.0)
+    assert keep.tolist() == [False, True, True], keep
+    print("Duplicate IDs resolved by confidence")
+
+    decoder = FastDecoder()
+    timing_filter = DetectionFilter()
+    start = time.perf_counter()
+    for data, _ in stream:
+        decoder.decode(data)
+    decode_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for data, _ in stream:
+        timing_filter.filter_decoded(decoder.decode(data))
+    filter_time = time.perf_counter() - start - decode_time
+    print(f"Filter: {filter_time / len(stream) * 1e6:.1f}us/frame")
+
+
+def main():
+    from fast_decoder import FastDecoder
+    from receive_vision import VisionReceiver, MULTICAST_GROUP, PORT
+
+    parser = argparse.ArgumentParser(description="Filter SSL-Vision frames and print rejection statistics")
+    parser.add_argument("--check", action="store_true", help="Run against injected ghosts instead")
+    args = parser.parse_args()
+    if args.check:
+        run_check()
+        return
+
+    print(f"Filtering SSL-Vision frames from {MULTICAST_GROUP}:{PORT}")
+    print("Press Ctrl+C to exit")
+    decoder = FastDecoder()
+    detection_filter = DetectionFilter()
+    geometry_builds = 0
+    next_report = time.monotonic() + 1.0
+    try:
+        with VisionReceiver(MULTICAST_GROUP, PORT) as receiver:
+            while True:
+                for data in receiver.poll(timeout=1.0):
+                    frame = decoder.decode(data)
+                    if decoder.geometry_cache.build_count != geometry_builds:
+                        geometry_builds = decoder.geometry_cache.build_count
+                        detection_filter.set_field(decoder.geometry_cache.field)
+                    detection_filter.filter_decoded(frame)
+                if time.monotonic() >= next_report:
+                    print(detection_filter.report())
+                    next_report += 1.0
+    except KeyboardInterrupt:
+        print("\nExiting...")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+Script to merge SSL-Vision detection frames from all cameras into one world snapshot
+Frames captured at the same time are grouped by t_capture, and robots and balls
+seen by several cameras in the overlap zones are merged weighted by confidence
+"""
+import math
+from dataclasses import dataclass
+
+import numpy as np
+
+from generated import SSL_WrapperPacket
+
+# Team index used in every robot array
+BLUE = 0
+YELLOW = 1
+
+MAX_ROBOTS_PER_TEAM = 16
+
+# Columns of WorldSnapshot.robots
+X, Y, ORIENTATION, CONFIDENCE = range(4)
+# Columns of WorldSnapshot.balls
+BALL_X, BALL_Y, BALL_Z, BALL_CONFIDENCE = range(4)
+
+
+@dataclass
+class WorldSnapshot:
+    """Fused view of every camera for one capture tick"""
+    t_capture: float
+    t_sent: float
+    frame_number: int
+    camera_ids: tuple
+    robots: np.ndarray   # (2, MAX_ROBOTS_PER_TEAM, 4): x, y, orientation, confidence (NaN if unseen)
+    visible: np.ndarray  # (2, MAX_ROBOTS_PER_TEAM) bool
+    balls: np.ndarray    # (n, 4): x, y, z, confidence, sorted by confidence
+
+
+class FrameFuser:
+    """Group per-camera detection frames by t_capture and merge duplicates
+
+    Robots are accumulated into fixed per-ID slots, so adding a frame costs
+    O(robots in the frame) and emitting a snapshot is a handful of array ops.
+    """
+
+    def __init__(
+        self,
+        capture_window: float = 0.005,       # Frames closer than this [s] belong to one tick
+        ball_merge_distance: float = 200.0,  # Balls closer than this [mm] are the same ball
+        max_balls: int = 64,
+        camera_timeout: float = 0.1,         # Cameras silent this long [s] are no longer waited for
+    ):
+        self.capture_window = capture_window
+        self.ball_merge_distance = ball_merge_distance
+        self.camera_timeout = camera_timeout
+        self.known_cameras = {}  # camera_id -> t_capture of its last frame
+
+        shape = (2, MAX_ROBOTS_PER_TEAM)
+        self._weight = np.zeros(shape)
+        self._sum_x = np.zeros(shape)
+        self._sum_y = np.zeros(shape)
+        self._sum_sin = np.zeros(shape)
+        self._sum_cos = np.zeros(shape)
+        self._best_confidence = np.zeros(shape)
+
+        self._balls = np.zeros((max_balls, 4))
+        self._ball_count = 0
+
+        self._group_cameras = set()
+        self._group_t_capture = None
+        self._group_t_sent = 0.0
+        self._group_frame_number = 0
+
+    def add_frame(self, detection) -> WorldSnapshot:
+        """Add one SSL_DetectionFrame; returns a snapshot when a tick is complete, else None"""
+        snapshot = self._begin_frame(
+            detection.camera_id, detection.t_capture, detection.t_sent, detection.frame_number
+        )
+        for team, robots in ((BLUE, detection.robots_blue), (YELLOW, detection.robots_yellow)):
+            rows = [
+                (r.robot_id, r.confidence, r.x, r.y,
+                 r.orientation if r.HasField("orientation") else math.nan)
+                for r in robots
+                if r.HasField("robot_id") and r.robot_id < MAX_ROBOTS_PER_TEAM
+            ]
+            if rows:
+                self._add_robots(team, *map(np.asarray, zip(*rows)))
+        for ball in detection.balls:
+            self._add_ball(ball.x, ball.y, ball.z, ball.confidence)
+        return self._end_frame(snapshot)
+
+    def add_decoded(self, frame) -> WorldSnapshot:
+        """Add one fast_decoder.DecodedFrame; returns a snapshot when a tick is complete, else None"""
+        snapshot = self._begin_frame(frame.camera_id, frame.t_capture, frame.t_sent, frame.frame_number)
+        for team, robots in ((BLUE, frame.robots_blue), (YELLOW, frame.robots_yellow)):
+            ids = robots["robot_id"]
+            known = (ids >= 0) & (ids < MAX_ROBOTS_PER_TEAM)
+            if known.any():
+                robots = robots[known]
+                self._add_robots(team, robots["robot_id"], robots["confidence"],
+                                 robots["x"], robots["y"], robots["orientation"])
+        for ball in frame.balls:
+            z = ball["z"]
+            self._add_ball(ball["x"], ball["y"], 0.0 if math.isnan(z) else z, ball["confidence"])
+        return self._end_frame(snapshot)
+
+    def _begin_frame(self, camera_id: int, t_capture: float, t_sent: float, frame_number: int):
+        """Close the pending tick if this frame starts a new one, then join the frame to the tick"""
+        snapshot = None
+        if self._group_t_capture is not None and (
+            camera_id in self._group_cameras
+            or abs(t_capture - self._group_t_capture) > self.capture_window
+        ):
+            snapshot = self.flush()
+
+        if self._group_t_capture is None:
+            self._group_t_capture = t_capture
+        self._group_cameras.add(camera_id)
+        self.known_cameras[camera_id] = t_capture
+        self._group_t_sent = max(self._group_t_sent, t_sent)
+        self._group_frame_number = max(self._group_frame_number, frame_number)
+        return snapshot
+
+    def _end_frame(self, snapshot: WorldSnapshot) -> WorldSnapshot:
+        expired = [camera_id for camera_id, t_capture in self.known_cameras.items()
+                   if self._group_t_capture - t_capture > self.camera_timeout]
+        for camera_id in expired:
+            del self.known_cameras[camera_id]
+        # Every camera that is still sending has reported for this tick. Once a camera
+        # expires, the tick it had been holding back is merged into this one
+        if (snapshot is None or expired) and self._group_cameras >= self.known_cameras.keys():
+            held = snapshot
+            snapshot = self.flush()
+            if held is not None:
+                _fill_from(snapshot, held)
+        return snapshot
+
+    def flush(self) -> WorldSnapshot:
+        """Emit the pending tick (if any) and reset the accumulators"""
+        if self._group_t_capture is None:
+            return None
+
+        visible = self._weight > 0
+        weight = np.where(visible, self._weight, 1.0)
+        robots = np.full((2, MAX_ROBOTS_PER_TEAM, 4), np.nan)
+        robots[..., X] = np.where(visible, self._sum_x / weight, np.nan)
+        robots[..., Y] = np.where(visible, self._sum_y / weight, np.nan)
+        has_orientation = (self._sum_sin != 0) | (self._sum_cos != 0)
+        robots[..., ORIENTATION] = np.where(
+            has_orientation, np.arctan2(self._sum_sin, self._sum_cos), np.nan
+        )
+        robots[..., CONFIDENCE] = np.where(visible, self._best_confidence, np.nan)
+
+        snapshot = WorldSnapshot(
+            t_capture=self._group_t_capture,
+            t_sent=self._group_t_sent,
+            frame_number=self._group_frame_number,
+            camera_ids=tuple(sorted(self._group_cameras)),
+            robots=robots,
+            visible=visible,
+            balls=self._merge_balls(),
+        )
+
+        for array in (self._weight, self._sum_x, self._sum_y,
+                      self._sum_sin, self._sum_cos, self._best_confidence):
+            array.fill(0.0)
+        self._ball_count = 0
+        self._group_cameras = set()
+        self._group_t_capture = None
+        self._group_t_sent = 0.0
+        self._group_frame_number = 0
+        return snapshot
+
+    def _add_robots(self, team: int, ids, confidence, x, y, orientation):
+        """Accumulate confidence-weighted sums into the per-ID slots of a team
+
+        orientation is NaN for robots without one.
+        """
+        confidence = np.asarray(confidence, dtype=float)
+
+        def accumulate(weights):
+            return np.bincount(ids, weights=weights, minlength=MAX_ROBOTS_PER_TEAM)
+
+        self._weight[team] += accumulate(confidence)
+        self._sum_x[team] += accumulate(confidence * x)
+        self._sum_y[team] += accumulate(confidence * y)
+        has_orientation = ~np.isnan(orientation)
+        orientation = np.where(has_orientation, orientation, 0.0)
+        oriented = confidence * has_orientation
+        self._sum_sin[team] += accumulate(oriented * np.sin(orientation))
+        self._sum_cos[team] += accumulate(oriented * np.cos(orientation))
+        np.maximum.at(self._best_confidence[team], ids, confidence)
+
+    def _add_ball(self, x: float, y: float, z: float, confidence: float):
+        if self._ball_count == len(self._balls):
+            return
+        self._balls[self._ball_count] = (x, y, z, confidence)
+        self._ball_count += 1
+
+    def _merge_balls(self) -> np.ndarray:
+        """Merge ball detections closer than ball_merge_distance, strongest first"""
+        balls = self._balls[:self._ball_count]
+        if len(balls) <= 1:
+            return balls.copy()
+
+        balls = balls[np.argsort(-balls[:, BALL_CONFIDENCE], kind="stable")]
+        delta = balls[:, None, :2] - balls[None, :, :2]
+        close = np.einsum("ijk,ijk->ij", delta, delta) <= self.ball_merge_distance ** 2
+
+        unassigned = np.ones(len(balls), dtype=bool)
+        merged = []
+        for i in range(len(balls)):
+            if not unassigned[i]:
+                continue
+            members = close[i] & unassigned
+            unassigned &= ~members
+            cluster = balls[members]
+            weight = cluster[:, BALL_CONFIDENCE]
+            total = weight.sum()
+            if total > 0:
+                position = (cluster[:, :3] * weight[:, None]).sum(axis=0) / total
+            else:
+                position = cluster[:, :3].mean(axis=0)
+            merged.append((*position, weight.max()))
+        return np.asarray(merged)
+
+
+def _fill_from(snapshot: WorldSnapshot, older: WorldSnapshot):
+    """Add the robots, and the balls if it has none, that only an older snapshot saw"""
+    missing = older.visible & ~snapshot.visible
+    snapshot.robots[missing] = older.robots[missing]
+    snapshot.visible |= missing
+    if not len(snapshot.balls):
+        snapshot.balls = older.balls
+    snapshot.camera_ids = tuple(sorted(set(snapshot.camera_ids) | set(older.camera_ids)))
+
+
+def print_snapshot(snapshot: WorldSnapshot):
+    """Print fused snapshot information"""
+    print(f"\n=== Frame {snapshot.frame_number} (Cameras {list(snapshot.camera_ids)}) ===")
+
+    for i, ball in enumerate(snapshot.balls):
+        print(f"  Ball{i}: x={ball[BALL_X]:.1f}mm, y={ball[BALL_Y]:.1f}mm (confidence: {ball[BALL_CONFIDENCE]:.2f})")
+
+    for team, name in ((BLUE, "Blue Team"), (YELLOW, "Yellow Team")):
+        ids = np.flatnonzero(snapshot.visible[team])
+        if len(ids) == 0:
+            continue
+        print(f"\n[{name}]")
+        for robot_id in ids:
+            x, y, orientation, confidence = snapshot.robots[team, robot_id]
+            orientation = "unknown" if math.isnan(orientation) else f"{orientation:.2f}rad"
+            print(f"  ID {robot_id}: x={x:.1f}mm, y={y:.1f}mm, orientation={orientation} (confidence: {confidence:.2f})")
+
+
+def main():
+    from receive_vision import VisionReceiver, MULTICAST_GROUP, PORT
+
+    print("Fusing SSL-Vision camera frames...")
+    print(f"Multicast address: {MULTICAST_GROUP}:{PORT}")
+    print("Press Ctrl+C to exit")
+
+    fuser = FrameFuser()
+    packet = SSL_WrapperPacket()
+    try:
+        with VisionReceiver(MULTICAST_GROUP, PORT) as receiver:
+            while True:
+                for data in receiver.poll(timeout=5.0):
+                    packet.ParseFromString(data)
+                    if packet.HasField("detection"):
+                        snapshot = fuser.add_frame(packet.detection)
+                        if snapshot is not None:
+                            print_snapshot(snapshot)
+    except KeyboardInterrupt:
+        print("\nExiting...")
+
+
+if __name__ == "__main__":
+    main()
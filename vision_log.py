@@ -0,0 +1,243 @@
+"""
+Script to record SSL-Vision datagrams to a log file and replay them
+The log stores raw SSL_WrapperPacket datagrams with their receive time; a
+sidecar index allows seeking by time or frame_number, and replay reads the
+log through mmap so hours of data never have to be copied into memory
+
+Usage:
+    python vision_log.py record match.log
+    python vision_log.py replay match.log [--speed 2] [--start 120]
+"""
+import argparse
+import mmap
+import os
+import socket
+import struct
+import time
+
+import numpy as np
+
+from fast_decoder import read_detection_header
+from receive_vision import VisionReceiver, MULTICAST_GROUP, PORT
+
+MAGIC = b"SSLVLOG1"
+
+# Every record: receive time, payload length, payload
+RECORD_HEADER = struct.Struct("<dI")
+
+# One index row per record, appended next to the log in <log>.idx
+INDEX_DTYPE = np.dtype([
+    ("offset", "<u8"),        # Offset of the payload in the log
+    ("length", "<u4"),
+    ("t_receive", "<f8"),
+    ("t_capture", "<f8"),     # NaN for packets without detection
+    ("frame_number", "<u4"),
+    ("camera_id", "<u4"),     # NO_CAMERA for packets without detection
+])
+INDEX_ROW = struct.Struct("<QIddII")
+NO_CAMERA = 0xFFFFFFFF
+
+
+def _index_row(offset: int, length: int, t_receive: float, payload) -> tuple:
+    header = read_detection_header(payload)
+    if header is None:
+        return offset, length, t_receive, float("nan"), 0, NO_CAMERA
+    frame_number, t_capture, _, camera_id = header
+    return offset, length, t_receive, t_capture, frame_number, camera_id
+
+
+class VisionLogRecorder:
+    """Append raw datagrams with receive timestamps to a log and its index"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._log = open(path, "ab")
+        if self._log.tell() == 0:
+            self._log.write(MAGIC)
+        self._offset = self._log.tell()
+        self._index = open(path + ".idx", "ab")
+        self.count = 0
+
+    def write(self, data, t_receive: float = None):
+        if t_receive is None:
+            t_receive = time.time()
+        length = len(data)
+        self._log.write(RECORD_HEADER.pack(t_receive, length))
+        self._log.write(data)
+        offset = self._offset + RECORD_HEADER.size
+        self._index.write(INDEX_ROW.pack(*_index_row(offset, length, t_receive, data)))
+        self._offset = offset + length
+        self.count += 1
+
+    def flush(self):
+        self._log.flush()
+        self._index.flush()
+
+    def close(self):
+        self._log.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def build_index(path: str) -> np.ndarray:
+    """Scan a log and (re)write its index"""
+    rows = []
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a vision log")
+        pos = len(MAGIC)
+        while pos + RECORD_HEADER.size <= len(data):
+            t_receive, length = RECORD_HEADER.unpack_from(data, pos)
+            pos += RECORD_HEADER.size
+            if pos + length > len(data):
+                break  # Truncated last record
+            rows.append(_index_row(pos, length, t_receive, data[pos:pos + length]))
+            pos += length
+    index = np.array(rows, dtype=INDEX_DTYPE)
+    index.tofile(path + ".idx")
+    return index
+
+
+def load_index(path: str) -> np.ndarray:
+    """Load the index of a log, rebuilding it if it is missing or out of date"""
+    index_path = path + ".idx"
+    if os.path.exists(index_path) and os.path.getsize(index_path) % INDEX_DTYPE.itemsize == 0:
+        if os.path.getsize(index_path):
+            index = np.memmap(index_path, dtype=INDEX_DTYPE, mode="r")
+        else:
+            index = np.zeros(0, dtype=INDEX_DTYPE)
+        end = int(index["offset"][-1] + index["length"][-1]) if len(index) else len(MAGIC)
+        if end == os.path.getsize(path):
+            return index
+        del index  # Release the mapping before the index is rewritten
+    return build_index(path)
+
+
+class VisionLogReader:
+    """Memory-mapped access to a recorded vision log
+
+    Payloads are returned as memoryviews into the mapping; release them before close().
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.index = load_index(path)
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def packet(self, i: int) -> memoryview:
+        offset = int(self.index["offset"][i])
+        return self._view[offset:offset + int(self.index["length"][i])]
+
+    def seek_time(self, t_receive: float) -> int:
+        """Index of the first record received at or after t_receive"""
+        return int(np.searchsorted(self.index["t_receive"], t_receive))
+
+    def seek_frame(self, frame_number: int, camera_id: int = None) -> int:
+        """Index of the first detection with at least frame_number (optionally from one camera)"""
+        match = (self.index["frame_number"] >= frame_number) & (self.index["camera_id"] != NO_CAMERA)
+        if camera_id is not None:
+            match &= self.index["camera_id"] == camera_id
+        hits = np.flatnonzero(match)
+        return int(hits[0]) if len(hits) else len(self)
+
+    def replay(self, start: int = 0, stop: int = None, speed: float = 1.0):
+        """Yield (t_receive, payload) paced at speed x real time (None: as fast as possible)"""
+        stop = len(self) if stop is None else stop
+        if start >= stop:
+            return
+        times = self.index["t_receive"]
+        t0_log = float(times[start])
+        t0_wall = time.perf_counter()
+        for i in range(start, stop):
+            t_receive = float(times[i])
+            if speed:
+                delay = (t_receive - t0_log) / speed - (time.perf_counter() - t0_wall)
+                if delay > 0:
+                    time.sleep(delay)
+            yield t_receive, self.packet(i)
+
+    def multicast(self, multicast_group: str = MULTICAST_GROUP, port: int = PORT, **replay_args) -> int:
+        """Re-send the log to a multicast group; returns the number of datagrams sent"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+        sent = 0
+        try:
+            for _, payload in self.replay(**replay_args):
+                sock.sendto(payload, (multicast_group, port))
+                payload.release()
+                sent += 1
+        finally:
+            sock.close()
+        return sent
+
+    def close(self):
+        self._view.release()
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def record(path: str):
+    print(f"Recording {MULTICAST_GROUP}:{PORT} to {path}")
+    print("Press Ctrl+C to stop")
+    with VisionReceiver(MULTICAST_GROUP, PORT) as receiver, VisionLogRecorder(path) as recorder:
+        try:
+            while True:
+                datagrams = receiver.poll(timeout=1.0)
+                for data, t_receive in zip(datagrams, receiver.receive_times):
+                    recorder.write(data, t_receive + receiver.wall_offset)
+                recorder.flush()
+        except KeyboardInterrupt:
+            print(f"\nRecorded {recorder.count} packets")
+
+
+def replay(path: str, speed: float, start_time: float):
+    with VisionLogReader(path) as reader:
+        if not len(reader):
+            print("Log is empty")
+            return
+        start = reader.seek_time(float(reader.index["t_receive"][0]) + start_time)
+        print(f"Replaying {len(reader) - start} packets to {MULTICAST_GROUP}:{PORT} at "
+              f"{'max' if not speed else f'{speed:g}x'} speed")
+        try:
+            sent = reader.multicast(start=start, speed=speed)
+            print(f"Sent {sent} packets")
+        except KeyboardInterrupt:
+            print("\nExiting...")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    record_parser = commands.add_parser("record", help="Record SSL-Vision multicast to a log")
+    record_parser.add_argument("log")
+    replay_parser = commands.add_parser("replay", help="Re-multicast a recorded log")
+    replay_parser.add_argument("log")
+    replay_parser.add_argument("--speed", type=float, default=1.0, help="Replay speed, 0 for as fast as possible")
+    replay_parser.add_argument("--start", type=float, default=0.0, help="Seconds into the log to start at")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        record(args.log)
+    else:
+        replay(args.log, args.speed, args.start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Helpers for reading and writing the protobuf wire format
+Used where only a few fields of a packet are needed, without building the
+protobuf message
+"""
+
+# Wire types
+VARINT, FIXED64, LENGTH_DELIMITED, FIXED32 = 0, 1, 2, 5
+
+
+def read_varint(data, pos: int):
+    """Return (value, position after the varint)"""
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def encode_varint(value: int) -> bytes:
+    """Return the varint encoding of a non-negative integer"""
+    out = bytearray()
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def skip_field(data, pos: int, wire_type: int) -> int:
+    """Return the position after the value of a field whose tag has been read"""
+    if wire_type == VARINT:
+        return read_varint(data, pos)[1]
+    if wire_type == FIXED64:
+        return pos + 8
+    if wire_type == LENGTH_DELIMITED:
+        length, pos = read_varint(data, pos)
+        return pos + length
+    if wire_type == FIXED32:
+        return pos + 4
+    raise ValueError(f"Unsupported wire type {wire_type}")